@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, HTTPException, Path, Query, Request
 from typing import Optional
 from sqlite3 import Error
 from .database import get_db
+from .serialization import FastJSONResponse, fetch_records
+from .cache import invalidate
+from .etags import resource_etag, etag_matches, not_modified
+from .archive import archive_source
+from .dimensions import dimensions
 from pydantic import BaseModel
 
 class AccountUpdate(BaseModel):
@@ -13,43 +18,76 @@ class AccountCreate(BaseModel):
 
 router = APIRouter(prefix="/api/accounts", tags=["Accounts"])
 
+# Tables joined into account responses; their write versions feed the ETags
+ETAG_TABLES = ("accounts", "opportunities", "stages", "pipeline_sources")
+
+# Cheap aggregates checked before the joins, so unchanged resources get a 304
+LIST_ETAG_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM accounts),
+        (SELECT MAX(account_id) FROM accounts),
+        (SELECT COUNT(*) FROM opportunities),
+        (SELECT MAX(last_modified_date) FROM opportunities)
+"""
+
+# One page of accounts with their opportunity rollups. The page is picked
+# before the join, so only its accounts' opportunities are aggregated, from
+# the covering idx_opportunities_account_rollup index
+ACCOUNT_LIST_QUERY = """
+    SELECT 
+        a.account_id,
+        a.account_name,
+        a.created_at,
+        COUNT(DISTINCT o.opportunity_id) as opportunity_count,
+        SUM(CASE WHEN o.is_closed = 0 THEN o.total_amount ELSE 0 END) as open_opportunity_value,
+        SUM(CASE WHEN o.is_closed = 1 AND o.is_won = 1 THEN o.total_amount ELSE 0 END) as won_opportunity_value
+    FROM (SELECT * FROM accounts ORDER BY account_id LIMIT ? OFFSET ?) a
+    LEFT JOIN {opportunities} o ON a.account_id = o.account_id
+    GROUP BY a.account_id
+    ORDER BY a.account_id
+"""
+
+DETAIL_ETAG_QUERY = """
+    SELECT
+        a.account_id,
+        (SELECT COUNT(*) FROM opportunities WHERE account_id = a.account_id),
+        (SELECT MAX(last_modified_date) FROM opportunities WHERE account_id = a.account_id)
+    FROM accounts a
+    WHERE a.account_id = ?
+"""
+
 @router.get("")
 async def list_accounts(
+    request: Request,
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    includeArchived: bool = Query(False, description="Include archived opportunities in the totals")
 ):
     try:
         db = get_db()
         cursor = db.cursor()
 
-        # Get all accounts with their data
-        cursor.execute("""
-            SELECT 
-                a.account_id,
-                a.account_name,
-                a.created_at,
-                COUNT(DISTINCT o.opportunity_id) as opportunity_count,
-                SUM(CASE WHEN o.is_closed = 0 THEN o.total_amount ELSE 0 END) as open_opportunity_value,
-                SUM(CASE WHEN o.is_closed = 1 AND o.is_won = 1 THEN o.total_amount ELSE 0 END) as won_opportunity_value
-            FROM accounts a
-            LEFT JOIN opportunities o ON a.account_id = o.account_id
-            GROUP BY a.account_id, a.account_name, a.created_at
-        """)
-        
-        accounts = [dict(row) for row in cursor.fetchall()]
-        
-        # Calculate pagination
-        total_records = len(accounts)
-        total_pages = (total_records + limit - 1) // limit
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
+        etag = resource_etag(request, cursor, LIST_ETAG_QUERY, (), ETAG_TABLES)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        # Get total count
+        cursor.execute("SELECT COUNT(*) FROM accounts")
+        total_records = cursor.fetchone()[0]
+
+        # Get one page of accounts with their data
+        cursor.execute(
+            ACCOUNT_LIST_QUERY.format(opportunities=archive_source(cursor, "opportunities", includeArchived)),
+            (limit, (page - 1) * limit)
+        )
+        accounts = fetch_records(cursor)
         
-        return {
+        return FastJSONResponse({
             "totalRecords": total_records,
-            "totalPages": total_pages,
+            "totalPages": (total_records + limit - 1) // limit,
             "currentPage": page,
-            "data": accounts[start_idx:end_idx]
-        }
+            "data": accounts
+        }, headers={"ETag": etag})
 
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -57,11 +95,17 @@ async def list_accounts(
         db.close()
 
 @router.get("/{account_id}")
-async def get_account(account_id: int = Path(..., ge=1)):
+async def get_account(request: Request, account_id: int = Path(..., ge=1)):
     try:
         db = get_db()
         cursor = db.cursor()
 
+        etag = resource_etag(request, cursor, DETAIL_ETAG_QUERY, (account_id,), ETAG_TABLES)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="Account not found")
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         # Get account details
         cursor.execute("""
             SELECT * FROM accounts 
@@ -80,15 +124,16 @@ async def get_account(account_id: int = Path(..., ge=1)):
                 o.opportunity_id,
                 o.opportunity_name,
                 o.total_amount,
-                o.currency,
-                o.stage_name,
+                o.currency_id,
+                o.stage_name_id,
                 o.close_date,
                 o.probability_percentage,
-                o.type,
-                o.fiscal_period,
+                o.type_id,
+                o.fiscal_period_label_id,
+                o.fiscal_period_id,
                 o.opportunity_owner,
                 o.next_step,
-                o.lead_source,
+                o.lead_source_id,
                 o.annual_contract_value,
                 o.contract_duration_months,
                 o.fiscal_year,
@@ -104,14 +149,14 @@ async def get_account(account_id: int = Path(..., ge=1)):
             ORDER BY o.created_date DESC
         """, (account_id,))
         
-        opportunities = [dict(row) for row in cursor.fetchall()]
+        opportunities = dimensions.decorate(db, fetch_records(cursor))
         account_dict['opportunities'] = opportunities
 
         # Format dates
         if 'created_at' in account_dict:
             account_dict['created_at'] = account_dict['created_at'].split()[0]
 
-        return account_dict
+        return FastJSONResponse(account_dict, headers={"ETag": etag})
 
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -140,6 +185,7 @@ async def update_account(
         """, (account.account_name, account_id))
 
         db.commit()
+        invalidate("accounts")
         return {"message": "Account updated successfully"}
 
     except Error as e:
@@ -178,6 +224,7 @@ async def create_account(account: AccountCreate):
             """, (account.account_name,))
 
         db.commit()
+        invalidate("accounts")
         return {"message": "Account created successfully", "account_id": cursor.lastrowid or account.account_id}
 
     except Error as e:
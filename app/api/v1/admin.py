@@ -0,0 +1,115 @@
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from sqlite3 import Error
+from .snapshots import snapshot_manager, SNAPSHOT_MAX_AGE_SECONDS, SNAPSHOT_INTERVAL_SECONDS
+from .cache import response_cache
+from .coalesce import single_flight
+from .slow_queries import slow_query_log
+from .filter_usage import filter_usage
+from .opportunity_snapshots import opportunity_snapshot_job, OPPORTUNITY_SNAPSHOT_INTERVAL_SECONDS
+from .archive import opportunity_archive_job, ARCHIVE_INTERVAL_SECONDS
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+@router.get("/snapshots")
+async def list_snapshots():
+    """Available read snapshots, newest first, with their age"""
+    snapshots = snapshot_manager.list_snapshots()
+    active = snapshot_manager.latest()
+    return {
+        "data": snapshots,
+        "active": active['name'] if active else None,
+        "maxAgeSeconds": SNAPSHOT_MAX_AGE_SECONDS,
+        "intervalSeconds": SNAPSHOT_INTERVAL_SECONDS
+    }
+
+@router.post("/snapshots", status_code=201)
+async def create_snapshot():
+    """Take a snapshot of the live database now"""
+    try:
+        # The stepped backup sleeps between steps, keep it off the event loop
+        return await run_in_threadpool(snapshot_manager.create_snapshot)
+    except (Error, OSError) as e:
+        raise HTTPException(status_code=500, detail=f"Snapshot failed: {str(e)}")
+
+@router.get("/opportunity-snapshots")
+async def list_opportunity_snapshots():
+    """Opportunity state snapshots used by as_of queries, newest first"""
+    try:
+        return {
+            "data": opportunity_snapshot_job.list_snapshots(),
+            "keep": opportunity_snapshot_job.keep,
+            "intervalSeconds": OPPORTUNITY_SNAPSHOT_INTERVAL_SECONDS
+        }
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.post("/opportunity-snapshots", status_code=201)
+async def create_opportunity_snapshot():
+    """Snapshot the current state of every opportunity now"""
+    try:
+        return await run_in_threadpool(opportunity_snapshot_job.create_snapshot)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Snapshot failed: {str(e)}")
+
+@router.get("/archive")
+async def get_archive_stats():
+    """Rows in each hot table and its archive, and the archival settings"""
+    try:
+        return {
+            "data": opportunity_archive_job.stats(),
+            "afterDays": opportunity_archive_job.after_days,
+            "batchSize": opportunity_archive_job.batch_size,
+            "intervalSeconds": ARCHIVE_INTERVAL_SECONDS
+        }
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+@router.post("/archive")
+async def archive_opportunities():
+    """Move closed opportunities past the cutoff into the archive tables now"""
+    try:
+        return await run_in_threadpool(opportunity_archive_job.archive)
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Archival failed: {str(e)}")
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Response cache size and hit/miss counters"""
+    return response_cache.stats()
+
+@router.delete("/cache")
+async def clear_cache():
+    """Drop every cached response"""
+    response_cache.clear()
+    return {"message": "Response cache cleared"}
+
+@router.get("/coalescing")
+async def get_coalescing_stats():
+    """Executions and coalesced requests per single-flight operation"""
+    return single_flight.stats()
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=500),
+    orderBy: str = Query("total_ms", pattern="^(total_ms|max_ms|count)$")
+):
+    """Slow statement shapes, worst first, with their latest query plan"""
+    return {
+        "thresholdMs": slow_query_log.threshold * 1000,
+        "data": slow_query_log.top(limit, orderBy)
+    }
+
+@router.delete("/slow-queries")
+async def reset_slow_queries():
+    """Clear the top offenders report; the log file is kept"""
+    slow_query_log.reset()
+    return {"message": "Slow query statistics cleared"}
+
+@router.get("/filter-usage")
+async def get_filter_usage(limit: int = Query(50, ge=1, le=500)):
+    """Most frequent list filter combinations since startup, for the index advisor"""
+    return {
+        "sampleRate": filter_usage.sample,
+        "data": filter_usage.top(limit)
+    }
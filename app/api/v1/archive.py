@@ -0,0 +1,189 @@
+import os
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+from fastapi import HTTPException
+from .database import get_db
+from .cache import invalidate
+
+# --- Configuration ---
+# Seconds between archival runs; 0 disables the background thread
+ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ARCHIVE_INTERVAL_SECONDS', '0'))
+# Closed opportunities are archived this many days after their close date
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '365'))
+# Opportunities moved per transaction, so writers are only blocked briefly
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '500'))
+
+# Hot table -> archive table (migration 007). Every table is keyed to the
+# opportunity by opportunity_id, children come before opportunities.
+ARCHIVED_TABLES = {
+    "opportunity_project_plan": "archived_opportunity_project_plan",
+    "influencer_engagements": "archived_influencer_engagements",
+    "opportunity_history": "archived_opportunity_history",
+    "opportunity_changesets": "archived_opportunity_changesets",
+    "opportunities": "archived_opportunities"
+}
+
+def table_columns(cursor, table: str, generated: bool = False) -> List[str]:
+    """Stored columns of a table, and with generated=True its generated columns too"""
+    if not generated:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [row[1] for row in cursor.fetchall()]
+    # hidden is 2 or 3 for generated columns, 1 for hidden columns of virtual tables
+    cursor.execute(f"PRAGMA table_xinfo({table})")
+    return [row[1] for row in cursor.fetchall() if row[6] != 1]
+
+def archive_source(cursor, table: str, include_archived: bool, condition: str = "") -> str:
+    """The hot table, or a subquery over it and its archive for includeArchived.
+
+    Columns the archive does not have yet read as NULL, so the union holds
+    while the archiver has not caught up with a new hot column. A condition
+    is applied to both halves, so its parameters are needed twice.
+    """
+    if not include_archived:
+        return table
+    archived_columns = set(table_columns(cursor, ARCHIVED_TABLES[table], generated=True))
+    if not archived_columns:
+        raise HTTPException(status_code=503, detail="includeArchived needs migration 007_opportunity_archive.sql")
+    columns = table_columns(cursor, table, generated=True)
+    archived = [column if column in archived_columns else f"NULL AS {column}" for column in columns]
+    where = f" WHERE {condition}" if condition else ""
+    return (
+        f"(SELECT {', '.join(columns)} FROM {table}{where}"
+        f" UNION ALL SELECT {', '.join(archived)} FROM {ARCHIVED_TABLES[table]}{where})"
+    )
+
+class OpportunityArchiveJob:
+    """Moves closed opportunities past ARCHIVE_AFTER_DAYS into the archive tables.
+
+    Each batch copies the opportunities with their project plans,
+    engagements and history and deletes them from the hot tables in one
+    transaction, so an opportunity is never in both or neither.
+    """
+
+    def __init__(self, after_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE):
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def cutoff(self) -> str:
+        return (date.today() - timedelta(days=self.after_days)).isoformat()
+
+    def archive(self) -> dict:
+        """Archive every eligible opportunity, one batch per transaction"""
+        with self._lock:
+            started = datetime.now()
+            cutoff = self.cutoff()
+            archived = 0
+            batches = 0
+            db = get_db(check_same_thread=False)
+            try:
+                cursor = db.cursor()
+                tables = self.sync_columns(cursor)
+                while not self._stop.is_set():
+                    moved = self.archive_batch(cursor, tables, cutoff)
+                    db.commit()
+                    if not moved:
+                        break
+                    archived += moved
+                    batches += 1
+                    # Readers see the batch gone from the hot tables right away
+                    invalidate(*tables, *(ARCHIVED_TABLES[table] for table in tables))
+                    if moved < self.batch_size:
+                        break
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            seconds = (datetime.now() - started).total_seconds()
+            if archived:
+                logging.info(f"Archived {archived} opportunities in {batches} batches in {seconds:.2f}s")
+            return {"archived": archived, "batches": batches, "cutoff": cutoff, "seconds": round(seconds, 3)}
+
+    def sync_columns(self, cursor) -> Dict[str, List[str]]:
+        """Hot columns of each table with an archive, adding any the archive lacks"""
+        tables = {}
+        for table, archive_table in ARCHIVED_TABLES.items():
+            columns = table_columns(cursor, table)
+            archived_columns = table_columns(cursor, archive_table)
+            if not columns:
+                continue
+            if not archived_columns:
+                raise HTTPException(status_code=503, detail="Archiving needs migration 007_opportunity_archive.sql")
+            for column in columns:
+                if column not in archived_columns:
+                    cursor.execute(f"ALTER TABLE {archive_table} ADD COLUMN {column}")
+            tables[table] = columns
+        return tables
+
+    def archive_batch(self, cursor, tables: Dict[str, List[str]], cutoff: str) -> int:
+        """Move up to batch_size opportunities closed before cutoff; the caller commits"""
+        cursor.execute("""
+            SELECT opportunity_id FROM opportunities
+            WHERE is_closed = 1 AND close_date < ?
+            ORDER BY close_date
+            LIMIT ?
+        """, (cutoff, self.batch_size))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0
+        id_placeholders = ', '.join('?' * len(ids))
+        for table, columns in tables.items():
+            column_list = ', '.join(columns)
+            if table == "opportunities":
+                cursor.execute(f"""
+                    INSERT INTO {ARCHIVED_TABLES[table]} ({column_list}, archived_at)
+                    SELECT {column_list}, CURRENT_TIMESTAMP FROM {table} WHERE opportunity_id IN ({id_placeholders})
+                """, ids)
+            else:
+                cursor.execute(f"""
+                    INSERT INTO {ARCHIVED_TABLES[table]} ({column_list})
+                    SELECT {column_list} FROM {table} WHERE opportunity_id IN ({id_placeholders})
+                """, ids)
+            cursor.execute(f"DELETE FROM {table} WHERE opportunity_id IN ({id_placeholders})", ids)
+        return len(ids)
+
+    def stats(self) -> dict:
+        """Row counts of each hot table and its archive"""
+        db = get_db()
+        try:
+            cursor = db.cursor()
+            counts = {}
+            for table, archive_table in ARCHIVED_TABLES.items():
+                if table_columns(cursor, table) and table_columns(cursor, archive_table):
+                    cursor.execute(f"SELECT (SELECT COUNT(*) FROM {table}), (SELECT COUNT(*) FROM {archive_table})")
+                    hot, archived = cursor.fetchone()
+                    counts[table] = {"hot": hot, "archived": archived}
+            return counts
+        finally:
+            db.close()
+
+    def start(self, interval_seconds: int = ARCHIVE_INTERVAL_SECONDS):
+        """Archive every interval_seconds on a daemon thread"""
+        if interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while True:
+                try:
+                    self.archive()
+                except Exception as e:
+                    logging.error(f"Opportunity archival failed: {str(e)}")
+                if self._stop.wait(interval_seconds):
+                    break
+
+        self._thread = threading.Thread(target=run, name="opportunity-archive", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+opportunity_archive_job = OpportunityArchiveJob()
@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+from .etags import etag_matches, not_modified
+from .profiling import profile_mode
+
+# --- Configuration ---
+CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+# Responses larger than this are never cached
+CACHE_MAX_ENTRY_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRY_BYTES', str(8 * 1024 * 1024)))
+# Safety net for writes that bypass the API (import scripts, manual SQL); 0 disables expiry
+CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '300'))
+
+# Dimension tables of migration 011, read to add the text back to opportunity rows
+DIMENSION_TABLES = ("opportunity_stage_names", "opportunity_types", "lead_sources", "currencies",
+                    "fiscal_period_labels", "fiscal_periods")
+
+# Cached GET routes and the tables each one reads, including those of as_of
+# (history, changesets, snapshots) and includeArchived (the archive tables)
+CACHED_ROUTES = {
+    "/api/opportunities": (
+        "opportunities", "accounts", "users", "stages", "pipeline_sources",
+        "opportunity_project_plan", "influencer_engagements", "influencers",
+        "opportunity_history", "opportunity_changesets", "opportunity_snapshots", "opportunity_snapshot_rows",
+        "archived_opportunities", "archived_opportunity_project_plan", "archived_influencer_engagements",
+        "archived_opportunity_history", "archived_opportunity_changesets",
+        *DIMENSION_TABLES
+    ),
+    "/api/accounts": ("accounts", "opportunities", "archived_opportunities", *DIMENSION_TABLES),
+    "/api/users": ("users", "opportunities", "archived_opportunities", *DIMENSION_TABLES),
+    "/api/sales-review": (
+        "opportunities", "accounts", "users", "pipeline_sources",
+        "opportunity_project_plan", "support_requests", "deals_closed", *DIMENSION_TABLES
+    )
+}
+
+class CacheEntry:
+    __slots__ = ('body', 'status_code', 'headers', 'versions', 'created', 'size')
+
+    def __init__(self, body: bytes, status_code: int, headers: dict, versions: Dict[str, int]):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers
+        self.versions = versions
+        self.created = time.monotonic()
+        self.size = len(body)
+
+class ResponseCache:
+    """LRU cache of rendered responses bounded by total body size.
+
+    Every entry records the version of each table it read. Writes bump the
+    versions of the tables they touch, so entries built before the write no
+    longer match and are dropped the next time they are looked up.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES,
+                 ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, CacheEntry]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def versions(self, tables: Tuple[str, ...]) -> Dict[str, int]:
+        with self._lock:
+            return {table: self._versions.get(table, 0) for table in tables}
+
+    def get(self, key: Tuple) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expired = self.ttl_seconds > 0 and time.monotonic() - entry.created > self.ttl_seconds
+                stale = any(self._versions.get(table, 0) != version for table, version in entry.versions.items())
+                if expired or stale:
+                    self._remove(key)
+                    self.invalidations += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, entry: CacheEntry):
+        if entry.size > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self.bytes += entry.size
+            while self.bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tables: str):
+        """Bump the version of each table written to"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "tableVersions": dict(self._versions)
+            }
+
+    def _remove(self, key: Tuple):
+        entry = self._entries.pop(key)
+        self.bytes -= entry.size
+
+response_cache = ResponseCache()
+
+def invalidate(*tables: str):
+    """Invalidate cached responses that read any of the given tables"""
+    response_cache.invalidate(*tables)
+
+def cache_key(request: Request) -> Tuple:
+    """Route plus query parameters, independent of their order in the URL"""
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+async def cache_middleware(request: Request, call_next):
+    tables = CACHED_ROUTES.get(request.url.path) if request.method == "GET" else None
+    # Profiled requests have to run the handler
+    if tables is None or profile_mode(request.scope):
+        return await call_next(request)
+
+    key = cache_key(request)
+    entry = response_cache.get(key)
+    if entry is not None:
+        etag = entry.headers.get("etag")
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return Response(entry.body, status_code=entry.status_code, headers={**entry.headers, "X-Cache": "HIT"})
+
+    # Versions are read before the response is built, so a write that lands
+    # while it is being computed leaves the new entry already stale
+    versions = response_cache.versions(tables)
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    response_cache.put(key, CacheEntry(body, response.status_code, headers, versions))
+    return Response(body, status_code=response.status_code, headers={**headers, "X-Cache": "MISS"})
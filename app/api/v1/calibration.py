@@ -1,18 +1,20 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from sqlite3 import Error
-from .database import get_db
-from datetime import datetime
+from .snapshots import get_snapshot_db, snapshot_headers
+from .serialization import FastJSONResponse
+from .coalesce import single_flight
+from .fiscal import current_period
 
 router = APIRouter(prefix="/api/calibration", tags=["Calibration"])
 
-@router.get("")
-async def get_calibration(user_id: Optional[int] = Query(None)):
+def build_calibration(user_id: Optional[int]) -> tuple:
+    """Current quarter metrics and the snapshot they were read from"""
     try:
-        db = get_db()
+        db, snapshot = get_snapshot_db()
         cursor = db.cursor()
 
-        def get_quarter_metrics(year: int, quarter: str, user_id: Optional[int] = None) -> dict:
+        def get_quarter_metrics(period: dict, user_id: Optional[int] = None) -> dict:
             # Get targets
             target_query = """
                 SELECT 
@@ -20,9 +22,9 @@ async def get_calibration(user_id: Optional[int] = Query(None)):
                     pipeline_target,
                     deals_target
                 FROM quarterly_targets
-                WHERE fiscal_year = ? AND fiscal_quarter = ?
+                WHERE fiscal_period_key = ?
             """
-            params = [year, quarter]
+            params = [period['period_key']]
             
             if user_id:
                 target_query += " AND user_id = ?"
@@ -42,11 +44,10 @@ async def get_calibration(user_id: Optional[int] = Query(None)):
                     SUM(total_amount) as actual_revenue,
                     COUNT(*) as deals_count
                 FROM opportunities
-                WHERE fiscal_year = ? 
-                AND fiscal_quarter = ?
-                AND status = 'Closed Won'
+                WHERE fiscal_period_id = ?
+                AND is_closed = 1 AND is_won = 1
             """
-            params = [year, quarter]
+            params = [period['period_key']]
             
             if user_id:
                 metrics_query += " AND owner_id = ?"
@@ -61,11 +62,10 @@ async def get_calibration(user_id: Optional[int] = Query(None)):
                     SUM(total_amount) as pipeline_amount,
                     SUM(total_amount * (probability_percentage / 100)) as weighted_pipeline
                 FROM opportunities
-                WHERE fiscal_year = ? 
-                AND fiscal_quarter = ?
-                AND status = 'Open'
+                WHERE fiscal_period_id = ?
+                AND is_closed = 0
             """
-            params = [year, quarter]
+            params = [period['period_key']]
             
             if user_id:
                 pipeline_query += " AND owner_id = ?"
@@ -81,8 +81,8 @@ async def get_calibration(user_id: Optional[int] = Query(None)):
             completion_percentage = (actual_revenue / target['revenue_target'] * 100) if target['revenue_target'] > 0 else 0
             
             return {
-                "fiscal_year": year,
-                "fiscal_quarter": quarter,
+                "fiscal_year": period['fiscal_year'],
+                "fiscal_quarter": period['fiscal_quarter'],
                 "revenue_target": target['revenue_target'],
                 "pipeline_target": target['pipeline_target'],
                 "deals_target": target['deals_target'],
@@ -93,18 +93,23 @@ async def get_calibration(user_id: Optional[int] = Query(None)):
             }
 
         # Get current quarter
-        now = datetime.now()
-        current_year = now.year
-        month = now.month
-        current_quarter = f"Q{(month - 1) // 3 + 1}"
+        period = current_period(cursor)
+        if not period:
+            raise HTTPException(status_code=404, detail="Current quarter not found in fiscal_calendar")
 
-        current_metrics = get_quarter_metrics(current_year, current_quarter, user_id)
+        current_metrics = get_quarter_metrics(period, user_id)
         if not current_metrics:
             raise HTTPException(status_code=404, detail="Current quarter targets not found")
 
-        return current_metrics
+        return current_metrics, snapshot
 
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+@router.get("")
+async def get_calibration(user_id: Optional[int] = Query(None)):
+    # Identical concurrent requests share one run of the quarter queries
+    metrics, snapshot = await single_flight.run(("calibration", user_id), build_calibration, user_id)
+    return FastJSONResponse(metrics, headers=snapshot_headers(snapshot))
@@ -0,0 +1,69 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Tuple
+from starlette.concurrency import run_in_threadpool
+from .profiling import profiled_call
+
+class Flight:
+    __slots__ = ('task', 'waiters')
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """Share one in-flight computation between identical concurrent requests.
+
+    The first caller for a key starts the function in the threadpool as a
+    task of its own; it and callers arriving with the same key before it
+    finishes all await that task's result (or exception) instead of running
+    it again. A caller disconnecting leaves the task to the others, and it
+    is only cancelled once no caller is left waiting. Nothing is kept once
+    it finishes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Tuple, Flight] = {}
+        self._executions = defaultdict(int)
+        self._coalesced = defaultdict(int)
+
+    async def run(self, key: Tuple[Hashable, ...], func: Callable[..., Any], *args) -> Any:
+        """key[0] names the operation in the metrics"""
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = Flight(asyncio.create_task(run_in_threadpool(profiled_call, func, *args)))
+            self._inflight[key] = flight
+            self._executions[key[0]] += 1
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self._coalesced[key[0]] += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded so a waiter being cancelled does not cancel the shared work
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: Tuple, flight: Flight):
+        # A later flight for the same key may have replaced a cancelled one
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        names = sorted(set(self._executions) | set(self._coalesced))
+        return {
+            "inFlight": len(self._inflight),
+            "operations": {
+                name: {
+                    "executions": self._executions[name],
+                    "coalesced": self._coalesced[name]
+                }
+                for name in names
+            }
+        }
+
+single_flight = SingleFlight()
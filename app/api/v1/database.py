@@ -1,12 +1,17 @@
+import os
 import sqlite3
 from sqlite3 import Row
 from typing import Any
+from .metrics import InstrumentedConnection
 
-def get_db():
-    conn = sqlite3.connect('sales_data.db')
+DATABASE_FILE = os.environ.get('SALES_DB', 'sales_data.db')
+
+def get_db(check_same_thread: bool = True):
+    # Instrumented so per-request SQL counts and timings reach /metrics
+    conn = sqlite3.connect(DATABASE_FILE, check_same_thread=check_same_thread, factory=InstrumentedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
 def dict_factory(cursor: sqlite3.Cursor, row: tuple) -> dict:
     fields = [column[0] for column in cursor.description]
-    return {key: value for key, value in zip(fields, row)} 
\ No newline at end of file
+    return {key: value for key, value in zip(fields, row)}
@@ -0,0 +1,32 @@
+from datetime import date, datetime, timezone
+
+# The *_day columns of migration 009 hold CAST(julianday(column) + 0.5 AS
+# INTEGER): the same integer for every time of a day, one more each day.
+# It equals the proleptic Gregorian ordinal of the date plus this offset.
+JULIAN_DAY_OFFSET = 1721425
+
+def day_number_sql(column: str) -> str:
+    """SQL computing a column's day number the way the generated columns do"""
+    return f"CAST(julianday({column}) + 0.5 AS INTEGER)"
+
+def day_number(value: date) -> int:
+    """Day number of a date (or of a datetime's UTC date), to compare with *_day columns"""
+    if isinstance(value, datetime):
+        value = utc(value).date()
+    return value.toordinal() + JULIAN_DAY_OFFSET
+
+def utc(value: datetime) -> datetime:
+    """Naive UTC datetime, as CURRENT_TIMESTAMP and datetime('now') store them"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def sql_date(value: date) -> str:
+    """'YYYY-MM-DD', the format of DATE columns"""
+    if isinstance(value, datetime):
+        value = utc(value).date()
+    return value.isoformat()
+
+def sql_datetime(value: datetime) -> str:
+    """'YYYY-MM-DD HH:MM:SS' in UTC, the format of DATETIME columns"""
+    return utc(value).strftime("%Y-%m-%d %H:%M:%S")
@@ -0,0 +1,174 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List
+from sqlite3 import Error
+from .snapshots import get_snapshot_db, snapshot_headers
+from .serialization import FastJSONResponse, fetch_records
+from .dimensions import dimensions
+
+router = APIRouter(prefix="/api/details", tags=["Details"])
+
+# Upper bound on IDs per request, well below SQLite's bound parameter limit
+MAX_IDS = 500
+
+def validate_ids(ids: List[int]) -> List[int]:
+    ids = sorted(set(ids))
+    if len(ids) > MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS} ids per request")
+    return ids
+
+def placeholders(values: list) -> str:
+    return ', '.join('?' * len(values))
+
+def fetch_opportunity_children(cursor, opportunity_filter: str, params: list) -> tuple:
+    """Load influencers and support requests for a set of opportunities.
+
+    opportunity_filter is a subquery selecting opportunity_id, so the number of
+    queries is fixed no matter how many opportunities it matches.
+    """
+    cursor.execute(f"""
+        SELECT
+            ie.opportunity_id,
+            ie.engagement_id,
+            ie.engagement_date,
+            ie.engagement_type,
+            ie.outcome,
+            i.influencer_id,
+            i.first_name || ' ' || i.last_name as name,
+            i.title,
+            i.role,
+            i.influence_level
+        FROM influencer_engagements ie
+        JOIN influencers i ON ie.influencer_id = i.influencer_id
+        WHERE ie.opportunity_id IN ({opportunity_filter})
+        ORDER BY ie.opportunity_id, ie.engagement_date DESC
+    """, params)
+    influencers = {}
+    for record in fetch_records(cursor):
+        influencers.setdefault(record['opportunity_id'], []).append(record)
+
+    cursor.execute(f"""
+        SELECT
+            sr.*,
+            requester.full_name as requested_by_name,
+            assignee.full_name as assigned_to_name
+        FROM support_requests sr
+        LEFT JOIN users requester ON sr.requested_by = requester.user_id
+        LEFT JOIN users assignee ON sr.assigned_to = assignee.user_id
+        WHERE sr.opportunity_id IN ({opportunity_filter})
+        ORDER BY sr.opportunity_id, sr.created_date DESC
+    """, params)
+    support_requests = {}
+    for record in fetch_records(cursor):
+        support_requests.setdefault(record['opportunity_id'], []).append(record)
+
+    return influencers, support_requests
+
+@router.get("/accounts")
+async def get_account_details(ids: List[int] = Query(...)):
+    """Accounts with their opportunities, influencers and support requests"""
+    ids = validate_ids(ids)
+    try:
+        db, snapshot = get_snapshot_db()
+        cursor = db.cursor()
+
+        cursor.execute(f"""
+            SELECT * FROM accounts
+            WHERE account_id IN ({placeholders(ids)})
+            ORDER BY account_id
+        """, ids)
+        accounts = fetch_records(cursor)
+
+        cursor.execute(f"""
+            SELECT
+                o.*,
+                u.full_name as owner_name,
+                s.stage_name as current_stage_name,
+                ps.source_name,
+                pp.activity as project_activity,
+                pp.deliverables as project_deliverables,
+                pp.priority as project_priority,
+                pp.due_date as project_due_date,
+                pp.status as project_status
+            FROM opportunities o
+            LEFT JOIN users u ON o.owner_id = u.user_id
+            LEFT JOIN stages s ON o.stage_id = s.stage_id
+            LEFT JOIN pipeline_sources ps ON o.source_id = ps.source_id
+            LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
+            WHERE o.account_id IN ({placeholders(ids)})
+            ORDER BY o.account_id, o.created_date DESC
+        """, ids)
+        opportunities = dimensions.decorate(db, fetch_records(cursor))
+
+        influencers, support_requests = fetch_opportunity_children(
+            cursor,
+            f"SELECT opportunity_id FROM opportunities WHERE account_id IN ({placeholders(ids)})",
+            ids
+        )
+
+        by_account = {}
+        for opportunity in opportunities:
+            opportunity['influencers'] = influencers.get(opportunity['opportunity_id'], [])
+            opportunity['support_requests'] = support_requests.get(opportunity['opportunity_id'], [])
+            by_account.setdefault(opportunity['account_id'], []).append(opportunity)
+
+        for account in accounts:
+            account['opportunities'] = by_account.get(account['account_id'], [])
+
+        found = {account['account_id'] for account in accounts}
+        return FastJSONResponse({
+            "data": accounts,
+            "missingIds": [account_id for account_id in ids if account_id not in found]
+        }, headers=snapshot_headers(snapshot))
+
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        db.close()
+
+@router.get("/opportunities")
+async def get_opportunity_details(ids: List[int] = Query(...)):
+    """Opportunities with their account, project plan, influencers and support requests"""
+    ids = validate_ids(ids)
+    try:
+        db, snapshot = get_snapshot_db()
+        cursor = db.cursor()
+
+        cursor.execute(f"""
+            SELECT
+                o.*,
+                a.account_name,
+                u.full_name as owner_name,
+                s.stage_name as current_stage_name,
+                ps.source_name,
+                pp.activity as project_activity,
+                pp.deliverables as project_deliverables,
+                pp.priority as project_priority,
+                pp.due_date as project_due_date,
+                pp.status as project_status
+            FROM opportunities o
+            LEFT JOIN accounts a ON o.account_id = a.account_id
+            LEFT JOIN users u ON o.owner_id = u.user_id
+            LEFT JOIN stages s ON o.stage_id = s.stage_id
+            LEFT JOIN pipeline_sources ps ON o.source_id = ps.source_id
+            LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
+            WHERE o.opportunity_id IN ({placeholders(ids)})
+            ORDER BY o.opportunity_id
+        """, ids)
+        opportunities = dimensions.decorate(db, fetch_records(cursor))
+
+        influencers, support_requests = fetch_opportunity_children(cursor, placeholders(ids), ids)
+
+        for opportunity in opportunities:
+            opportunity['influencers'] = influencers.get(opportunity['opportunity_id'], [])
+            opportunity['support_requests'] = support_requests.get(opportunity['opportunity_id'], [])
+
+        found = {opportunity['opportunity_id'] for opportunity in opportunities}
+        return FastJSONResponse({
+            "data": opportunities,
+            "missingIds": [opportunity_id for opportunity_id in ids if opportunity_id not in found]
+        }, headers=snapshot_headers(snapshot))
+
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        db.close()
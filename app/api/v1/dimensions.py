@@ -0,0 +1,125 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from .fiscal import period_key
+from .serialization import STORAGE_COLUMNS
+
+# Opportunity column -> (dimension table, its key column, the opportunities
+# column holding the key). Migration 011 moved these columns out of
+# opportunities and archived_opportunities. Dimension rows are only ever added
+OPPORTUNITY_DIMENSIONS = {
+    "stage_name": ("opportunity_stage_names", "stage_name_id", "stage_name_id"),
+    "type": ("opportunity_types", "type_id", "type_id"),
+    "lead_source": ("lead_sources", "lead_source_id", "lead_source_id"),
+    "currency": ("currencies", "currency_id", "currency_id"),
+    "fiscal_period": ("fiscal_period_labels", "fiscal_period_label_id", "fiscal_period_label_id")
+}
+# Next to its label, an opportunity holds the fiscal_periods key (migration 010)
+# of its fiscal_period, which the fiscal period filters and rollups compare
+FISCAL_PERIOD_KEY = "fiscal_period_id"
+# Keys that only replace the text in storage. Responses carry the text instead
+KEY_COLUMNS = frozenset([foreign_key for _, _, foreign_key in OPPORTUNITY_DIMENSIONS.values()] + [FISCAL_PERIOD_KEY])
+
+def dimension_value_sql(column: str, alias: str = "o") -> str:
+    """SQL reading a moved column's text for a row of opportunities"""
+    table, key, foreign_key = OPPORTUNITY_DIMENSIONS[column]
+    return f"(SELECT d.{column} FROM {table} d WHERE d.{key} = {alias}.{foreign_key})"
+
+def dimension_key_sql(column: str, value: str) -> str:
+    """SQL looking up the key of a moved column's text, e.g. '?' for a filter parameter"""
+    table, key, _ = OPPORTUNITY_DIMENSIONS[column]
+    return f"(SELECT d.{key} FROM {table} d WHERE d.{column} = {value})"
+
+class DimensionMap:
+    """In-memory copy of the dimension tables, to put the moved columns back into rows.
+
+    Rows are only ever added to the dimension tables, so a key missing from
+    the map only means the map is out of date. It is then reloaded from the
+    database the rows came from, the live one or a snapshot, and merged in.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Dict[int, str]] = {column: {} for column in OPPORTUNITY_DIMENSIONS}
+        self._lock = threading.Lock()
+
+    def load(self, db):
+        cursor = db.cursor()
+        loaded = {}
+        for column, (table, key, _) in OPPORTUNITY_DIMENSIONS.items():
+            cursor.execute(f"SELECT {key}, {column} FROM {table}")
+            loaded[column] = cursor.fetchall()
+        with self._lock:
+            for column, rows in loaded.items():
+                self._values[column].update((row[0], row[1]) for row in rows)
+
+    def value(self, db, column: str, key: Optional[int]) -> Optional[str]:
+        if key is None:
+            return None
+        values = self._values[column]
+        if key not in values:
+            self.load(db)
+        return values.get(key)
+
+    def decorate(self, db, records: List[dict]) -> List[dict]:
+        """Replace the key of each moved column with its text in records, in place.
+
+        Records that already have the text, such as as_of states rebuilt
+        from snapshots, keep it. The keys are removed either way, so
+        responses look as they did before migration 011.
+        """
+        for record in records:
+            for column, (_, _, foreign_key) in OPPORTUNITY_DIMENSIONS.items():
+                if foreign_key in record:
+                    key = record.pop(foreign_key)
+                    if column not in record:
+                        record[column] = self.value(db, column, key)
+            record.pop(FISCAL_PERIOD_KEY, None)
+        return records
+
+    def row_decorator(self, db, columns: List[str]) -> Tuple[List[str], Optional[Callable[[tuple], tuple]]]:
+        """(columns, function) turning row tuples into the exported columns.
+
+        The moved columns' text is appended and the keys and STORAGE_COLUMNS
+        are left out. The function is None when the rows need neither.
+        """
+        positions = [
+            (column, columns.index(foreign_key))
+            for column, (_, _, foreign_key) in OPPORTUNITY_DIMENSIONS.items()
+            if foreign_key in columns and column not in columns
+        ]
+        kept = [index for index, column in enumerate(columns) if column not in KEY_COLUMNS | STORAGE_COLUMNS]
+        if not positions and len(kept) == len(columns):
+            return columns, None
+
+        def decorate_row(row: tuple) -> tuple:
+            return tuple(row[index] for index in kept) + tuple(self.value(db, column, row[position]) for column, position in positions)
+
+        return [columns[index] for index in kept] + [column for column, _ in positions], decorate_row
+
+    def encode(self, db, values: dict) -> dict:
+        """Values to write to opportunities, with the moved columns replaced by their keys.
+
+        Text not seen before gets a new dimension row. A fiscal_period also
+        writes the key of its fiscal_periods row (migration 010), or NULL
+        when the label names no period, as migration 011 does.
+        """
+        encoded = {}
+        cursor = db.cursor()
+        for column, value in values.items():
+            if column not in OPPORTUNITY_DIMENSIONS:
+                encoded[column] = value
+                continue
+            table, key, foreign_key = OPPORTUNITY_DIMENSIONS[column]
+            if column == "fiscal_period":
+                cursor.execute("SELECT period_key FROM fiscal_periods WHERE period_key = ?",
+                               (period_key(value) if value is not None else None,))
+                period = cursor.fetchone()
+                encoded[FISCAL_PERIOD_KEY] = period[0] if period else None
+            if value is None:
+                encoded[foreign_key] = None
+                continue
+            cursor.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+            cursor.execute(f"SELECT {key} FROM {table} WHERE {column} = ?", (value,))
+            encoded[foreign_key] = cursor.fetchone()[0]
+        return encoded
+
+dimensions = DimensionMap()
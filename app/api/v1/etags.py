@@ -0,0 +1,56 @@
+import hashlib
+import sqlite3
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+def make_etag(*parts) -> str:
+    """Weak ETag over any repr-able values"""
+    digest = hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def write_versions(cursor: sqlite3.Cursor, tables: Tuple[str, ...]) -> Dict[str, int]:
+    """Write version of each table from table_write_versions (migration 012), 0 if never written"""
+    try:
+        cursor.execute(
+            f"SELECT table_name, version FROM table_write_versions WHERE table_name IN ({', '.join('?' * len(tables))})",
+            tables
+        )
+    except sqlite3.OperationalError:
+        raise HTTPException(status_code=503, detail="ETags need migration 012_table_write_versions.sql")
+    versions = dict(cursor.fetchall())
+    return {table: versions.get(table, 0) for table in tables}
+
+def resource_etag(request: Request, cursor: sqlite3.Cursor, query: str, params: tuple,
+                  tables: Tuple[str, ...]) -> Optional[str]:
+    """ETag for a resource from a cheap aggregate query, or None if it matches no row.
+
+    The aggregate catches changes visible in timestamps and counts. Changes
+    without a timestamp (a renamed account, an edited engagement) are caught
+    by the write versions of the tables the resource joins. Both are kept in
+    the database, so the ETag is the same in every worker and across restarts.
+    """
+    cursor.execute(query, params)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    versions = write_versions(cursor, tables)
+    return make_etag(
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        tuple(row),
+        sorted(versions.items())
+    )
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """Whether If-None-Match names etag, using weak comparison"""
+    header = request.headers.get('if-none-match')
+    if not header or not etag:
+        return False
+    if header.strip() == '*':
+        return True
+    opaque = lambda tag: tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()
+    return opaque(etag) in {opaque(tag) for tag in header.split(',')}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,314 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional, List
+from datetime import date, datetime
+from sqlite3 import Error
+import csv
+import io
+import json
+import zlib
+from .snapshots import get_snapshot_db, snapshot_headers
+from .dates import day_number, sql_datetime
+from .dimensions import dimensions
+from .opportunities import opportunity_filter_clause
+
+router = APIRouter(prefix="/api/export", tags=["Export"])
+
+# Rows pulled from the cursor per chunk written to the response
+BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson"
+}
+
+def encode_batch(rows: list, columns: list, format: str) -> bytes:
+    """Encode a batch of row tuples as CSV lines or NDJSON records"""
+    if format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=str) + "\n"
+        for row in rows
+    ).encode("utf-8")
+
+def stream_query(entity: str, query: str, params: list, format: str, gzip: bool) -> StreamingResponse:
+    """Run query on a dedicated connection and stream its rows in batches"""
+    # The generator is advanced from the threadpool, so the connection
+    # must not be bound to the thread that opened it. Exports read the latest
+    # snapshot so long downloads neither block nor observe concurrent writes
+    db, snapshot = get_snapshot_db(check_same_thread=False)
+    try:
+        cursor = db.cursor()
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        # Rows with dimension keys get the text columns added at the end, and
+        # columns only kept for storage are left out
+        columns, decorate_row = dimensions.row_decorator(db, [column[0] for column in cursor.description])
+    except Error as e:
+        db.close()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    def generate():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+        try:
+            batch = [columns] if format == "csv" else []
+            while True:
+                rows = cursor.fetchmany(BATCH_SIZE)
+                batch.extend(map(decorate_row, rows) if decorate_row else rows)
+                if not batch:
+                    break
+                chunk = encode_batch(batch, columns, format)
+                batch = []
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+
+            if compressor:
+                yield compressor.flush()
+        finally:
+            db.close()
+
+    extension = f"{format}.gz" if gzip else format
+    headers = {"Content-Disposition": f'attachment; filename="{entity}.{extension}"'}
+    headers.update(snapshot_headers(snapshot))
+    # A .gz file to save as it is, not a csv clients would transparently decode
+    media_type = "application/gzip" if gzip else MEDIA_TYPES[format]
+
+    return StreamingResponse(generate(), media_type=media_type, headers=headers)
+
+@router.get("/opportunities")
+async def export_opportunities(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    accountId: Optional[int] = None,
+    ownerId: Optional[int] = None,
+    stageId: Optional[int] = None,
+    fiscalPeriod: Optional[str] = None,
+    closeDateStart: Optional[date] = None,
+    closeDateEnd: Optional[date] = None,
+    minAmount: Optional[float] = None,
+    maxAmount: Optional[float] = None,
+    type: Optional[str] = None,
+    leadSource: Optional[str] = None,
+    ownerIds: Optional[List[int]] = Query(None),
+    orderBy: str = Query("opportunity_id", pattern="^(opportunity_id|owner_id)$")
+):
+    query = """
+        SELECT
+            o.*,
+            a.account_name,
+            u.full_name as owner_name,
+            s.stage_name as current_stage_name,
+            ps.source_name,
+            pp.activity as project_activity,
+            pp.deliverables as project_deliverables,
+            pp.priority as project_priority,
+            pp.due_date as project_due_date,
+            pp.status as project_status,
+            GROUP_CONCAT(DISTINCT i.influencer_id || ':' || i.first_name || ' ' || i.last_name || ':' || i.title || ':' || i.role || ':' || i.influence_level) as influencers
+        FROM opportunities o
+        LEFT JOIN accounts a ON o.account_id = a.account_id
+        LEFT JOIN users u ON o.owner_id = u.user_id
+        LEFT JOIN stages s ON o.stage_id = s.stage_id
+        LEFT JOIN pipeline_sources ps ON o.source_id = ps.source_id
+        LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
+        LEFT JOIN influencer_engagements ie ON o.opportunity_id = ie.opportunity_id
+        LEFT JOIN influencers i ON ie.influencer_id = i.influencer_id
+        WHERE 1=1
+    """
+    # The list endpoint's filters, plus the export-only ownerIds
+    clause, params = opportunity_filter_clause({
+        "accountId": accountId,
+        "ownerId": ownerId,
+        "stageId": stageId,
+        "fiscalPeriod": fiscalPeriod,
+        "closeDateStart": closeDateStart,
+        "closeDateEnd": closeDateEnd,
+        "minAmount": minAmount,
+        "maxAmount": maxAmount,
+        "type": type,
+        "leadSource": leadSource
+    })
+    query += clause
+    if ownerIds:
+        query += f" AND o.owner_id IN ({', '.join('?' * len(ownerIds))})"
+        params.extend(ownerIds)
+
+    # Primary key order lets SQLite group and stream without a temp sort;
+    # owner order keeps each owner's opportunities contiguous for fan-out
+    query += " GROUP BY o.opportunity_id"
+    if orderBy == "owner_id":
+        query += " ORDER BY o.owner_id, o.created_date DESC"
+    else:
+        query += " ORDER BY o.opportunity_id"
+
+    return stream_query("opportunities", query, params, format, gzip)
+
+@router.get("/accounts")
+async def export_accounts(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False
+):
+    query = """
+        SELECT
+            a.account_id,
+            a.account_name,
+            a.created_at,
+            COUNT(DISTINCT o.opportunity_id) as opportunity_count,
+            SUM(CASE WHEN o.is_closed = 0 THEN o.total_amount ELSE 0 END) as open_opportunity_value,
+            SUM(CASE WHEN o.is_closed = 1 AND o.is_won = 1 THEN o.total_amount ELSE 0 END) as won_opportunity_value
+        FROM accounts a
+        LEFT JOIN opportunities o ON a.account_id = o.account_id
+        GROUP BY a.account_id
+        ORDER BY a.account_id
+    """
+
+    return stream_query("accounts", query, [], format, gzip)
+
+@router.get("/users")
+async def export_users(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False
+):
+    query = """
+        SELECT
+            u.*,
+            COUNT(DISTINCT o.opportunity_id) as opportunity_count,
+            SUM(CASE WHEN o.is_closed = 0 THEN o.total_amount ELSE 0 END) as open_opportunity_value,
+            SUM(CASE WHEN o.is_closed = 1 AND o.is_won = 1 THEN o.total_amount ELSE 0 END) as won_opportunity_value
+        FROM users u
+        LEFT JOIN opportunities o ON u.user_id = o.owner_id
+        GROUP BY u.user_id
+        ORDER BY u.user_id
+    """
+
+    return stream_query("users", query, [], format, gzip)
+
+@router.get("/support-requests")
+async def export_support_requests(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    opportunity_id: Optional[int] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    assigned_to: Optional[int] = None,
+    request_type: Optional[str] = None
+):
+    query = """
+        SELECT
+            sr.*,
+            o.opportunity_name,
+            a.account_name,
+            requester.full_name as requested_by_name,
+            assignee.full_name as assigned_to_name
+        FROM support_requests sr
+        LEFT JOIN opportunities o ON sr.opportunity_id = o.opportunity_id
+        LEFT JOIN accounts a ON o.account_id = a.account_id
+        LEFT JOIN users requester ON sr.requested_by = requester.user_id
+        LEFT JOIN users assignee ON sr.assigned_to = assignee.user_id
+        WHERE 1=1
+    """
+    params = []
+
+    if opportunity_id:
+        query += " AND sr.opportunity_id = ?"
+        params.append(opportunity_id)
+
+    if status:
+        query += " AND sr.status = ?"
+        params.append(status)
+
+    if priority:
+        query += " AND sr.priority = ?"
+        params.append(priority)
+
+    if assigned_to:
+        query += " AND sr.assigned_to = ?"
+        params.append(assigned_to)
+
+    if request_type:
+        query += " AND sr.request_type = ?"
+        params.append(request_type)
+
+    query += " ORDER BY sr.request_id"
+
+    return stream_query("support_requests", query, params, format, gzip)
+
+@router.get("/influencers")
+async def export_influencers(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    account_id: Optional[int] = None
+):
+    query = """
+        SELECT
+            i.*,
+            a.account_name,
+            COUNT(DISTINCT ie.engagement_id) as total_engagements,
+            COUNT(DISTINCT ie.opportunity_id) as total_opportunities
+        FROM influencers i
+        LEFT JOIN accounts a ON i.account_id = a.account_id
+        LEFT JOIN influencer_engagements ie ON i.influencer_id = ie.influencer_id
+        WHERE 1=1
+    """
+    params = []
+
+    if account_id:
+        query += " AND i.account_id = ?"
+        params.append(account_id)
+
+    query += " GROUP BY i.influencer_id ORDER BY i.influencer_id"
+
+    return stream_query("influencers", query, params, format, gzip)
+
+@router.get("/influencer-engagements")
+async def export_engagements(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    influencer_id: Optional[int] = None,
+    opportunity_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    engagement_type: Optional[str] = None
+):
+    query = """
+        SELECT
+            e.*,
+            i.first_name || ' ' || i.last_name as influencer_name,
+            o.opportunity_name,
+            u.full_name as created_by_name
+        FROM influencer_engagements e
+        LEFT JOIN influencers i ON e.influencer_id = i.influencer_id
+        LEFT JOIN opportunities o ON e.opportunity_id = o.opportunity_id
+        LEFT JOIN users u ON e.created_by = u.user_id
+        WHERE 1=1
+    """
+    params = []
+
+    if influencer_id:
+        query += " AND e.influencer_id = ?"
+        params.append(influencer_id)
+
+    if opportunity_id:
+        query += " AND e.opportunity_id = ?"
+        params.append(opportunity_id)
+
+    if start_date:
+        query += " AND e.engagement_day >= ? AND datetime(e.engagement_date) >= ?"
+        params.extend([day_number(start_date), sql_datetime(start_date)])
+
+    if end_date:
+        query += " AND e.engagement_day <= ? AND datetime(e.engagement_date) <= ?"
+        params.extend([day_number(end_date), sql_datetime(end_date)])
+
+    if engagement_type:
+        query += " AND e.engagement_type = ?"
+        params.append(engagement_type)
+
+    query += " ORDER BY e.engagement_id"
+
+    return stream_query("influencer_engagements", query, params, format, gzip)
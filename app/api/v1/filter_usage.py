@@ -0,0 +1,63 @@
+import os
+import random
+import threading
+from collections import Counter
+from datetime import date, datetime
+from typing import Dict, List
+from .json_log import JsonLinesLog
+
+# --- Configuration ---
+FILTER_USAGE_LOG = os.environ.get('FILTER_USAGE_LOG', os.path.join('logs', 'filter_usage.log'))
+FILTER_USAGE_LOG_MAX_BYTES = int(os.environ.get('FILTER_USAGE_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+FILTER_USAGE_LOG_BACKUPS = int(os.environ.get('FILTER_USAGE_LOG_BACKUPS', '5'))
+# Fraction of list requests recorded, e.g. 0.05; 0 disables recording
+FILTER_USAGE_SAMPLE = float(os.environ.get('FILTER_USAGE_SAMPLE', '0'))
+
+def json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+class FilterUsageLog:
+    """Filter combinations used on list endpoints, for the index advisor.
+
+    Each sampled request is appended to a JSON-lines log with the values of
+    the filters it set, and counted in memory by endpoint and filter names.
+    The log is written by a background thread, off the request path.
+    """
+
+    def __init__(self, path: str = FILTER_USAGE_LOG, sample: float = FILTER_USAGE_SAMPLE):
+        self.sample = sample
+        self._log = JsonLinesLog("filter_usage", path, FILTER_USAGE_LOG_MAX_BYTES, FILTER_USAGE_LOG_BACKUPS,
+                                 background=True)
+        self._lock = threading.Lock()
+        self._combinations: Counter = Counter()
+
+    def record(self, endpoint: str, filters: Dict[str, object]):
+        if self.sample <= 0 or (self.sample < 1 and random.random() >= self.sample):
+            return
+        used = {name: json_value(value) for name, value in filters.items() if value}
+        self._log.write({
+            "timestamp": datetime.now().isoformat(),
+            "endpoint": endpoint,
+            "filters": used
+        })
+        with self._lock:
+            self._combinations[(endpoint, tuple(sorted(used)))] += 1
+
+    def top(self, limit: int = 50) -> List[dict]:
+        """Most frequent filter combinations since startup"""
+        with self._lock:
+            return [
+                {"endpoint": endpoint, "filters": list(names), "count": count}
+                for (endpoint, names), count in self._combinations.most_common(limit)
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._combinations.clear()
+
+    def close(self):
+        self._log.close()
+
+filter_usage = FilterUsageLog()
@@ -0,0 +1,32 @@
+import re
+from datetime import date, datetime, timezone
+from typing import Optional
+from .dates import day_number
+
+# fiscal_calendar and fiscal_periods (migration 010) map dates to fiscal
+# periods. Period keys are fiscal_year * 10 + quarter number, the value of
+# opportunities.fiscal_period_id and the generated fiscal_period_key columns.
+FISCAL_PERIOD_LABEL = re.compile(r"Q([1-4])-([0-9]{4})")
+
+def period_key(label: str) -> Optional[int]:
+    """Period key of a fiscal_period label such as 'Q2-2024', as migration 011 reads it"""
+    match = FISCAL_PERIOD_LABEL.match(label)
+    return int(match.group(2)) * 10 + int(match.group(1)) if match else None
+
+def period_key_sql(column: str) -> str:
+    """SQL computing the period key of a fiscal_period column the way migration 011 does"""
+    return (
+        f"CASE WHEN {column} GLOB 'Q[1-4]-[0-9][0-9][0-9][0-9]*' "
+        f"THEN CAST(substr({column}, 4, 4) AS INTEGER) * 10 + CAST(substr({column}, 2, 1) AS INTEGER) END"
+    )
+
+def current_period(cursor, today: Optional[date] = None) -> Optional[dict]:
+    """fiscal_periods row containing today (UTC), None outside the calendar"""
+    cursor.execute("""
+        SELECT p.*
+        FROM fiscal_calendar c
+        JOIN fiscal_periods p ON p.period_key = c.period_key
+        WHERE c.day_id = ?
+    """, (day_number(today or datetime.now(timezone.utc).date()),))
+    row = cursor.fetchone()
+    return dict(row) if row else None
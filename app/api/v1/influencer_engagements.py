@@ -3,6 +3,11 @@ from typing import Optional
 import sqlite3
 from datetime import datetime
 from pydantic import BaseModel
+from .database import get_db
+from .serialization import FastJSONResponse, fetch_records, public_record
+from .cache import invalidate
+from .archive import archive_source
+from .dates import day_number, sql_datetime
 
 router = APIRouter(prefix="/api/influencer-engagements", tags=["Influencer Engagements"])
 
@@ -25,11 +30,6 @@ class EngagementUpdate(BaseModel):
     outcome: Optional[str] = None
     next_steps: Optional[str] = None
 
-def get_db():
-    conn = sqlite3.connect('sales_data.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
 @router.get("")
 async def list_engagements(
     page: int = Query(1, ge=1),
@@ -38,22 +38,33 @@ async def list_engagements(
     opportunity_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    engagement_type: Optional[str] = None
+    engagement_type: Optional[str] = None,
+    includeArchived: bool = Query(False, description="Also list engagements of archived opportunities")
 ):
     try:
         db = get_db()
         cursor = db.cursor()
         
+        # Archived engagements look their opportunity up in the archive by
+        # index, a join on the union of both tables would not use one
+        opportunity_name = "o.opportunity_name"
+        archived_join = ""
+        if includeArchived:
+            opportunity_name = "COALESCE(o.opportunity_name, ao.opportunity_name) as opportunity_name"
+            archived_join = "LEFT JOIN archived_opportunities ao ON e.opportunity_id = ao.opportunity_id"
+
         # Base query
-        query = """
-            SELECT 
+        select_list = f"""
                 e.*,
                 i.first_name || ' ' || i.last_name as influencer_name,
-                o.opportunity_name,
-                u.full_name as created_by_name
-            FROM influencer_engagements e
+                {opportunity_name},
+                u.full_name as created_by_name"""
+        query = f"""
+            SELECT {select_list}
+            FROM {archive_source(cursor, "influencer_engagements", includeArchived)} e
             LEFT JOIN influencers i ON e.influencer_id = i.influencer_id
             LEFT JOIN opportunities o ON e.opportunity_id = o.opportunity_id
+            {archived_join}
             LEFT JOIN users u ON e.created_by = u.user_id
             WHERE 1=1
         """
@@ -67,23 +78,22 @@ async def list_engagements(
             query += " AND e.opportunity_id = ?"
             params.append(opportunity_id)
         
+        # The day number picks the range from its index, the datetime trims
+        # the first and last day to the exact time
         if start_date:
-            query += " AND e.engagement_date >= ?"
-            params.append(start_date.isoformat())
+            query += " AND e.engagement_day >= ? AND datetime(e.engagement_date) >= ?"
+            params.extend([day_number(start_date), sql_datetime(start_date)])
         
         if end_date:
-            query += " AND e.engagement_date <= ?"
-            params.append(end_date.isoformat())
+            query += " AND e.engagement_day <= ? AND datetime(e.engagement_date) <= ?"
+            params.extend([day_number(end_date), sql_datetime(end_date)])
         
         if engagement_type:
             query += " AND e.engagement_type = ?"
             params.append(engagement_type)
         
         # Get total count
-        count_query = query.replace(
-            "SELECT \n                e.*,\n                i.first_name || ' ' || i.last_name as influencer_name,\n                o.opportunity_name,\n                u.full_name as created_by_name", 
-            "SELECT COUNT(*)"
-        )
+        count_query = query.replace(select_list, " COUNT(*)", 1)
         cursor.execute(count_query, params)
         total_records = cursor.fetchone()[0]
         
@@ -93,14 +103,14 @@ async def list_engagements(
         query += f" LIMIT {limit} OFFSET {offset}"
         
         cursor.execute(query, params)
-        engagements = [dict(row) for row in cursor.fetchall()]
+        engagements = fetch_records(cursor)
         
-        return {
+        return FastJSONResponse({
             "totalRecords": total_records,
             "totalPages": (total_records + limit - 1) // limit,
             "currentPage": page,
             "data": engagements
-        }
+        })
         
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -121,11 +131,12 @@ async def get_engagement(engagement_id: int = Path(..., ge=1)):
                 i.email as influencer_email,
                 o.opportunity_name,
                 o.total_amount as opportunity_amount,
-                o.stage_name as opportunity_stage,
+                osn.stage_name as opportunity_stage,
                 u.full_name as created_by_name
             FROM influencer_engagements e
             LEFT JOIN influencers i ON e.influencer_id = i.influencer_id
             LEFT JOIN opportunities o ON e.opportunity_id = o.opportunity_id
+            LEFT JOIN opportunity_stage_names osn ON o.stage_name_id = osn.stage_name_id
             LEFT JOIN users u ON e.created_by = u.user_id
             WHERE e.engagement_id = ?
         """, (engagement_id,))
@@ -134,7 +145,7 @@ async def get_engagement(engagement_id: int = Path(..., ge=1)):
         if not engagement:
             raise HTTPException(status_code=404, detail="Engagement not found")
         
-        return dict(engagement)
+        return public_record(engagement)
         
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -185,6 +196,7 @@ async def create_engagement(engagement: EngagementCreate):
         
         engagement_id = cursor.lastrowid
         db.commit()
+        invalidate("influencer_engagements")
         
         # Get created engagement
         cursor.execute("""
@@ -199,7 +211,7 @@ async def create_engagement(engagement: EngagementCreate):
             LEFT JOIN users u ON e.created_by = u.user_id
             WHERE e.engagement_id = ?
         """, (engagement_id,))
-        created_engagement = dict(cursor.fetchone())
+        created_engagement = public_record(cursor.fetchone())
         
         return created_engagement
         
@@ -257,6 +269,7 @@ async def update_engagement(
             
             cursor.execute(query, params)
             db.commit()
+            invalidate("influencer_engagements")
         
         # Get updated engagement
         cursor.execute("""
@@ -271,7 +284,7 @@ async def update_engagement(
             LEFT JOIN users u ON e.created_by = u.user_id
             WHERE e.engagement_id = ?
         """, (engagement_id,))
-        updated_engagement = dict(cursor.fetchone())
+        updated_engagement = public_record(cursor.fetchone())
         
         return updated_engagement
         
@@ -299,6 +312,7 @@ async def delete_engagement(engagement_id: int = Path(..., ge=1)):
         cursor.execute("DELETE FROM influencer_engagements WHERE engagement_id = ?", 
                       (engagement_id,))
         db.commit()
+        invalidate("influencer_engagements")
         
         return {"message": "Engagement deleted successfully"}
         
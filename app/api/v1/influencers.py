@@ -1,12 +1,36 @@
-from fastapi import APIRouter, HTTPException, Query, Path, Body
+from fastapi import APIRouter, HTTPException, Query, Path, Body, Request
 from typing import Optional, List
 from datetime import datetime
 import sqlite3
 from pydantic import BaseModel, EmailStr
 from .database import get_db
+from .serialization import FastJSONResponse, fetch_records
+from .cache import invalidate
+from .etags import resource_etag, etag_matches, not_modified
 
 router = APIRouter(prefix="/api/influencers", tags=["Influencers"])
 
+# Tables joined into influencer responses; their write versions feed the ETags
+ETAG_TABLES = ("influencers", "accounts", "influencer_engagements", "opportunities", "users")
+
+# Cheap aggregates checked before the joins, so unchanged resources get a 304
+LIST_ETAG_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM influencers),
+        (SELECT MAX(last_modified_date) FROM influencers),
+        (SELECT COUNT(*) FROM influencer_engagements),
+        (SELECT MAX(engagement_id) FROM influencer_engagements)
+"""
+
+DETAIL_ETAG_QUERY = """
+    SELECT
+        i.last_modified_date,
+        (SELECT COUNT(*) FROM influencer_engagements WHERE influencer_id = i.influencer_id),
+        (SELECT MAX(engagement_id) FROM influencer_engagements WHERE influencer_id = i.influencer_id)
+    FROM influencers i
+    WHERE i.influencer_id = ?
+"""
+
 class InfluencerBase(BaseModel):
     first_name: str
     last_name: str
@@ -27,6 +51,7 @@ class InfluencerUpdate(BaseModel):
     title: Optional[str] = None
     email: Optional[str] = None
     phone: Optional[str] = None
+    account_id: Optional[int] = None
     role: Optional[str] = None
     influence_level: Optional[str] = None
     notes: Optional[str] = None
@@ -43,6 +68,7 @@ class EngagementCreate(BaseModel):
 
 @router.get("")
 async def get_influencers(
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     account_id: Optional[int] = None
@@ -50,6 +76,10 @@ async def get_influencers(
     try:
         db = get_db()
         cursor = db.cursor()
+
+        etag = resource_etag(request, cursor, LIST_ETAG_QUERY, (), ETAG_TABLES)
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
         query = """
             SELECT 
@@ -84,14 +114,14 @@ async def get_influencers(
         params.extend([limit, offset])
         
         cursor.execute(query, params)
-        influencers = [dict(row) for row in cursor.fetchall()]
+        influencers = fetch_records(cursor)
         
-        return {
+        return FastJSONResponse({
             "totalRecords": total_records,
             "totalPages": (total_records + limit - 1) // limit,
             "currentPage": page,
             "data": influencers
-        }
+        }, headers={"ETag": etag})
         
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -99,10 +129,16 @@ async def get_influencers(
         db.close()
 
 @router.get("/{influencer_id}")
-async def get_influencer(influencer_id: int = Path(..., ge=1)):
+async def get_influencer(request: Request, influencer_id: int = Path(..., ge=1)):
     try:
         db = get_db()
         cursor = db.cursor()
+
+        etag = resource_etag(request, cursor, DETAIL_ETAG_QUERY, (influencer_id,), ETAG_TABLES)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="Influencer not found")
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
         # Get influencer details
         cursor.execute("""
@@ -133,10 +169,10 @@ async def get_influencer(influencer_id: int = Path(..., ge=1)):
             ORDER BY ie.engagement_date DESC
         """, (influencer_id,))
         
-        engagements = [dict(row) for row in cursor.fetchall()]
+        engagements = fetch_records(cursor)
         influencer_dict['engagements'] = engagements
         
-        return influencer_dict
+        return FastJSONResponse(influencer_dict, headers={"ETag": etag})
         
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -171,6 +207,7 @@ async def create_influencer(influencer: InfluencerCreate):
         
         influencer_id = cursor.lastrowid
         db.commit()
+        invalidate("influencers")
         
         return {"message": "Influencer created successfully", "influencer_id": influencer_id}
         
@@ -248,6 +285,7 @@ async def update_influencer(
         cursor.execute(query, params)
         
         db.commit()
+        invalidate("influencers")
         return {"message": "Influencer updated successfully"}
         
     except sqlite3.Error as e:
@@ -282,6 +320,7 @@ async def delete_influencer(influencer_id: int = Path(..., ge=1)):
         cursor.execute("DELETE FROM influencers WHERE influencer_id = ?", 
                       (influencer_id,))
         db.commit()
+        invalidate("influencers")
         
         return {"message": "Influencer deleted successfully"}
         
@@ -323,13 +362,14 @@ async def create_engagement(engagement: EngagementCreate):
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
         """, (
             engagement.influencer_id, engagement.opportunity_id,
-            engagement.engagement_date, engagement.engagement_type,
+            engagement.engagement_date.isoformat(), engagement.engagement_type,
             engagement.description, engagement.outcome,
             engagement.next_steps, engagement.created_by
         ))
         
         engagement_id = cursor.lastrowid
         db.commit()
+        invalidate("influencer_engagements")
         
         return {"message": "Engagement created successfully", "engagement_id": engagement_id}
         
@@ -371,7 +411,7 @@ async def get_opportunity_influencers(opportunity_id: int = Path(..., ge=1)):
             ORDER BY ie.engagement_date DESC
         """, (opportunity_id,))
         
-        influencers = [dict(row) for row in cursor.fetchall()]
+        influencers = fetch_records(cursor)
         return influencers
         
     except sqlite3.Error as e:
@@ -411,7 +451,7 @@ async def get_opportunity_influencers_simple(opportunity_id: int = Path(..., ge=
             ORDER BY i.last_name, i.first_name
         """, (opportunity_id,))
         
-        influencers = [dict(row) for row in cursor.fetchall()]
+        influencers = fetch_records(cursor)
         return influencers
         
     except sqlite3.Error as e:
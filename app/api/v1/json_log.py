@@ -0,0 +1,56 @@
+import os
+import json
+import queue
+import logging
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+class JsonLinesLog:
+    """Rotating JSON-lines file, opened on first write.
+
+    With background=True, write() only queues the line and a listener thread
+    writes it, so callers on the event loop never wait on the file.
+    """
+
+    def __init__(self, name: str, path: str, max_bytes: int, backups: int, background: bool = False):
+        self.name = name
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.background = background
+        self._logger = None
+        self._listener = None
+
+    def write(self, entry: dict):
+        try:
+            if self._logger is None:
+                self._logger = self._open()
+            self._logger.info(json.dumps(entry, default=str))
+        except OSError as e:
+            logging.warning(f"Could not write {self.name} log: {str(e)}")
+
+    def _open(self) -> logging.Logger:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        logger = logging.getLogger(self.name)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            if self.background:
+                lines = queue.SimpleQueue()
+                self._listener = QueueListener(lines, handler)
+                self._listener.start()
+                handler = QueueHandler(lines)
+            logger.addHandler(handler)
+        return logger
+
+    def close(self):
+        """Write out queued lines and stop the listener thread"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            # Reopened by the next write
+            for handler in list(self._logger.handlers):
+                self._logger.removeHandler(handler)
+                handler.close()
+            self._logger = None
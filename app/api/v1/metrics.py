@@ -0,0 +1,254 @@
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Match
+from .slow_queries import slow_query_log
+
+router = APIRouter(tags=["Metrics"])
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+class RequestStats:
+    """SQL activity of one request, collected by the instrumented connection"""
+    __slots__ = ('statements', 'sql_seconds', 'rows')
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+
+# Set by the middleware; copied into threadpool workers with the request context
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar('current_stats', default=None)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that charges statement time and fetched rows to the current request.
+
+    A statement's time runs from execute() until its last row is fetched, and
+    statements over the slow query threshold are handed to the slow query log.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sql = None
+        self._parameters = None
+        self._elapsed = 0.0
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._begin(sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._begin(sql, None, time.perf_counter() - started)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._count(1)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        self._count(len(rows))
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._count(len(rows))
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _begin(self, sql, parameters, elapsed: float):
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = elapsed
+        stats = current_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+
+    def _timed(self, fetch, *args):
+        # Rows are produced lazily by SQLite, so stepping them is query time too
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._elapsed += elapsed
+            stats = current_stats.get()
+            if stats is not None:
+                stats.sql_seconds += elapsed
+
+    def _count(self, rows: int):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.rows += rows
+
+    def _finish(self):
+        if self._sql is not None and self._elapsed >= slow_query_log.threshold:
+            slow_query_log.record(self.connection, self._sql, self._parameters, self._elapsed)
+        self._sql = None
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including conn.execute(), are instrumented"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Per-route request and SQL metrics rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str, str], int] = {}
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._statements: Dict[Tuple[str, str], Histogram] = {}
+        self._sql_seconds: Dict[Tuple[str, str], Histogram] = {}
+        self._rows: Dict[Tuple[str, str], Histogram] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self._lock:
+            status_key = (method, route, str(status))
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            self._histogram(self._latency, key, LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self._statements, key, STATEMENT_BUCKETS).observe(stats.statements)
+            self._histogram(self._sql_seconds, key, LATENCY_BUCKETS).observe(stats.sql_seconds)
+            self._histogram(self._rows, key, ROW_BUCKETS).observe(stats.rows)
+
+    @staticmethod
+    def _histogram(histograms: dict, key: tuple, buckets: tuple) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_requests_total Requests handled, by route and status")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            for name, help_text, histograms in [
+                ("http_request_duration_seconds", "Request latency until the last body chunk is sent", self._latency),
+                ("db_statements_per_request", "SQL statements executed per request", self._statements),
+                ("db_duration_seconds_per_request", "Time spent executing and fetching SQL per request", self._sql_seconds),
+                ("db_rows_per_request", "Rows fetched from SQLite per request", self._rows)
+            ]:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (method, route), histogram in sorted(histograms.items()):
+                    labels = f'method="{method}",route="{route}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+def route_template(app, scope) -> str:
+    """Path template of the route that handled the request, to keep label cardinality bounded"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Responses served by middleware (cache hits, 304s) never reach the router
+    for candidate in app.routes:
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return "unmatched"
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its response body is complete"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if not recorded:
+                recorded = True
+                registry.observe(scope["method"], route_template(scope["app"], scope), status,
+                                 time.perf_counter() - started, stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
+            current_stats.reset(token)
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of the collected metrics"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,8 +1,21 @@
-from fastapi import APIRouter, HTTPException, Path, Query
-from typing import Optional
+import os
+import json
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from typing import Dict, List, Optional
+from collections import defaultdict
 from datetime import date
 from sqlite3 import Error
 from .database import get_db
+from .serialization import FastJSONResponse, fetch_records, public_record
+from .cache import invalidate, DIMENSION_TABLES
+from .etags import resource_etag, etag_matches, not_modified
+from .filter_usage import filter_usage
+from .details import placeholders
+from .opportunity_snapshots import parse_as_of, state_query
+from .archive import archive_source
+from .dates import day_number
+from .fiscal import period_key
+from .dimensions import dimensions, dimension_key_sql
 from pydantic import BaseModel
 from typing import Optional as OptionalType
 
@@ -28,10 +41,190 @@ class OpportunityUpdate(BaseModel):
     project_plan: OptionalType[ProjectPlanUpdate] = None
     changed_by: OptionalType[int] = None  # User ID who made the change
 
+class OpportunityBulkUpdate(BaseModel):
+    id: int
+    changes: OpportunityUpdate
+
 router = APIRouter(prefix="/api/opportunities", tags=["Opportunities"])
 
+# Opportunity columns an update can set, in the order history rows are written
+OPPORTUNITY_UPDATE_FIELDS = [
+    "opportunity_name", "next_step", "total_amount", "currency", "stage_name", "probability_percentage",
+    "type", "fiscal_period", "lead_source", "blockers", "support_needed"
+]
+# Project plan column -> field name recorded in opportunity_history
+PROJECT_PLAN_UPDATE_FIELDS = {
+    "activity": "project_activity",
+    "deliverables": "project_deliverables",
+    "priority": "project_priority",
+    "due_date": "project_due_date",
+    "status": "project_status"
+}
+# Upper bound on updates per bulk request, well below SQLite's bound parameter limit
+MAX_BULK_UPDATES = 500
+# 'rows' writes one opportunity_history row per changed field; 'changesets' writes
+# one opportunity_changesets row per update (needs migration 005)
+HISTORY_STORAGE = os.environ.get('HISTORY_STORAGE', 'rows').lower()
+# Per-field history as get_opportunity_history returns it
+HISTORY_SOURCE = "opportunity_history_fields" if HISTORY_STORAGE == "changesets" else "opportunity_history"
+# Order in which changes were made, for rows sharing a timestamp
+HISTORY_ORDER = (
+    "h.changed_at, h.changeset_id, h.history_id" if HISTORY_STORAGE == "changesets" else "h.changed_at, h.history_id"
+)
+# Fields whose past values as_of reconstructs from history
+HISTORY_FIELDS = OPPORTUNITY_UPDATE_FIELDS + list(PROJECT_PLAN_UPDATE_FIELDS.values())
+
+# Tables joined into opportunity responses; their write versions feed the ETags
+ETAG_TABLES = (
+    "opportunities", "accounts", "users", "stages", "pipeline_sources",
+    "opportunity_project_plan", "influencer_engagements", "influencers"
+)
+
+# Cheap aggregates checked before the joins, so unchanged resources get a 304
+LIST_ETAG_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM opportunities),
+        (SELECT MAX(last_modified_date) FROM opportunities),
+        (SELECT MAX(last_modified_date) FROM opportunity_project_plan),
+        (SELECT COUNT(*) FROM influencer_engagements)
+"""
+
+DETAIL_ETAG_QUERY = """
+    SELECT
+        o.last_modified_date,
+        (SELECT MAX(last_modified_date) FROM opportunity_project_plan WHERE opportunity_id = o.opportunity_id),
+        (SELECT COUNT(*) FROM influencer_engagements WHERE opportunity_id = o.opportunity_id)
+    FROM opportunities o
+    WHERE o.opportunity_id = ?
+"""
+
+OPPORTUNITY_LIST_QUERY = """
+    SELECT
+        o.*,
+        a.account_name,
+        u.full_name as owner_name,
+        s.stage_name as current_stage_name,
+        ps.source_name,
+        o.blockers,
+        o.support_needed,
+        pp.activity as project_activity,
+        pp.deliverables as project_deliverables,
+        pp.priority as project_priority,
+        pp.due_date as project_due_date,
+        pp.status as project_status,
+        GROUP_CONCAT(DISTINCT i.influencer_id || ':' || i.first_name || ' ' || i.last_name || ':' || i.title || ':' || i.role || ':' || i.influence_level) as influencers
+    FROM {opportunities} o
+    LEFT JOIN accounts a ON o.account_id = a.account_id
+    LEFT JOIN users u ON o.owner_id = u.user_id
+    LEFT JOIN stages s ON o.stage_id = s.stage_id
+    LEFT JOIN pipeline_sources ps ON o.source_id = ps.source_id
+    LEFT JOIN {project_plans} pp ON o.opportunity_id = pp.opportunity_id
+    LEFT JOIN {engagements} ie ON o.opportunity_id = ie.opportunity_id
+    LEFT JOIN influencers i ON ie.influencer_id = i.influencer_id
+    WHERE 1=1
+"""
+
+# Tables OPPORTUNITY_LIST_QUERY reads opportunities, project plans and engagements from
+LIVE_SOURCES = {
+    "opportunities": "opportunities",
+    "project_plans": "opportunity_project_plan",
+    "engagements": "influencer_engagements"
+}
+# The views of them defined by opportunity_snapshots.state_query
+AS_OF_SOURCES = {
+    "opportunities": "opportunity_state",
+    "project_plans": "project_plan_state",
+    "engagements": "influencer_engagements"
+}
+
+def archived_sources(cursor, opportunity_ids: List[int]) -> tuple:
+    """LIVE_SOURCES including the archive tables for the given IDs, and their parameters.
+
+    Joining the unions unrestricted would have SQLite build a temporary index
+    over every hot and archived row on each request.
+    """
+    condition = f"opportunity_id IN ({placeholders(opportunity_ids)})"
+    sources = {name: archive_source(cursor, table, True, condition) for name, table in LIVE_SOURCES.items()}
+    return sources, opportunity_ids * 2 * len(sources)
+
+# List filter parameter -> condition on opportunities
+OPPORTUNITY_FILTERS = [
+    ("accountId", "o.account_id = ?"),
+    ("ownerId", "o.owner_id = ?"),
+    ("stageId", "o.stage_id = ?"),
+    ("fiscalPeriod", "o.fiscal_period_id = ?"),
+    ("closeDateStart", "o.close_day >= ?"),
+    ("closeDateEnd", "o.close_day <= ?"),
+    ("minAmount", "o.total_amount >= ?"),
+    ("maxAmount", "o.total_amount <= ?"),
+    ("type", f"o.type_id = {dimension_key_sql('type', '?')}"),
+    ("leadSource", f"o.lead_source_id = {dimension_key_sql('lead_source', '?')}")
+]
+
+def opportunity_filter_clause(filters: dict) -> tuple:
+    """AND conditions and parameters for the list filters that are set"""
+    clause = ""
+    params = []
+    for name, condition in OPPORTUNITY_FILTERS:
+        value = filters.get(name)
+        if value:
+            clause += f" AND {condition}"
+            # Dates are compared as day numbers, fiscal periods as period keys
+            if isinstance(value, date):
+                value = day_number(value)
+            elif name == "fiscalPeriod":
+                value = period_key(value)
+            params.append(value)
+    return clause, params
+
+def opportunity_page_ids_query(clause: str, source: str = "opportunities", columns: str = "o.opportunity_id") -> str:
+    """IDs of one page of opportunities matching a filter clause, newest first"""
+    return (
+        f"SELECT {columns} FROM {source} o WHERE 1=1{clause}"
+        " ORDER BY o.created_date DESC, o.opportunity_id DESC LIMIT ? OFFSET ?"
+    )
+
+def build_opportunity_list_queries(filters: dict, limit: int, offset: int) -> tuple:
+    """(count query, params) and (page query, params) for the opportunity list.
+
+    Filters only touch opportunities, so the count and the choice of the
+    page's IDs skip the joins, which then only run for that page.
+    """
+    clause, params = opportunity_filter_clause(filters)
+    count_query = f"SELECT COUNT(*) FROM opportunities o WHERE 1=1{clause}"
+    page_query = (
+        f"{OPPORTUNITY_LIST_QUERY.format(**LIVE_SOURCES)} AND o.opportunity_id IN ({opportunity_page_ids_query(clause)})"
+        " GROUP BY o.opportunity_id ORDER BY o.created_date DESC, o.opportunity_id DESC"
+    )
+    return (count_query, params), (page_query, params + [limit, offset])
+
+def build_page_ids_queries(filters: dict, limit: int, offset: int, source: str, with_clause: tuple = ("", [])) -> tuple:
+    """(count query, params) and (page IDs query, params) over an unindexed source.
+
+    Used for as_of states (after a state_query WITH clause) and the union
+    with the archive. The IDs query also returns the total count, so the
+    source is only read once unless the page is past the end. The joins are
+    left to a second query over the page's IDs only.
+    """
+    with_sql, with_params = with_clause
+    clause, params = opportunity_filter_clause(filters)
+    count_query = f"{with_sql}SELECT COUNT(*) FROM {source} o WHERE 1=1{clause}"
+    ids_query = f"{with_sql}{opportunity_page_ids_query(clause, source, 'o.opportunity_id, COUNT(*) OVER ()')}"
+    return (count_query, with_params + params), (ids_query, with_params + params + [limit, offset])
+
+def fetch_page_ids(cursor, count_queries: tuple) -> tuple:
+    """(page IDs, total count) from build_page_ids_queries"""
+    (count_query, count_params), (ids_query, ids_params) = count_queries
+    cursor.execute(ids_query, ids_params)
+    rows = cursor.fetchall()
+    if rows:
+        return [row[0] for row in rows], rows[0][1]
+    cursor.execute(count_query, count_params)
+    return [], cursor.fetchone()[0]
+
 @router.get("")
 async def get_opportunities(
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     accountId: Optional[int] = None,
@@ -43,96 +236,69 @@ async def get_opportunities(
     minAmount: Optional[float] = None,
     maxAmount: Optional[float] = None,
     type: Optional[str] = None,
-    leadSource: Optional[str] = None
+    leadSource: Optional[str] = None,
+    as_of: Optional[str] = Query(None, description="List opportunities as they were at this ISO date or datetime"),
+    includeArchived: bool = Query(False, description="Also list opportunities moved to the archive tables")
 ):
     try:
         db = get_db()
         cursor = db.cursor()
-        
-        query = """
-            SELECT 
-                o.*,
-                a.account_name,
-                u.full_name as owner_name,
-                s.stage_name as current_stage_name,
-                ps.source_name,
-                o.blockers,
-                o.support_needed,
-                pp.activity as project_activity,
-                pp.deliverables as project_deliverables,
-                pp.priority as project_priority,
-                pp.due_date as project_due_date,
-                pp.status as project_status,
-                GROUP_CONCAT(DISTINCT i.influencer_id || ':' || i.first_name || ' ' || i.last_name || ':' || i.title || ':' || i.role || ':' || i.influence_level) as influencers
-            FROM opportunities o
-            LEFT JOIN accounts a ON o.account_id = a.account_id
-            LEFT JOIN users u ON o.owner_id = u.user_id
-            LEFT JOIN stages s ON o.stage_id = s.stage_id
-            LEFT JOIN pipeline_sources ps ON o.source_id = ps.source_id
-            LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
-            LEFT JOIN influencer_engagements ie ON o.opportunity_id = ie.opportunity_id
-            LEFT JOIN influencers i ON ie.influencer_id = i.influencer_id
-            WHERE 1=1
-        """
-        params = []
 
-        if accountId:
-            query += " AND o.account_id = ?"
-            params.append(accountId)
+        etag = resource_etag(request, cursor, LIST_ETAG_QUERY, (), ETAG_TABLES)
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
-        if ownerId:
-            query += " AND o.owner_id = ?"
-            params.append(ownerId)
-            
-        if stageId:
-            query += " AND o.stage_id = ?"
-            params.append(stageId)
-            
-        if fiscalPeriod:
-            query += " AND o.fiscal_period = ?"
-            params.append(fiscalPeriod)
-            
-        if closeDateStart:
-            query += " AND o.close_date >= ?"
-            params.append(closeDateStart)
-            
-        if closeDateEnd:
-            query += " AND o.close_date <= ?"
-            params.append(closeDateEnd)
-            
-        if minAmount:
-            query += " AND o.total_amount >= ?"
-            params.append(minAmount)
-            
-        if maxAmount:
-            query += " AND o.total_amount <= ?"
-            params.append(maxAmount)
-            
-        if type:
-            query += " AND o.type = ?"
-            params.append(type)
-            
-        if leadSource:
-            query += " AND o.lead_source = ?"
-            params.append(leadSource)
+        # Recorded for the index advisor
+        filters = {
+            "accountId": accountId,
+            "ownerId": ownerId,
+            "stageId": stageId,
+            "fiscalPeriod": fiscalPeriod,
+            "closeDateStart": closeDateStart,
+            "closeDateEnd": closeDateEnd,
+            "minAmount": minAmount,
+            "maxAmount": maxAmount,
+            "type": type,
+            "leadSource": leadSource
+        }
+        filter_usage.record("opportunities", filters)
 
-        query += " GROUP BY o.opportunity_id"
+        if as_of and includeArchived:
+            raise HTTPException(status_code=400, detail="as_of cannot be combined with includeArchived")
 
-        # Get total count
-        count_query = query.replace(
-            "SELECT \n                o.*,\n                a.account_name,\n                u.full_name as owner_name,\n                s.stage_name as current_stage_name,\n                ps.source_name,\n                o.blockers,\n                o.support_needed,\n                pp.activity as project_activity,\n                pp.deliverables as project_deliverables,\n                pp.priority as project_priority,\n                pp.due_date as project_due_date,\n                pp.status as project_status,\n                GROUP_CONCAT(DISTINCT i.influencer_id || ':' || i.first_name || ' ' || i.last_name || ':' || i.title || ':' || i.role || ':' || i.influence_level) as influencers",
-            "SELECT COUNT(DISTINCT o.opportunity_id)"
-        )
-        cursor.execute(count_query, params)
-        total_records = cursor.fetchone()[0]
+        if as_of:
+            moment = parse_as_of(as_of)
+            state = state_query(cursor, moment, HISTORY_FIELDS, HISTORY_SOURCE, HISTORY_ORDER)
+            page_ids, total_records = fetch_page_ids(cursor, build_page_ids_queries(
+                filters, limit, (page - 1) * limit, "opportunity_state", state
+            ))
+            state_sql, params = state_query(
+                cursor, moment, HISTORY_FIELDS, HISTORY_SOURCE, HISTORY_ORDER, page_ids
+            )
+            query = (
+                f"{state_sql}{OPPORTUNITY_LIST_QUERY.format(**AS_OF_SOURCES)}"
+                " GROUP BY o.opportunity_id ORDER BY o.created_date DESC, o.opportunity_id DESC"
+            )
+        elif includeArchived:
+            page_ids, total_records = fetch_page_ids(cursor, build_page_ids_queries(
+                filters, limit, (page - 1) * limit, archive_source(cursor, "opportunities", True)
+            ))
+            sources, params = archived_sources(cursor, page_ids)
+            query = (
+                f"{OPPORTUNITY_LIST_QUERY.format(**sources)}"
+                " GROUP BY o.opportunity_id ORDER BY o.created_date DESC, o.opportunity_id DESC"
+            )
+        else:
+            (count_query, count_params), (query, params) = build_opportunity_list_queries(
+                filters, limit, (page - 1) * limit
+            )
 
-        # Add pagination
-        offset = (page - 1) * limit
-        query += " ORDER BY o.created_date DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
+            # Get total count
+            cursor.execute(count_query, count_params)
+            total_records = cursor.fetchone()[0]
 
         cursor.execute(query, params)
-        opportunities = [dict(row) for row in cursor.fetchall()]
+        opportunities = dimensions.decorate(db, fetch_records(cursor))
 
         # Process influencers string into a list of dictionaries
         for opportunity in opportunities:
@@ -152,12 +318,12 @@ async def get_opportunities(
             else:
                 opportunity['influencers'] = []
 
-        return {
+        return FastJSONResponse({
             "totalRecords": total_records,
             "totalPages": (total_records + limit - 1) // limit,
             "currentPage": page,
             "data": opportunities
-        }
+        }, headers={"ETag": etag})
 
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -165,43 +331,37 @@ async def get_opportunities(
         db.close()
 
 @router.get("/{opportunity_id}")
-async def get_opportunity(opportunity_id: int = Path(..., ge=1)):
+async def get_opportunity(
+    request: Request,
+    opportunity_id: int = Path(..., ge=1),
+    as_of: Optional[str] = Query(None, description="Return the opportunity as it was at this ISO date or datetime")
+):
     try:
         db = get_db()
         cursor = db.cursor()
+
+        etag = resource_etag(request, cursor, DETAIL_ETAG_QUERY, (opportunity_id,), ETAG_TABLES)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="Opportunity not found")
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
-        cursor.execute("""
-            SELECT 
-                o.*,
-                a.account_name,
-                u.full_name as owner_name,
-                s.stage_name as current_stage_name,
-                ps.source_name,
-                o.blockers,
-                o.support_needed,
-                pp.activity as project_activity,
-                pp.deliverables as project_deliverables,
-                pp.priority as project_priority,
-                pp.due_date as project_due_date,
-                pp.status as project_status,
-                GROUP_CONCAT(DISTINCT i.influencer_id || ':' || i.first_name || ' ' || i.last_name || ':' || i.title || ':' || i.role || ':' || i.influence_level) as influencers
-            FROM opportunities o
-            LEFT JOIN accounts a ON o.account_id = a.account_id
-            LEFT JOIN users u ON o.owner_id = u.user_id
-            LEFT JOIN stages s ON o.stage_id = s.stage_id
-            LEFT JOIN pipeline_sources ps ON o.source_id = ps.source_id
-            LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
-            LEFT JOIN influencer_engagements ie ON o.opportunity_id = ie.opportunity_id
-            LEFT JOIN influencers i ON ie.influencer_id = i.influencer_id
-            WHERE o.opportunity_id = ?
-            GROUP BY o.opportunity_id
-        """, (opportunity_id,))
+        state_sql, params = "", []
+        if as_of:
+            state_sql, params = state_query(
+                cursor, parse_as_of(as_of), HISTORY_FIELDS, HISTORY_SOURCE, HISTORY_ORDER, [opportunity_id]
+            )
+        sources = AS_OF_SOURCES if as_of else LIVE_SOURCES
+        cursor.execute(
+            f"{state_sql}{OPPORTUNITY_LIST_QUERY.format(**sources)} AND o.opportunity_id = ? GROUP BY o.opportunity_id",
+            params + [opportunity_id]
+        )
         
         opportunity = cursor.fetchone()
         if not opportunity:
             raise HTTPException(status_code=404, detail="Opportunity not found")
             
-        opportunity_dict = dict(opportunity)
+        opportunity_dict = dimensions.decorate(db, [public_record(opportunity)])[0]
         
         # Process influencers string into a list of dictionaries
         if opportunity_dict.get('influencers'):
@@ -220,7 +380,7 @@ async def get_opportunity(opportunity_id: int = Path(..., ge=1)):
         else:
             opportunity_dict['influencers'] = []
             
-        return opportunity_dict
+        return FastJSONResponse(opportunity_dict, headers={"ETag": etag})
 
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -243,11 +403,11 @@ async def get_opportunity_history(
             raise HTTPException(status_code=404, detail="Opportunity not found")
         
         # Get history with user information
-        query = """
+        query = f"""
             SELECT 
                 h.*,
                 u.full_name as changed_by_name
-            FROM opportunity_history h
+            FROM {HISTORY_SOURCE} h
             LEFT JOIN users u ON h.changed_by = u.user_id
             WHERE h.opportunity_id = ?
             ORDER BY h.changed_at DESC
@@ -266,20 +426,172 @@ async def get_opportunity_history(
         query += " LIMIT ? OFFSET ?"
         
         cursor.execute(query, (opportunity_id, limit, offset))
-        history = [dict(row) for row in cursor.fetchall()]
+        history = fetch_records(cursor)
         
-        return {
+        return FastJSONResponse({
             "totalRecords": total_records,
             "totalPages": (total_records + limit - 1) // limit,
             "currentPage": page,
             "data": history
-        }
+        })
         
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
         db.close()
 
+def load_current_values(cursor, opportunity_ids: List[int]) -> Dict[int, dict]:
+    """Current opportunity and project plan values for each existing ID, in one query"""
+    cursor.execute(f"""
+        SELECT 
+            o.*,
+            pp.activity as project_activity,
+            pp.deliverables as project_deliverables,
+            pp.priority as project_priority,
+            pp.due_date as project_due_date,
+            pp.status as project_status
+        FROM opportunities o
+        LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
+        WHERE o.opportunity_id IN ({placeholders(opportunity_ids)})
+    """, opportunity_ids)
+    records = dimensions.decorate(cursor.connection, fetch_records(cursor))
+    return {record['opportunity_id']: record for record in records}
+
+def unchanged(old, new) -> bool:
+    """Whether a new value equals the stored one, as a number or as the text history records"""
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        return old == new
+    return history_value(old) == history_value(new)
+
+def diff_opportunity(current: dict, update: OpportunityUpdate) -> tuple:
+    """(opportunity changes, project plan changes, history entries) for the fields an update changes.
+
+    Fields set to their current value are left out, so they are neither
+    written nor recorded in the history.
+    """
+    changes = {}
+    plan_changes = {}
+    history_entries = []
+    for field in OPPORTUNITY_UPDATE_FIELDS:
+        value = getattr(update, field)
+        if value is not None and not unchanged(current.get(field), value):
+            changes[field] = value
+            history_entries.append((field, current.get(field), value))
+    if update.project_plan is not None:
+        for field, history_field in PROJECT_PLAN_UPDATE_FIELDS.items():
+            value = getattr(update.project_plan, field)
+            if value is not None and not unchanged(current.get(history_field), value):
+                plan_changes[field] = value
+                history_entries.append((history_field, current.get(history_field), value))
+    return changes, plan_changes, history_entries
+
+def write_updates(cursor, table: str, changes: Dict[int, dict]):
+    """UPDATE rows by opportunity_id, one executemany per distinct set of columns"""
+    groups = defaultdict(list)
+    for opportunity_id, values in changes.items():
+        if values:
+            columns = tuple(values)
+            groups[columns].append([values[column] for column in columns] + [opportunity_id])
+    for columns, rows in groups.items():
+        cursor.executemany(f"""
+            UPDATE {table}
+            SET {', '.join(f"{column} = ?" for column in columns)}
+            WHERE opportunity_id = ?
+        """, rows)
+
+def write_history(cursor, changesets: List[tuple]):
+    """Record (opportunity_id, changed_by, history entries) changesets in the configured store"""
+    if HISTORY_STORAGE == "changesets":
+        cursor.executemany("""
+            INSERT INTO opportunity_changesets (opportunity_id, changes, changed_by)
+            VALUES (?, ?, ?)
+        """, [
+            (opportunity_id, json.dumps({
+                field_name: [history_value(old_value), history_value(new_value)]
+                for field_name, old_value, new_value in history_entries
+            }, separators=(',', ':')), changed_by)
+            for opportunity_id, changed_by, history_entries in changesets
+        ])
+        return
+    cursor.executemany("""
+        INSERT INTO opportunity_history 
+        (opportunity_id, field_name, old_value, new_value, changed_by)
+        VALUES (?, ?, ?, ?, ?)
+    """, [
+        (opportunity_id, field_name, history_value(old_value), history_value(new_value), changed_by)
+        for opportunity_id, changed_by, history_entries in changesets
+        for field_name, old_value, new_value in history_entries
+    ])
+
+def history_value(value) -> OptionalType[str]:
+    return str(value) if value is not None else None
+
+def validate_users(cursor, user_ids: set):
+    if not user_ids:
+        return
+    user_ids = list(user_ids)
+    cursor.execute(f"SELECT user_id FROM users WHERE user_id IN ({placeholders(user_ids)})", user_ids)
+    if len(cursor.fetchall()) != len(user_ids):
+        raise HTTPException(status_code=404, detail="User not found")
+
+@router.patch("")
+async def update_opportunities(updates: List[OpportunityBulkUpdate]):
+    """Apply many opportunity updates in one transaction.
+
+    Current values for every ID are loaded in one query and diffed in
+    memory, then the updates and history rows are written with executemany.
+    Updates to the same ID are applied in order.
+    """
+    if len(updates) > MAX_BULK_UPDATES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_UPDATES} updates per request")
+    if not updates:
+        return {"message": "No fields to update", "updated": 0}
+    try:
+        db = get_db()
+        cursor = db.cursor()
+
+        opportunity_ids = sorted({update.id for update in updates})
+        current_values = load_current_values(cursor, opportunity_ids)
+        missing = [opportunity_id for opportunity_id in opportunity_ids if opportunity_id not in current_values]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Opportunities not found: {missing}")
+        validate_users(cursor, {update.changes.changed_by for update in updates if update.changes.changed_by})
+
+        opportunity_changes = defaultdict(dict)
+        plan_changes = defaultdict(dict)
+        changesets = []
+        for update in updates:
+            current = current_values[update.id]
+            changes, plan, history_entries = diff_opportunity(current, update.changes)
+            opportunity_changes[update.id].update(changes)
+            plan_changes[update.id].update(plan)
+            # Later updates to the same opportunity see the earlier ones as old values
+            current.update(changes)
+            current.update({PROJECT_PLAN_UPDATE_FIELDS[field]: value for field, value in plan.items()})
+            if history_entries and update.changes.changed_by:
+                changesets.append((update.id, update.changes.changed_by, history_entries))
+
+        updated = [opportunity_id for opportunity_id in opportunity_ids
+                   if opportunity_changes[opportunity_id] or plan_changes[opportunity_id]]
+        if not updated:
+            return {"message": "No fields to update", "updated": 0}
+
+        write_updates(cursor, "opportunities", {
+            opportunity_id: dimensions.encode(db, changes) for opportunity_id, changes in opportunity_changes.items()
+        })
+        write_updates(cursor, "opportunity_project_plan", plan_changes)
+        write_history(cursor, changesets)
+
+        db.commit()
+        invalidate("opportunities", "opportunity_project_plan", "opportunity_history", "opportunity_changesets", *DIMENSION_TABLES)
+        return {"message": "Opportunities updated successfully", "updated": len(updated)}
+
+    except Error as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        db.close()
+
 @router.patch("/{opportunity_id}")
 async def update_opportunity(
     opportunity_id: int = Path(..., ge=1),
@@ -290,167 +602,31 @@ async def update_opportunity(
         cursor = db.cursor()
 
         # Check if opportunity exists and get current values
-        cursor.execute("""
-            SELECT 
-                o.*,
-                pp.activity as project_activity,
-                pp.deliverables as project_deliverables,
-                pp.priority as project_priority,
-                pp.due_date as project_due_date,
-                pp.status as project_status
-            FROM opportunities o
-            LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
-            WHERE o.opportunity_id = ?
-        """, (opportunity_id,))
-        
-        current_opportunity = cursor.fetchone()
-        if not current_opportunity:
+        current_values = load_current_values(cursor, [opportunity_id]).get(opportunity_id)
+        if not current_values:
             raise HTTPException(status_code=404, detail="Opportunity not found")
-            
-        current_values = dict(current_opportunity)
 
         # Validate user exists if provided
         if opportunity.changed_by:
-            cursor.execute("SELECT user_id FROM users WHERE user_id = ?", (opportunity.changed_by,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail="User not found")
-
-        # Build update query dynamically based on provided fields
-        update_fields = []
-        params = []
-        history_entries = []
-        
-        # Only include fields that are not None
-        if opportunity.opportunity_name is not None:
-            update_fields.append("opportunity_name = ?")
-            params.append(opportunity.opportunity_name)
-            history_entries.append(("opportunity_name", current_values.get('opportunity_name'), opportunity.opportunity_name))
-            
-        if opportunity.next_step is not None:
-            update_fields.append("next_step = ?")
-            params.append(opportunity.next_step)
-            history_entries.append(("next_step", current_values.get('next_step'), opportunity.next_step))
-            
-        if opportunity.total_amount is not None:
-            update_fields.append("total_amount = ?")
-            params.append(opportunity.total_amount)
-            history_entries.append(("total_amount", current_values.get('total_amount'), opportunity.total_amount))
-            
-        if opportunity.currency is not None:
-            update_fields.append("currency = ?")
-            params.append(opportunity.currency)
-            history_entries.append(("currency", current_values.get('currency'), opportunity.currency))
-            
-        if opportunity.stage_name is not None:
-            update_fields.append("stage_name = ?")
-            params.append(opportunity.stage_name)
-            history_entries.append(("stage_name", current_values.get('stage_name'), opportunity.stage_name))
-            
-        if opportunity.probability_percentage is not None:
-            update_fields.append("probability_percentage = ?")
-            params.append(opportunity.probability_percentage)
-            history_entries.append(("probability_percentage", current_values.get('probability_percentage'), opportunity.probability_percentage))
-            
-        if opportunity.type is not None:
-            update_fields.append("type = ?")
-            params.append(opportunity.type)
-            history_entries.append(("type", current_values.get('type'), opportunity.type))
-            
-        if opportunity.fiscal_period is not None:
-            update_fields.append("fiscal_period = ?")
-            params.append(opportunity.fiscal_period)
-            history_entries.append(("fiscal_period", current_values.get('fiscal_period'), opportunity.fiscal_period))
-            
-        if opportunity.lead_source is not None:
-            update_fields.append("lead_source = ?")
-            params.append(opportunity.lead_source)
-            history_entries.append(("lead_source", current_values.get('lead_source'), opportunity.lead_source))
-            
-        if opportunity.blockers is not None:
-            update_fields.append("blockers = ?")
-            params.append(opportunity.blockers)
-            history_entries.append(("blockers", current_values.get('blockers'), opportunity.blockers))
-            
-        if opportunity.support_needed is not None:
-            update_fields.append("support_needed = ?")
-            params.append(opportunity.support_needed)
-            history_entries.append(("support_needed", current_values.get('support_needed'), opportunity.support_needed))
+            validate_users(cursor, {opportunity.changed_by})
 
-        if not update_fields:
+        changes, plan_changes, history_entries = diff_opportunity(current_values, opportunity)
+        if not changes and not plan_changes:
             return {"message": "No fields to update"}
 
-        # Add opportunity_id to params
-        params.append(opportunity_id)
-
-        # Execute update
-        query = f"""
-            UPDATE opportunities 
-            SET {', '.join(update_fields)}
-            WHERE opportunity_id = ?
-        """
-        cursor.execute(query, params)
-
-        # Update project plan if provided
-        if opportunity.project_plan is not None:
-            project_plan = opportunity.project_plan
-            project_plan_fields = []
-            project_plan_params = []
-
-            if project_plan.activity is not None:
-                project_plan_fields.append("activity = ?")
-                project_plan_params.append(project_plan.activity)
-                history_entries.append(("project_activity", current_values.get('project_activity'), project_plan.activity))
-                
-            if project_plan.deliverables is not None:
-                project_plan_fields.append("deliverables = ?")
-                project_plan_params.append(project_plan.deliverables)
-                history_entries.append(("project_deliverables", current_values.get('project_deliverables'), project_plan.deliverables))
-                
-            if project_plan.priority is not None:
-                project_plan_fields.append("priority = ?")
-                project_plan_params.append(project_plan.priority)
-                history_entries.append(("project_priority", current_values.get('project_priority'), project_plan.priority))
-                
-            if project_plan.due_date is not None:
-                project_plan_fields.append("due_date = ?")
-                project_plan_params.append(project_plan.due_date)
-                history_entries.append(("project_due_date", current_values.get('project_due_date'), project_plan.due_date))
-                
-            if project_plan.status is not None:
-                project_plan_fields.append("status = ?")
-                project_plan_params.append(project_plan.status)
-                history_entries.append(("project_status", current_values.get('project_status'), project_plan.status))
-
-            if project_plan_fields:
-                project_plan_params.append(opportunity_id)
-                project_plan_query = f"""
-                    UPDATE opportunity_project_plan 
-                    SET {', '.join(project_plan_fields)}
-                    WHERE opportunity_id = ?
-                """
-                cursor.execute(project_plan_query, project_plan_params)
+        write_updates(cursor, "opportunities", {opportunity_id: dimensions.encode(db, changes)})
+        write_updates(cursor, "opportunity_project_plan", {opportunity_id: plan_changes})
 
         # Record history entries
         if history_entries and opportunity.changed_by:
-            history_query = """
-                INSERT INTO opportunity_history 
-                (opportunity_id, field_name, old_value, new_value, changed_by)
-                VALUES (?, ?, ?, ?, ?)
-            """
-            for field_name, old_value, new_value in history_entries:
-                cursor.execute(history_query, (
-                    opportunity_id,
-                    field_name,
-                    str(old_value) if old_value is not None else None,
-                    str(new_value) if new_value is not None else None,
-                    opportunity.changed_by
-                ))
+            write_history(cursor, [(opportunity_id, opportunity.changed_by, history_entries)])
 
         db.commit()
+        invalidate("opportunities", "opportunity_project_plan", "opportunity_history", "opportunity_changesets", *DIMENSION_TABLES)
         return {"message": "Opportunity updated successfully"}
 
     except Error as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
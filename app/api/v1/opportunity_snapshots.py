@@ -0,0 +1,251 @@
+import os
+import logging
+import threading
+from datetime import date, datetime, timezone
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+from .database import get_db
+from .cache import invalidate
+from .dates import day_number_sql
+from .dimensions import OPPORTUNITY_DIMENSIONS, FISCAL_PERIOD_KEY, dimension_value_sql, dimension_key_sql
+from .fiscal import period_key_sql
+
+# --- Configuration ---
+# Seconds between opportunity state snapshots; 0 disables the background thread
+OPPORTUNITY_SNAPSHOT_INTERVAL_SECONDS = int(os.environ.get('OPPORTUNITY_SNAPSHOT_INTERVAL_SECONDS', '0'))
+# Older snapshots are deleted; as_of dates before the oldest one kept undo more history
+OPPORTUNITY_SNAPSHOT_KEEP = int(os.environ.get('OPPORTUNITY_SNAPSHOT_KEEP', '90'))
+
+# History stores values as text; these fields are cast back when a change is undone
+HISTORY_FIELD_TYPES = {"total_amount": "REAL", "probability_percentage": "INTEGER"}
+# Snapshot column -> the opportunity_project_plan column it copies
+PROJECT_PLAN_COLUMNS = {
+    "project_activity": "activity",
+    "project_deliverables": "deliverables",
+    "project_priority": "priority",
+    "project_due_date": "due_date",
+    "project_status": "status"
+}
+
+def parse_as_of(value: str) -> str:
+    """UTC 'YYYY-MM-DD HH:MM:SS' for an ISO date (the end of that day) or datetime"""
+    try:
+        if len(value) == 10:
+            return f"{date.fromisoformat(value).isoformat()} 23:59:59"
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="as_of must be an ISO date or datetime")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+def snapshot_columns(cursor) -> List[str]:
+    """Columns of opportunity_snapshot_rows other than snapshot_id"""
+    cursor.execute("PRAGMA table_info(opportunity_snapshot_rows)")
+    columns = [row[1] for row in cursor.fetchall() if row[1] != "snapshot_id"]
+    if not columns:
+        raise HTTPException(status_code=503, detail="as_of needs migration 006_opportunity_state_snapshots.sql")
+    return columns
+
+def live_expression(column: str) -> str:
+    if column in PROJECT_PLAN_COLUMNS:
+        return f"pp.{PROJECT_PLAN_COLUMNS[column]}"
+    # Snapshots and history keep the text migration 011 moved to dimension tables
+    if column in OPPORTUNITY_DIMENSIONS:
+        return dimension_value_sql(column)
+    return f"o.{column}"
+
+def state_query(cursor, as_of: str, history_fields: List[str], history_source: str, history_order: str,
+                opportunity_ids: Optional[List[int]] = None) -> Tuple[str, list]:
+    """WITH clause defining opportunity_state and project_plan_state as they were at as_of.
+
+    The base is the first snapshot taken at or after as_of, or the live
+    tables if there is none. For every history field changed between as_of
+    and the base, the old value of the earliest such change is what the
+    field held at as_of. Only that window of history is read, so the cost
+    is bounded by the snapshot interval rather than the history's age.
+    Opportunities created after as_of are left out, and with opportunity_ids
+    only those are reconstructed.
+    """
+    columns = snapshot_columns(cursor)
+    cursor.execute("""
+        SELECT snapshot_id, taken_at FROM opportunity_snapshots
+        WHERE taken_at >= ?
+        ORDER BY taken_at
+        LIMIT 1
+    """, (as_of,))
+    snapshot = cursor.fetchone()
+
+    window = "h.changed_at > ?"
+    window_params = [as_of]
+    if snapshot:
+        source = "opportunity_snapshot_rows b"
+        expressions = {column: f"b.{column}" for column in columns}
+        conditions = ["b.snapshot_id = ?"]
+        source_params = [snapshot[0]]
+        window += " AND h.changed_at <= ?"
+        window_params.append(snapshot[1])
+    else:
+        source = "opportunities o LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id"
+        expressions = {column: live_expression(column) for column in columns}
+        conditions = []
+        source_params = []
+    key = expressions["opportunity_id"]
+    if opportunity_ids is not None:
+        id_placeholders = ', '.join('?' * len(opportunity_ids))
+        conditions.append(f"{key} IN ({id_placeholders})")
+        source_params.extend(opportunity_ids)
+        window += f" AND h.opportunity_id IN ({id_placeholders})"
+        window_params.extend(opportunity_ids)
+    conditions.append(f"{expressions['created_date']} <= ?")
+    source_params.append(as_of[:10])
+    fields = [field for field in history_fields if field in columns]
+
+    pivots = []
+    undone = {column: f"{expression} AS {column}" for column, expression in expressions.items()}
+    for index, field in enumerate(fields):
+        pivots.append(f"MAX(field_name = '{field}') AS changed_{index}")
+        pivots.append(f"MAX(CASE WHEN field_name = '{field}' THEN old_value END) AS old_{index}")
+        old_value = f"CAST(u.old_{index} AS {HISTORY_FIELD_TYPES[field]})" if field in HISTORY_FIELD_TYPES else f"u.old_{index}"
+        undone[field] = f"CASE WHEN u.changed_{index} THEN {old_value} ELSE {expressions[field]} END AS {field}"
+
+    opportunity_columns = [column for column in columns if column not in PROJECT_PLAN_COLUMNS]
+    # Filters compare the dimension keys of the live table
+    opportunity_columns += [
+        f"{dimension_key_sql(column, f'state.{column}')} AS {foreign_key}"
+        for column, (_, _, foreign_key) in OPPORTUNITY_DIMENSIONS.items() if column in columns
+    ]
+    if "fiscal_period" in columns:
+        opportunity_columns.append(f"{period_key_sql('state.fiscal_period')} AS {FISCAL_PERIOD_KEY}")
+    plan_columns = [f"{column} AS {PROJECT_PLAN_COLUMNS[column]}" for column in columns if column in PROJECT_PLAN_COLUMNS]
+    # Unchanged opportunities are read straight from the base; the few with
+    # changes to undo drive a primary key lookup into it
+    return f"""
+        WITH first_changes AS (
+            SELECT opportunity_id, field_name, old_value
+            FROM (
+                SELECT h.opportunity_id, h.field_name, h.old_value,
+                       ROW_NUMBER() OVER (PARTITION BY h.opportunity_id, h.field_name ORDER BY {history_order}) AS n
+                FROM {history_source} h
+                WHERE {window} AND h.field_name IN ({', '.join('?' * len(fields))})
+            )
+            WHERE n = 1
+        ),
+        undo AS (
+            SELECT opportunity_id, {', '.join(pivots)}
+            FROM first_changes
+            GROUP BY opportunity_id
+        ),
+        state AS (
+            SELECT {', '.join(f"{expression} AS {column}" for column, expression in expressions.items())}
+            FROM {source}
+            WHERE {' AND '.join(conditions)} AND {key} NOT IN (SELECT opportunity_id FROM undo)
+            UNION ALL
+            SELECT {', '.join(undone.values())}
+            FROM undo u
+            CROSS JOIN {source}
+            WHERE {' AND '.join(conditions)} AND {key} = u.opportunity_id
+        ),
+        opportunity_state AS (
+            SELECT {', '.join(opportunity_columns)},
+                   {day_number_sql('close_date')} AS close_day, {day_number_sql('created_date')} AS created_day
+            FROM state
+        ),
+        project_plan_state AS (SELECT opportunity_id, {', '.join(plan_columns)} FROM state)
+    """, window_params + fields + source_params + source_params
+
+class OpportunitySnapshotJob:
+    """Periodic copies of every opportunity and its project plan for as_of queries.
+
+    Each snapshot is written in one transaction, so it is one consistent
+    state of the opportunities at its taken_at time.
+    """
+
+    def __init__(self, keep: int = OPPORTUNITY_SNAPSHOT_KEEP):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def create_snapshot(self) -> dict:
+        """Copy the current opportunities into a new snapshot"""
+        with self._lock:
+            started = datetime.now()
+            db = get_db(check_same_thread=False)
+            try:
+                cursor = db.cursor()
+                columns = snapshot_columns(cursor)
+                cursor.execute("""
+                    INSERT INTO opportunity_snapshots (taken_at, opportunity_count)
+                    VALUES (CURRENT_TIMESTAMP, (SELECT COUNT(*) FROM opportunities))
+                """)
+                snapshot_id = cursor.lastrowid
+                # OR IGNORE keeps one project plan should an opportunity have several
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO opportunity_snapshot_rows (snapshot_id, {', '.join(columns)})
+                    SELECT ?, {', '.join(live_expression(column) for column in columns)}
+                    FROM opportunities o
+                    LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
+                """, (snapshot_id,))
+                self.prune(cursor)
+                db.commit()
+                invalidate("opportunity_snapshots", "opportunity_snapshot_rows")
+                cursor.execute("SELECT * FROM opportunity_snapshots WHERE snapshot_id = ?", (snapshot_id,))
+                snapshot = dict(cursor.fetchone())
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            logging.info(f"Opportunity snapshot {snapshot_id} taken in {(datetime.now() - started).total_seconds():.2f}s")
+            return snapshot
+
+    def list_snapshots(self) -> List[dict]:
+        """Snapshots, newest first"""
+        db = get_db()
+        try:
+            cursor = db.cursor()
+            cursor.execute("SELECT * FROM opportunity_snapshots ORDER BY taken_at DESC")
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            db.close()
+
+    def prune(self, cursor) -> int:
+        """Delete all but the newest `keep` snapshots"""
+        if self.keep <= 0:
+            return 0
+        cursor.execute("""
+            SELECT snapshot_id FROM opportunity_snapshots
+            ORDER BY taken_at DESC
+            LIMIT -1 OFFSET ?
+        """, (self.keep,))
+        expired = [(row[0],) for row in cursor.fetchall()]
+        cursor.executemany("DELETE FROM opportunity_snapshot_rows WHERE snapshot_id = ?", expired)
+        cursor.executemany("DELETE FROM opportunity_snapshots WHERE snapshot_id = ?", expired)
+        return len(expired)
+
+    def start(self, interval_seconds: int = OPPORTUNITY_SNAPSHOT_INTERVAL_SECONDS):
+        """Take a snapshot every interval_seconds on a daemon thread"""
+        if interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while True:
+                try:
+                    self.create_snapshot()
+                except Exception as e:
+                    logging.error(f"Opportunity snapshot failed: {str(e)}")
+                if self._stop.wait(interval_seconds):
+                    break
+
+        self._thread = threading.Thread(target=run, name="opportunity-snapshots", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+opportunity_snapshot_job = OpportunitySnapshotJob()
@@ -0,0 +1,156 @@
+import io
+import os
+import hmac
+import re
+import pstats
+import asyncio
+import cProfile
+import logging
+from datetime import datetime
+from contextvars import ContextVar
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+# --- Configuration ---
+# Profiling is only installed when enabled; otherwise requests never see it
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+# Profiled requests must send it in X-Profile-Token; required to enable profiling
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+# Functions listed in inline reports
+PROFILE_INLINE_LIMIT = 60
+
+# Profiles show code paths and inline reports return them to the caller
+if PROFILING_ENABLED and not PROFILING_TOKEN:
+    logging.warning("PROFILING_ENABLED is set without PROFILING_TOKEN, profiling stays disabled")
+    PROFILING_ENABLED = False
+
+PROFILE_MODES = ('file', 'inline')
+UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9_.-]+')
+
+class ProfileSession:
+    """cProfile profilers for one request: the event loop's and any threadpool workers'"""
+
+    def __init__(self):
+        self.profilers: List[cProfile.Profile] = []
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self.profilers[0])
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+# Copied into threadpool workers with the request context
+current_session: ContextVar[Optional[ProfileSession]] = ContextVar('current_session', default=None)
+
+def profiled_call(func, *args):
+    """Run func, profiling it too if the request that handed it to a worker thread is profiled.
+
+    cProfile only sees the thread it was enabled on, so work moved off the
+    event loop needs its own profiler merged into the request's.
+    """
+    session = current_session.get()
+    if session is None:
+        return func(*args)
+    profiler = cProfile.Profile()
+    session.profilers.append(profiler)
+    profiler.enable()
+    try:
+        return func(*args)
+    finally:
+        profiler.disable()
+
+def profile_mode(scope) -> Optional[str]:
+    """'file' or 'inline' if the request asks to be profiled, from X-Profile or ?profile="""
+    if not PROFILING_ENABLED:
+        return None
+    headers = dict(scope.get("headers") or [])
+    mode = headers.get(b"x-profile", b"").decode("latin-1").lower()
+    if not mode and b"profile=" in scope.get("query_string", b""):
+        mode = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [""])[0].lower()
+    if mode not in PROFILE_MODES:
+        return None
+    if not hmac.compare_digest(headers.get(b"x-profile-token", b""), PROFILING_TOKEN.encode("latin-1")):
+        return None
+    return mode
+
+def profile_filename(scope) -> str:
+    slug = UNSAFE_FILENAME.sub("_", scope["path"].strip("/")) or "root"
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{scope['method']}_{slug}.prof"
+
+class ProfilingMiddleware:
+    """ASGI middleware running requests that ask for it under cProfile.
+
+    X-Profile: file (or ?profile=file) saves a .prof file under PROFILE_DIR
+    and names it in the X-Profile-File response header; inline replaces the
+    response with a text report sorted by cumulative time. Profiled requests
+    run one at a time, and anything else the event loop runs meanwhile shows
+    up in the profile, so use it on a quiet instance.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        mode = profile_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        async with self._lock:
+            session = ProfileSession()
+            profiler = cProfile.Profile()
+            session.profilers.append(profiler)
+            token = current_session.set(session)
+            messages = []
+
+            async def buffer(message):
+                messages.append(message)
+
+            profiler.enable()
+            try:
+                await self.app(scope, receive, buffer)
+            finally:
+                profiler.disable()
+                current_session.reset(token)
+
+        status = next((message["status"] for message in messages if message["type"] == "http.response.start"), 500)
+        if mode == "inline":
+            await self._send_report(send, session, status)
+            return
+
+        path = self._save(session, scope)
+        for message in messages:
+            if message["type"] == "http.response.start" and path:
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"x-profile-file", path.encode("latin-1"))
+                ]}
+            await send(message)
+
+    def _save(self, session: ProfileSession, scope) -> Optional[str]:
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, profile_filename(scope))
+            session.stats().dump_stats(path)
+            return path
+        except OSError as e:
+            logging.warning(f"Could not write profile: {str(e)}")
+            return None
+
+    async def _send_report(self, send, session: ProfileSession, status: int):
+        report = io.StringIO()
+        stats = session.stats()
+        stats.stream = report
+        stats.sort_stats("cumulative").print_stats(PROFILE_INLINE_LIMIT)
+        body = report.getvalue().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"x-profiled-status", str(status).encode("latin-1"))
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,91 +1,127 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from sqlite3 import Error
-from .database import get_db
+from .snapshots import get_snapshot_db, snapshot_headers
+from .serialization import FastJSONResponse, fetch_records
+from .coalesce import single_flight
+from .dimensions import dimensions
 
 router = APIRouter(prefix="/api/sales-review", tags=["Sales Review"])
 
-@router.get("")
-async def get_sales_review(
-    user_id: Optional[int] = Query(None),
-    fiscal_year: Optional[int] = Query(None),
-    fiscal_quarter: Optional[str] = Query(None)
-):
+OPPORTUNITY_QUERY = """
+    SELECT
+        o.*,
+        a.account_name,
+        u.full_name as owner_name,
+        ps.source_name,
+        pp.activity as project_activity,
+        pp.deliverables as project_deliverables,
+        pp.priority as project_priority,
+        pp.due_date as project_due_date,
+        pp.status as project_status
+    FROM opportunities o
+    LEFT JOIN accounts a ON o.account_id = a.account_id
+    LEFT JOIN users u ON o.owner_id = u.user_id
+    LEFT JOIN pipeline_sources ps ON o.source_id = ps.source_id
+    LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
+    WHERE o.is_closed = 0
+"""
+
+OPEN_REQUESTS_QUERY = """
+    SELECT
+        sr.*,
+        o.opportunity_name,
+        a.account_name,
+        requester.full_name as requested_by_name,
+        assignee.full_name as assigned_to_name
+    FROM support_requests sr
+    LEFT JOIN opportunities o ON sr.opportunity_id = o.opportunity_id
+    LEFT JOIN accounts a ON o.account_id = a.account_id
+    LEFT JOIN users requester ON sr.requested_by = requester.user_id
+    LEFT JOIN users assignee ON sr.assigned_to = assignee.user_id
+    WHERE sr.is_open
+    ORDER BY sr.created_date DESC
+"""
+
+CLOSED_DEALS_QUERY = """
+    SELECT
+        dc.*,
+        o.opportunity_name,
+        a.account_name,
+        u.full_name as owner_name,
+        ps.source_name
+    FROM deals_closed dc
+    LEFT JOIN opportunities o ON dc.opportunity_id = o.opportunity_id
+    LEFT JOIN accounts a ON dc.account_id = a.account_id
+    LEFT JOIN users u ON dc.owner_id = u.user_id
+    LEFT JOIN pipeline_sources ps ON dc.source_id = ps.source_id
+    WHERE dc.close_day >= CAST(julianday('now', '-7 days') + 0.5 AS INTEGER)
+    ORDER BY dc.close_date DESC
+"""
+
+def build_sales_review(user_id: Optional[int], fiscal_year: Optional[int] = None,
+                       fiscal_quarter: Optional[str] = None) -> tuple:
+    """Sales review content and the snapshot it was read from"""
     try:
-        db = get_db()
+        # Served from the latest snapshot so the sections agree with each other
+        db, snapshot = get_snapshot_db()
         cursor = db.cursor()
 
         # Current Opportunities
-        opportunity_query = """
-            SELECT 
-                o.*,
-                a.account_name,
-                u.full_name as owner_name,
-                ps.source_name,
-                pp.activity as project_activity,
-                pp.deliverables as project_deliverables,
-                pp.priority as project_priority,
-                pp.due_date as project_due_date,
-                pp.status as project_status
-            FROM opportunities o
-            LEFT JOIN accounts a ON o.account_id = a.account_id
-            LEFT JOIN users u ON o.owner_id = u.user_id
-            LEFT JOIN pipeline_sources ps ON o.source_id = ps.source_id
-            LEFT JOIN opportunity_project_plan pp ON o.opportunity_id = pp.opportunity_id
-            WHERE o.is_closed = 0
-        """
+        opportunity_query = OPPORTUNITY_QUERY
+        params = []
         
         if user_id:
             opportunity_query += " AND o.owner_id = ?"
-            cursor.execute(opportunity_query, (user_id,))
-        else:
-            cursor.execute(opportunity_query)
+            params.append(user_id)
+
+        # Fiscal period filters resolve to period keys in fiscal_calendar's periods
+        periods = []
+        if fiscal_year:
+            periods.append("fiscal_year = ?")
+            params.append(fiscal_year)
+        if fiscal_quarter:
+            periods.append("fiscal_quarter = ?")
+            params.append(fiscal_quarter.upper())
+        if periods:
+            opportunity_query += f" AND o.fiscal_period_id IN (SELECT period_key FROM fiscal_periods WHERE {' AND '.join(periods)})"
+
+        cursor.execute(opportunity_query, params)
             
-        current_opportunities = [dict(row) for row in cursor.fetchall()]
+        current_opportunities = dimensions.decorate(db, fetch_records(cursor))
 
         # Open Support Requests
-        cursor.execute("""
-            SELECT 
-                sr.*,
-                o.opportunity_name,
-                a.account_name,
-                requester.full_name as requested_by_name,
-                assignee.full_name as assigned_to_name
-            FROM support_requests sr
-            LEFT JOIN opportunities o ON sr.opportunity_id = o.opportunity_id
-            LEFT JOIN accounts a ON o.account_id = a.account_id
-            LEFT JOIN users requester ON sr.requested_by = requester.user_id
-            LEFT JOIN users assignee ON sr.assigned_to = assignee.user_id
-            WHERE sr.status NOT IN ('Resolved', 'Completed', 'Closed')
-            ORDER BY sr.created_date DESC
-        """)
-        open_requests = [dict(row) for row in cursor.fetchall()]
+        cursor.execute(OPEN_REQUESTS_QUERY)
+        open_requests = fetch_records(cursor)
 
         # Deals Closed This Week
-        cursor.execute("""
-            SELECT 
-                dc.*,
-                o.opportunity_name,
-                a.account_name,
-                u.full_name as owner_name,
-                ps.source_name
-            FROM deals_closed dc
-            LEFT JOIN opportunities o ON dc.opportunity_id = o.opportunity_id
-            LEFT JOIN accounts a ON dc.account_id = a.account_id
-            LEFT JOIN users u ON dc.owner_id = u.user_id
-            LEFT JOIN pipeline_sources ps ON dc.source_id = ps.source_id
-            WHERE dc.close_date >= date('now', '-7 days')
-            ORDER BY dc.close_date DESC
-        """)
-        closed_deals = [dict(row) for row in cursor.fetchall()]
+        cursor.execute(CLOSED_DEALS_QUERY)
+        closed_deals = fetch_records(cursor)
 
         return {
             "current_opportunities": current_opportunities,
             "open_support_requests": open_requests,
             "deals_closed_this_week": closed_deals
-        }
+        }, snapshot
 
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+@router.get("")
+async def get_sales_review(
+    user_id: Optional[int] = Query(None),
+    fiscal_year: Optional[int] = Query(None),
+    fiscal_quarter: Optional[str] = Query(None)
+):
+    # Managers open the review at the same moment; identical requests share one run
+    content, snapshot = await single_flight.run(
+        ("sales-review", user_id, fiscal_year, fiscal_quarter),
+        build_sales_review,
+        user_id,
+        fiscal_year,
+        fiscal_quarter
+    )
+    # Rendered directly, without a jsonable_encoder pass over every row
+    return FastJSONResponse(content, headers=snapshot_headers(snapshot))
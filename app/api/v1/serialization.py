@@ -0,0 +1,67 @@
+import json
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def encode_default(value: Any) -> Any:
+    """Encode the values SQLite rows may hold that JSON has no type for"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        default=encode_default,
+        ensure_ascii=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered straight from plain rows.
+
+    Endpoints that return this class directly skip FastAPI's
+    jsonable_encoder pass, which dominates the cost of large payloads.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+# Generated columns that only serve filters and indexes: the day numbers of
+# migration 009 and is_open of migration 008. Responses leave them out
+STORAGE_COLUMNS = frozenset({"close_day", "created_day", "due_day", "engagement_day", "is_open"})
+
+def public_record(row) -> dict:
+    """A row as a dict without its STORAGE_COLUMNS"""
+    return {key: row[key] for key in row.keys() if key not in STORAGE_COLUMNS}
+
+def fetch_records(cursor: sqlite3.Cursor) -> List[dict]:
+    """Remaining rows of an executed cursor as dicts, without STORAGE_COLUMNS.
+
+    Rows are fetched as plain tuples and zipped with the column names once,
+    instead of building an sqlite3.Row per row and converting it with dict().
+    """
+    columns = [column[0] for column in cursor.description]
+    row_factory = cursor.row_factory
+    cursor.row_factory = None
+    try:
+        if STORAGE_COLUMNS.isdisjoint(columns):
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        kept = [(index, column) for index, column in enumerate(columns) if column not in STORAGE_COLUMNS]
+        return [{column: row[index] for index, column in kept} for row in cursor.fetchall()]
+    finally:
+        cursor.row_factory = row_factory
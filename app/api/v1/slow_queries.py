@@ -0,0 +1,118 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List
+from .json_log import JsonLinesLog
+
+# --- Configuration ---
+# Statements slower than this (execute plus fetching all rows) are logged; negative disables
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', os.path.join('logs', 'slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', str(5 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', '5'))
+# Distinct statement shapes kept for the top offenders report
+SLOW_QUERY_MAX_SHAPES = 500
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(sql: str) -> str:
+    """Statement shape with literals replaced and whitespace collapsed.
+
+    Filter builders that only differ in their values or in the length of an
+    IN list map to the same shape.
+    """
+    sql = STRING_LITERAL.sub("?", sql)
+    sql = NUMBER_LITERAL.sub("?", sql)
+    sql = PLACEHOLDER_LIST.sub("(?...)", sql)
+    return WHITESPACE.sub(" ", sql).strip()
+
+def fingerprint(value: Any) -> str:
+    return hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).hexdigest()
+
+def explain(connection: sqlite3.Connection, sql: str, parameters) -> List[str]:
+    """EXPLAIN QUERY PLAN details for a statement, on a plain uninstrumented cursor"""
+    cursor = sqlite3.Cursor(connection)
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        return [f"EXPLAIN failed: {str(e)}"]
+    finally:
+        cursor.close()
+
+def is_full_scan(plan: List[str]) -> bool:
+    """Whether the plan reads any table without an index"""
+    return any(step.startswith("SCAN ") and " USING " not in step for step in plan)
+
+class SlowQueryLog:
+    """Slow statements, written to a rotating JSON-lines log and aggregated by shape"""
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, path: str = SLOW_QUERY_LOG):
+        self.threshold = threshold_ms / 1000 if threshold_ms >= 0 else float('inf')
+        self._log = JsonLinesLog("slow_queries", path, SLOW_QUERY_LOG_MAX_BYTES, SLOW_QUERY_LOG_BACKUPS)
+        self._lock = threading.Lock()
+        self._shapes: Dict[str, dict] = {}
+
+    def record(self, connection: sqlite3.Connection, sql: str, parameters, seconds: float):
+        shape = normalize_sql(sql)
+        # executemany has no single parameter set to explain with
+        plan = explain(connection, sql, parameters) if parameters is not None else []
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "sql": shape,
+            "sql_fingerprint": fingerprint(shape),
+            "params_fingerprint": fingerprint(parameters),
+            "duration_ms": round(seconds * 1000, 3),
+            "plan": plan,
+            "full_scan": is_full_scan(plan)
+        }
+        self._log.write(entry)
+
+        with self._lock:
+            stats = self._shapes.get(shape)
+            if stats is None:
+                if len(self._shapes) >= SLOW_QUERY_MAX_SHAPES:
+                    cheapest = min(self._shapes, key=lambda key: self._shapes[key]["total_ms"])
+                    del self._shapes[cheapest]
+                stats = self._shapes[shape] = {
+                    "sql": shape,
+                    "sql_fingerprint": entry["sql_fingerprint"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "params_fingerprints": set()
+                }
+            stats["count"] += 1
+            stats["total_ms"] += entry["duration_ms"]
+            stats["max_ms"] = max(stats["max_ms"], entry["duration_ms"])
+            stats["last_seen"] = entry["timestamp"]
+            stats["plan"] = plan
+            stats["full_scan"] = entry["full_scan"]
+            if len(stats["params_fingerprints"]) < 100:
+                stats["params_fingerprints"].add(entry["params_fingerprint"])
+
+    def top(self, limit: int = 20, order_by: str = "total_ms") -> List[dict]:
+        """Statement shapes with the most total (or max, or count) slow time"""
+        with self._lock:
+            shapes = sorted(self._shapes.values(), key=lambda stats: stats[order_by], reverse=True)[:limit]
+            return [
+                {
+                    **{key: value for key, value in stats.items() if key != "params_fingerprints"},
+                    "total_ms": round(stats["total_ms"], 3),
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 3),
+                    "distinct_params": len(stats["params_fingerprints"])
+                }
+                for stats in shapes
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+slow_query_log = SlowQueryLog()
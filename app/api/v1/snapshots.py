@@ -0,0 +1,196 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, List, Tuple
+from .database import DATABASE_FILE, get_db
+from .metrics import InstrumentedConnection
+
+# --- Configuration ---
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+# Seconds between automatic snapshots; 0 disables the background thread
+SNAPSHOT_INTERVAL_SECONDS = int(os.environ.get('SNAPSHOT_INTERVAL_SECONDS', '0'))
+# Snapshots older than this are not used for reads; 0 always reads the live DB
+SNAPSHOT_MAX_AGE_SECONDS = int(os.environ.get('SNAPSHOT_MAX_AGE_SECONDS', '900'))
+SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', '3'))
+# Pages copied per backup step; the source is unlocked between steps
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+
+SNAPSHOT_PATTERN = re.compile(r'^sales_data_(\d{8}_\d{6}_\d{6})\.db$')
+
+class SnapshotManager:
+    """Read-only point-in-time copies of the live database.
+
+    Snapshots are taken with the SQLite online backup API a few pages at a
+    time, so writers on the live database are only blocked for one step.
+    Each snapshot is written to a temporary file and renamed into place when
+    complete, and readers open it immutable so it never takes a lock.
+
+    Reads only use snapshots while the background job runs. The newest one
+    is kept in memory, so picking it costs no filesystem calls, and a
+    snapshot taken before the last migration is never used.
+    """
+
+    def __init__(self, source: str = DATABASE_FILE, directory: str = SNAPSHOT_DIR,
+                 keep: int = SNAPSHOT_KEEP):
+        self.source = source
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # Newest snapshot at the live database's migration version
+        self._latest: Optional[dict] = None
+
+    def create_snapshot(self) -> dict:
+        """Copy the live database into a new snapshot file"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            started = datetime.now()
+            path = os.path.join(self.directory, f"sales_data_{started.strftime('%Y%m%d_%H%M%S_%f')}.db")
+            temp_path = f"{path}.tmp"
+
+            source = sqlite3.connect(self.source)
+            target = sqlite3.connect(temp_path)
+            try:
+                # The backup restarts if another connection writes mid-copy,
+                # so the result is always one consistent state of the source
+                source.backup(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP)
+            except Exception:
+                target.close()
+                os.remove(temp_path)
+                raise
+            finally:
+                source.close()
+            target.close()
+
+            os.replace(temp_path, path)
+            os.chmod(path, 0o444)
+            logging.info(f"Snapshot created: {path} in {(datetime.now() - started).total_seconds():.2f}s")
+
+            self.prune()
+            snapshot = self.describe(path)
+            self._latest = snapshot
+            return snapshot
+
+    def describe(self, path: str) -> dict:
+        """Name, creation time, age and size of a snapshot file"""
+        created_at = snapshot_timestamp(path)
+        return {
+            'name': os.path.basename(path),
+            'path': path,
+            'created_at': created_at.isoformat(),
+            'age_seconds': round((datetime.now() - created_at).total_seconds(), 3),
+            'size_bytes': os.path.getsize(path)
+        }
+
+    def list_snapshots(self) -> List[dict]:
+        """Completed snapshots, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        paths = [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if SNAPSHOT_PATTERN.match(name)
+        ]
+        return sorted((self.describe(path) for path in paths), key=lambda s: s['created_at'], reverse=True)
+
+    def latest(self, max_age_seconds: int = SNAPSHOT_MAX_AGE_SECONDS) -> Optional[dict]:
+        """Newest snapshot if the job is running and it is younger than max_age_seconds"""
+        snapshot = self._latest
+        if max_age_seconds <= 0 or self._thread is None or snapshot is None:
+            return None
+        age_seconds = (datetime.now() - datetime.fromisoformat(snapshot['created_at'])).total_seconds()
+        if age_seconds > max_age_seconds:
+            return None
+        return {**snapshot, 'age_seconds': round(age_seconds, 3)}
+
+    def prune(self) -> int:
+        """Delete all but the newest `keep` snapshots and pick the newest usable one"""
+        snapshots = self.list_snapshots()
+        removed = 0
+        for snapshot in snapshots[self.keep:]:
+            try:
+                os.remove(snapshot['path'])
+                removed += 1
+            except OSError as e:
+                logging.warning(f"Could not remove snapshot {snapshot['path']}: {str(e)}")
+
+        current = migration_version(self.source)
+        self._latest = next(
+            (snapshot for snapshot in snapshots[:self.keep] if migration_version(snapshot['path']) == current),
+            None
+        )
+        return removed
+
+    def start(self, interval_seconds: int = SNAPSHOT_INTERVAL_SECONDS):
+        """Take a snapshot every interval_seconds on a daemon thread"""
+        if interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        with self._lock:
+            self.prune()
+
+        def run():
+            while True:
+                try:
+                    self.create_snapshot()
+                except Exception as e:
+                    logging.error(f"Snapshot failed: {str(e)}")
+                if self._stop.wait(interval_seconds):
+                    break
+
+        self._thread = threading.Thread(target=run, name="snapshot-manager", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+def migration_version(path: str) -> Optional[str]:
+    """Last migration recorded in a database's schema_migrations, None if it has none"""
+    conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()[0]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+def snapshot_timestamp(path: str) -> datetime:
+    """Creation time embedded in a snapshot filename, or its mtime"""
+    match = SNAPSHOT_PATTERN.match(os.path.basename(path))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S_%f")
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+snapshot_manager = SnapshotManager()
+
+def get_snapshot_db(check_same_thread: bool = True) -> Tuple[sqlite3.Connection, Optional[dict]]:
+    """Connection to the latest fresh snapshot, or the live database if there is none.
+
+    Returns the connection and the snapshot it reads from (None for live).
+    """
+    snapshot = snapshot_manager.latest()
+    if snapshot is None:
+        return get_db(check_same_thread=check_same_thread), None
+
+    uri = f"file:{os.path.abspath(snapshot['path'])}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread, factory=InstrumentedConnection)
+    conn.row_factory = sqlite3.Row
+    return conn, snapshot
+
+def snapshot_headers(snapshot: Optional[dict]) -> dict:
+    """Response headers telling clients which data they were served"""
+    if snapshot is None:
+        return {"X-Data-Source": "live"}
+    return {
+        "X-Data-Source": "snapshot",
+        "X-Snapshot-Created": snapshot['created_at'],
+        "X-Snapshot-Age": str(snapshot['age_seconds'])
+    }
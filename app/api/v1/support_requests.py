@@ -5,6 +5,9 @@ from datetime import datetime
 from pydantic import BaseModel
 from sqlite3 import Error
 from .database import get_db
+from .serialization import FastJSONResponse, fetch_records, public_record
+from .cache import invalidate
+from .dates import sql_date, sql_datetime
 
 router = APIRouter(prefix="/api/support-requests", tags=["Support Requests"])
 
@@ -39,7 +42,8 @@ async def list_support_requests(
     status: Optional[str] = None,
     priority: Optional[str] = None,
     assigned_to: Optional[int] = None,
-    request_type: Optional[str] = None
+    request_type: Optional[str] = None,
+    is_open: Optional[bool] = Query(None, description="Only open (or, if false, resolved/completed/closed) requests")
 ):
     try:
         db = get_db()
@@ -79,6 +83,10 @@ async def list_support_requests(
             query += " AND sr.request_type = ?"
             params.append(request_type)
         
+        # Written as the condition of idx_support_requests_open_created
+        if is_open is not None:
+            query += " AND sr.is_open" if is_open else " AND NOT sr.is_open"
+        
         # Get total count
         count_query = query.replace(
             "SELECT \n                sr.*,\n                o.opportunity_name,\n                requester.full_name as requested_by_name,\n                assignee.full_name as assigned_to_name",
@@ -93,14 +101,14 @@ async def list_support_requests(
         params.extend([limit, offset])
         
         cursor.execute(query, params)
-        requests = [dict(row) for row in cursor.fetchall()]
+        requests = fetch_records(cursor)
         
-        return {
+        return FastJSONResponse({
             "totalRecords": total_records,
             "totalPages": (total_records + limit - 1) // limit,
             "currentPage": page,
             "data": requests
-        }
+        })
         
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -117,7 +125,7 @@ async def get_support_request(request_id: int = Path(..., ge=1)):
             SELECT 
                 sr.*,
                 o.opportunity_name,
-                o.stage_name as opportunity_stage,
+                osn.stage_name as opportunity_stage,
                 o.total_amount as opportunity_amount,
                 requester.full_name as requested_by_name,
                 requester.email as requested_by_email,
@@ -125,6 +133,7 @@ async def get_support_request(request_id: int = Path(..., ge=1)):
                 assignee.email as assigned_to_email
             FROM support_requests sr
             LEFT JOIN opportunities o ON sr.opportunity_id = o.opportunity_id
+            LEFT JOIN opportunity_stage_names osn ON o.stage_name_id = osn.stage_name_id
             LEFT JOIN users requester ON sr.requested_by = requester.user_id
             LEFT JOIN users assignee ON sr.assigned_to = assignee.user_id
             WHERE sr.request_id = ?
@@ -134,7 +143,7 @@ async def get_support_request(request_id: int = Path(..., ge=1)):
         if not request:
             raise HTTPException(status_code=404, detail="Support request not found")
         
-        return dict(request)
+        return public_record(request)
         
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -177,11 +186,12 @@ async def create_support_request(request: SupportRequestCreate):
             request.description, request.priority,
             request.status, request.requested_by,
             request.assigned_to,
-            request.due_date.isoformat() if request.due_date else None
+            sql_date(request.due_date) if request.due_date else None
         ))
         
         request_id = cursor.lastrowid
         db.commit()
+        invalidate("support_requests")
         
         # Get created request
         cursor.execute("""
@@ -196,7 +206,7 @@ async def create_support_request(request: SupportRequestCreate):
             LEFT JOIN users assignee ON sr.assigned_to = assignee.user_id
             WHERE sr.request_id = ?
         """, (request_id,))
-        created_request = dict(cursor.fetchone())
+        created_request = public_record(cursor.fetchone())
         
         return created_request
         
@@ -261,7 +271,7 @@ async def update_support_request(
         
         if request.due_date is not None:
             update_fields.append("due_date = ?")
-            params.append(request.due_date.isoformat())
+            params.append(sql_date(request.due_date))
         
         if request.resolution is not None:
             update_fields.append("resolution = ?")
@@ -269,7 +279,7 @@ async def update_support_request(
         
         if request.resolved_date is not None:
             update_fields.append("resolved_date = ?")
-            params.append(request.resolved_date.isoformat())
+            params.append(sql_datetime(request.resolved_date))
         
         if update_fields:
             query = f"""
@@ -281,6 +291,7 @@ async def update_support_request(
             
             cursor.execute(query, params)
             db.commit()
+            invalidate("support_requests")
         
         # Get updated request
         cursor.execute("""
@@ -295,7 +306,7 @@ async def update_support_request(
             LEFT JOIN users assignee ON sr.assigned_to = assignee.user_id
             WHERE sr.request_id = ?
         """, (request_id,))
-        updated_request = dict(cursor.fetchone())
+        updated_request = public_record(cursor.fetchone())
         
         return updated_request
         
@@ -323,6 +334,7 @@ async def delete_support_request(request_id: int = Path(..., ge=1)):
         cursor.execute("DELETE FROM support_requests WHERE request_id = ?",
                       (request_id,))
         db.commit()
+        invalidate("support_requests")
         
         return {"message": "Support request deleted successfully"}
         
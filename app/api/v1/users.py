@@ -2,13 +2,32 @@ from fastapi import APIRouter, HTTPException, Path, Query
 from typing import Optional
 from sqlite3 import Error
 from .database import get_db
+from .serialization import FastJSONResponse, fetch_records
+from .archive import archive_source
+from .dimensions import dimensions
 
 router = APIRouter(prefix="/api/users", tags=["Users"])
 
+# One page of users with their opportunity rollups. The page is picked
+# before the join, so only its users' opportunities are aggregated, from
+# the covering idx_opportunities_owner_rollup index
+USER_LIST_QUERY = """
+    SELECT 
+        u.*,
+        COUNT(DISTINCT o.opportunity_id) as opportunity_count,
+        SUM(CASE WHEN o.is_closed = 0 THEN o.total_amount ELSE 0 END) as open_opportunity_value,
+        SUM(CASE WHEN o.is_closed = 1 AND o.is_won = 1 THEN o.total_amount ELSE 0 END) as won_opportunity_value
+    FROM (SELECT * FROM users ORDER BY full_name, user_id LIMIT ? OFFSET ?) u
+    LEFT JOIN {opportunities} o ON u.user_id = o.owner_id
+    GROUP BY u.user_id
+    ORDER BY u.full_name, u.user_id
+"""
+
 @router.get("")
 async def get_users(
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    includeArchived: bool = Query(False, description="Include archived opportunities in the totals")
 ):
     """Get all users with pagination"""
     try:
@@ -21,27 +40,19 @@ async def get_users(
         
         # Get users with pagination
         offset = (page - 1) * limit
-        cursor.execute("""
-            SELECT 
-                u.*,
-                COUNT(DISTINCT o.opportunity_id) as opportunity_count,
-                SUM(CASE WHEN o.is_closed = 0 THEN o.total_amount ELSE 0 END) as open_opportunity_value,
-                SUM(CASE WHEN o.is_closed = 1 AND o.is_won = 1 THEN o.total_amount ELSE 0 END) as won_opportunity_value
-            FROM users u
-            LEFT JOIN opportunities o ON u.user_id = o.owner_id
-            GROUP BY u.user_id, u.username, u.first_name, u.last_name, u.full_name, u.created_at
-            ORDER BY u.full_name
-            LIMIT ? OFFSET ?
-        """, (limit, offset))
+        cursor.execute(
+            USER_LIST_QUERY.format(opportunities=archive_source(cursor, "opportunities", includeArchived)),
+            (limit, offset)
+        )
         
-        users = [dict(row) for row in cursor.fetchall()]
+        users = fetch_records(cursor)
         
-        return {
+        return FastJSONResponse({
             "totalRecords": total_records,
             "totalPages": (total_records + limit - 1) // limit,
             "currentPage": page,
             "data": users
-        }
+        })
         
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -88,9 +99,9 @@ async def get_user_opportunities(
         """
         params = [user_id]
         
+        # A literal, so open pipelines can use idx_opportunities_open_owner_close
         if is_closed is not None:
-            query += " AND o.is_closed = ?"
-            params.append(1 if is_closed else 0)
+            query += " AND o.is_closed = 1" if is_closed else " AND o.is_closed = 0"
         
         # Get total count
         count_query = query.replace(
@@ -105,14 +116,14 @@ async def get_user_opportunities(
         params.extend([limit, (page - 1) * limit])
         
         cursor.execute(query, params)
-        opportunities = [dict(row) for row in cursor.fetchall()]
+        opportunities = dimensions.decorate(db, fetch_records(cursor))
         
-        return {
+        return FastJSONResponse({
             "totalRecords": total_records,
             "totalPages": (total_records + limit - 1) // limit,
             "currentPage": page,
             "data": opportunities
-        }
+        })
         
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
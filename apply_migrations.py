@@ -1,101 +1,304 @@
-import sqlite3
 import os
-from datetime import datetime
+import sys
+import time
+import logging
+import hashlib
+import sqlite3
+import argparse
+import importlib.util
+from typing import Dict, List, Optional
+
+# --- Configuration ---
+DATABASE_FILE = os.environ.get('SALES_DB', 'sales_data.db')
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+# Apply pending migrations when the API starts instead of only logging them
+MIGRATE_ON_STARTUP = os.environ.get('MIGRATE_ON_STARTUP', '0') == '1'
+
+# Migrations in the order they are applied. A migration's version is its file
+# name without the extension. .sql files run statement by statement, .py files
+# define migrate(conn). Each runs in its own transaction and is recorded in
+# schema_migrations with a checksum of the file, so it only ever runs once
+MIGRATION_FILES = [
+    '001_opportunity_columns.py',
+    '001_schema_updates.sql',
+    '002_add_project_plan.sql',
+    '003_detail_lookup_indexes.sql',
+    '004_etag_aggregate_indexes.sql',
+    '005_opportunity_changesets.sql',
+    '006_opportunity_state_snapshots.sql',
+    '007_opportunity_archive.sql',
+    '008_open_pipeline_indexes.sql',
+    '009_date_day_numbers.sql',
+    '010_fiscal_calendar.sql',
+    '011_opportunity_dimensions.sql',
+    '012_table_write_versions.sql'
+]
+
+SCHEMA_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version TEXT PRIMARY KEY,
+        checksum TEXT NOT NULL,
+        applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        duration_ms REAL
+    )
+"""
+
+# The runner before schema_migrations applied every migration on each run
+# without recording it. Databases created by setup_database_schema.py or
+# migrated by it through 002 have these objects and already hold 001 and 002
+BASELINE_VERSION = '002_add_project_plan'
+BASELINE_TABLES = ('opportunity_project_plan', 'pipeline_sources')
+BASELINE_COLUMN = 'project_plan_id'
+# Databases it migrated further have migration 005's table. How far cannot be
+# told from the schema, so those need an explicit --baseline
+LEGACY_MARKER_TABLE = 'opportunity_changesets'
+
+class MigrationError(Exception):
+    pass
+
+def split_statements(migration_sql):
+    """Statements of a migration file, keeping trigger bodies whole"""
+    statements = []
+    current = ""
+    for part in migration_sql.split(';'):
+        current += part + ';'
+        # Semicolons inside trigger bodies, strings and comments do not end a statement
+        if sqlite3.complete_statement(current):
+            statements.append(current)
+            current = ""
+    if current.strip(' \n;'):
+        statements.append(current)
+    return statements
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[dict]:
+    """Version, path, source and checksum of every migration in MIGRATION_FILES"""
+    migrations = []
+    for file_name in MIGRATION_FILES:
+        path = os.path.join(directory, file_name)
+        with open(path, 'rb') as f:
+            source = f.read()
+        migrations.append({
+            "version": os.path.splitext(file_name)[0],
+            "path": path,
+            "source": source.decode('utf-8'),
+            "checksum": hashlib.sha256(source).hexdigest()
+        })
+    return migrations
+
+def connect(path: str = DATABASE_FILE) -> sqlite3.Connection:
+    # Transactions are begun and ended explicitly, one per migration
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def applied_versions(conn: sqlite3.Connection) -> Dict[str, str]:
+    """Recorded version -> checksum, empty before the first versioned run"""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'").fetchone():
+        return {}
+    return dict(conn.execute("SELECT version, checksum FROM schema_migrations"))
+
+def implied_baseline(conn: sqlite3.Connection, applied: Dict[str, str]) -> Optional[str]:
+    """The last migration a database without recorded versions already has, if any.
+
+    Databases with the schema of 001 and 002 are at BASELINE_VERSION. Ones
+    with only part of it, or with later migrations, are refused: running
+    them from the start would redo migrations on existing data.
+    """
+    if applied:
+        return None
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if LEGACY_MARKER_TABLE in tables:
+        raise MigrationError(
+            "Database was migrated before versions were recorded; run with --baseline <version> "
+            "to record the migrations it already has, e.g. --baseline 011_opportunity_dimensions"
+        )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(opportunities)")}
+    found = [table in tables for table in BASELINE_TABLES] + [BASELINE_COLUMN in columns]
+    if all(found):
+        return BASELINE_VERSION
+    if any(found):
+        raise MigrationError(
+            "Database has part of the schema of migrations 001 and 002 but no recorded versions; "
+            "run with --baseline <version> to record the migrations it already has"
+        )
+    return None
+
+def pending_migrations(conn: sqlite3.Connection, migrations: List[dict]) -> List[dict]:
+    """Migrations not applied yet, after checking the applied ones are unchanged.
+
+    An applied migration whose file changed is an error: its new statements
+    would never run. Revert the file and add the change as a new migration.
+    Migrations up to the implied baseline of an unversioned database are
+    not pending; migrate() records them without running them.
+    """
+    applied = applied_versions(conn)
+    changed = [m["version"] for m in migrations if m["version"] in applied and applied[m["version"]] != m["checksum"]]
+    if changed:
+        raise MigrationError(f"Applied migrations changed since they ran: {', '.join(changed)}")
+    implied = implied_baseline(conn, applied)
+    if implied:
+        versions = [m["version"] for m in migrations]
+        applied = dict.fromkeys(versions[:versions.index(implied) + 1])
+    return [m for m in migrations if m["version"] not in applied]
 
-def apply_migrations():
+def load_module(migration: dict):
+    spec = importlib.util.spec_from_file_location(f"migration_{migration['version']}", migration["path"])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def run_statements(conn: sqlite3.Connection, migration: dict):
+    for statement in split_statements(migration["source"]):
+        if statement.strip(' \n;'):
+            try:
+                conn.execute(statement)
+            except sqlite3.Error as e:
+                raise MigrationError(f"{migration['version']}: {e} in: {statement.strip()[:200]}") from e
+
+def record_migration(conn: sqlite3.Connection, migration: dict, duration_ms: float):
+    conn.execute(SCHEMA_MIGRATIONS_TABLE)
+    conn.execute(
+        "INSERT INTO schema_migrations (version, checksum, duration_ms) VALUES (?, ?, ?)",
+        (migration["version"], migration["checksum"], duration_ms)
+    )
+
+def apply_migration(conn: sqlite3.Connection, migration: dict) -> float:
+    """Run one migration and record it in a single transaction; return its duration in ms.
+
+    A .py migration setting TRANSACTIONAL = False runs its own short
+    transactions instead, such as an online table rebuild, and is recorded
+    once it finishes. It must be safe to rerun if interrupted.
+    """
+    started = time.perf_counter()
+    module = load_module(migration) if migration["path"].endswith('.py') else None
+    if module is not None and not getattr(module, 'TRANSACTIONAL', True):
+        module.migrate(conn)
+        duration_ms = (time.perf_counter() - started) * 1000
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            record_migration(conn, migration, duration_ms)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return duration_ms
+
+    # IMMEDIATE takes the write lock up front, so a concurrent writer cannot
+    # interleave with the migration
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if module is not None:
+            module.migrate(conn)
+        else:
+            run_statements(conn, migration)
+        duration_ms = (time.perf_counter() - started) * 1000
+        record_migration(conn, migration, duration_ms)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return duration_ms
+
+def baseline(conn: sqlite3.Connection, migrations: List[dict], version: str) -> List[str]:
+    """Record the migrations up to and including version as applied, without running them"""
+    versions = [m["version"] for m in migrations]
+    if version not in versions:
+        raise MigrationError(f"Unknown migration version: {version}")
+    recorded = migrations[:versions.index(version) + 1]
+    applied = applied_versions(conn)
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        # Connect to the database
-        conn = sqlite3.connect('sales_data.db')
-        cursor = conn.cursor()
-        
-        # Enable foreign keys
-        cursor.execute("PRAGMA foreign_keys = ON")
-        
-        # List of migration files to apply in order
-        migration_files = [
-            'migrations/001_schema_updates.sql',
-            'migrations/002_add_project_plan.sql'
-        ]
-        
-        # Apply each migration file
-        for migration_file in migration_files:
-            print(f"\nApplying migration: {migration_file}")
-            with open(migration_file, 'r') as f:
-                migration_sql = f.read()
-                
-            # Split the migration into individual statements
-            statements = migration_sql.split(';')
-            
-            # Execute each statement
-            for statement in statements:
-                if statement.strip():
-                    try:
-                        cursor.execute(statement)
-                        print(f"Executed: {statement[:100]}...")
-                    except sqlite3.Error as e:
-                        # Skip if column already exists
-                        if "duplicate column name" in str(e):
-                            print(f"Skipping (column already exists): {statement[:100]}...")
-                            continue
-                        # Skip if table already exists
-                        elif "table already exists" in str(e):
-                            print(f"Skipping (table already exists): {statement[:100]}...")
-                            continue
-                        # Skip if index already exists
-                        elif "index already exists" in str(e):
-                            print(f"Skipping (index already exists): {statement[:100]}...")
-                            continue
-                        # Skip if trigger already exists
-                        elif "trigger already exists" in str(e):
-                            print(f"Skipping (trigger already exists): {statement[:100]}...")
-                            continue
-                        else:
-                            print(f"Error executing statement: {statement[:100]}...")
-                            print(f"Error: {str(e)}")
-        
-        # Commit the changes
-        conn.commit()
-        print("\nAll migrations completed successfully!")
-        
-        # Verify the project plan table was created
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='opportunity_project_plan'
-        """)
-        if cursor.fetchone():
-            print("\nProject plan table created successfully!")
-            
-            # Show table structure
-            cursor.execute("PRAGMA table_info(opportunity_project_plan)")
-            columns = cursor.fetchall()
-            print("\nProject plan table structure:")
-            for col in columns:
-                print(f"Column: {col[1]}, Type: {col[2]}")
-            
-            # Show sample data
-            cursor.execute("""
-                SELECT p.project_plan_id, p.opportunity_id, p.opportunity_owner, o.opportunity_name
-                FROM opportunity_project_plan p
-                JOIN opportunities o ON p.opportunity_id = o.opportunity_id
-                LIMIT 5
-            """)
-            results = cursor.fetchall()
-            print("\nSample project plan data:")
-            for row in results:
-                print(f"Project Plan ID: {row[0]}, Opportunity ID: {row[1]}, Owner: {row[2]}, Opportunity: {row[3]}")
-        
-    except sqlite3.Error as e:
-        print(f"Database error: {str(e)}")
-        conn.rollback()
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        conn.rollback()
+        conn.execute(SCHEMA_MIGRATIONS_TABLE)
+        conn.executemany(
+            "INSERT INTO schema_migrations (version, checksum) VALUES (?, ?)",
+            [(m["version"], m["checksum"]) for m in recorded if m["version"] not in applied]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return [m["version"] for m in recorded if m["version"] not in applied]
+
+def migrate(path: str = DATABASE_FILE, directory: str = MIGRATIONS_DIR, verbose: bool = True) -> List[str]:
+    """Apply pending migrations in order and return their versions.
+
+    On an up-to-date database this is one query on schema_migrations and a
+    hash of each file. A failing migration is rolled back and stops the
+    run, leaving the migrations before it applied.
+    """
+    migrations = load_migrations(directory)
+    conn = connect(path)
+    try:
+        implied = implied_baseline(conn, applied_versions(conn))
+        if implied:
+            recorded = baseline(conn, migrations, implied)
+            if verbose:
+                print(f"Recorded migrations already in the schema: {', '.join(recorded)}")
+        applied = []
+        for migration in pending_migrations(conn, migrations):
+            if verbose:
+                print(f"Applying {migration['version']}...")
+            duration_ms = apply_migration(conn, migration)
+            applied.append(migration["version"])
+            if verbose:
+                print(f"  done in {duration_ms / 1000:.2f}s")
+        return applied
     finally:
         conn.close()
 
+def check_on_startup(path: str = DATABASE_FILE):
+    """Log pending migrations when the API starts, or apply them with MIGRATE_ON_STARTUP"""
+    try:
+        if MIGRATE_ON_STARTUP:
+            applied = migrate(path, verbose=False)
+            if applied:
+                logging.info(f"Applied migrations: {', '.join(applied)}")
+            return
+        conn = connect(path)
+        try:
+            pending = pending_migrations(conn, load_migrations())
+        finally:
+            conn.close()
+        if pending:
+            logging.warning(f"Pending migrations, run apply_migrations.py: {', '.join(m['version'] for m in pending)}")
+    except (MigrationError, sqlite3.Error) as e:
+        # Endpoints needing a missing migration answer 503; the rest keep working
+        logging.error(f"Migration check failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the pending migrations in migrations/, each in its own transaction")
+    parser.add_argument("--db", default=DATABASE_FILE, help="Database to migrate")
+    parser.add_argument("--check", action="store_true", help="Only list pending migrations; exit with status 1 if there are any")
+    parser.add_argument("--baseline", metavar="VERSION",
+                        help="Record the migrations up to VERSION as applied without running them, "
+                             "for databases migrated before versions were recorded")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        if args.baseline:
+            conn = connect(args.db)
+            try:
+                recorded = baseline(conn, load_migrations(), args.baseline)
+            finally:
+                conn.close()
+            print(f"Recorded {len(recorded)} migrations as applied: {', '.join(recorded) or 'none'}")
+        elif args.check:
+            conn = connect(args.db)
+            try:
+                pending = pending_migrations(conn, load_migrations())
+            finally:
+                conn.close()
+            for migration in pending:
+                print(f"Pending: {migration['version']}")
+            print(f"{len(pending)} pending migrations ({(time.perf_counter() - started) * 1000:.2f} ms)")
+            sys.exit(1 if pending else 0)
+        else:
+            applied = migrate(args.db)
+            print(f"{len(applied)} migrations applied ({(time.perf_counter() - started) * 1000:.2f} ms)")
+    except (MigrationError, sqlite3.Error) as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+
 if __name__ == "__main__":
-    # Create migrations directory if it doesn't exist
-    if not os.path.exists('migrations'):
-        os.makedirs('migrations')
-    
-    apply_migrations() 
\ No newline at end of file
+    main()
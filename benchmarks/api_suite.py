@@ -0,0 +1,379 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.datasets import ensure_database
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+class Scenario:
+    """One endpoint driven with generated path parameters, query strings and bodies"""
+
+    def __init__(self, name: str, method: str, path: str, params: Optional[Callable] = None,
+                 body: Optional[Callable] = None, requests: Optional[int] = None, unique: bool = False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.params = params
+        self.body = body
+        # Overrides --requests for endpoints too heavy to run many times
+        self.requests = requests
+        # Each request gets path keys no other request uses, for deletes
+        self.unique = unique
+
+    def path_keys(self) -> List[str]:
+        return [name for name in Ids.QUERIES if f"{{{name}}}" in self.path]
+
+    def build(self, ids: "Ids", rng: random.Random) -> dict:
+        return {
+            "method": self.method,
+            "url": self.path.format(**(ids.take(rng, self.path_keys()) if self.unique else ids.pick(rng))),
+            "params": self.params(ids, rng) if self.params else None,
+            "json": self.body(ids, rng) if self.body else None
+        }
+
+class Ids:
+    """Existing keys of the benchmark database, to build requests that hit real rows"""
+
+    QUERIES = {
+        "opportunity_id": "SELECT opportunity_id FROM opportunities",
+        "account_id": "SELECT account_id FROM accounts",
+        "user_id": "SELECT user_id FROM users",
+        "influencer_id": "SELECT influencer_id FROM influencers",
+        "engagement_id": "SELECT engagement_id FROM influencer_engagements",
+        "request_id": "SELECT request_id FROM support_requests",
+        "stage_id": "SELECT stage_id FROM stages",
+        # Influencers can only be deleted while they have no engagements
+        "unengaged_influencer_id": """
+            SELECT influencer_id FROM influencers
+            WHERE influencer_id NOT IN (SELECT influencer_id FROM influencer_engagements)
+        """
+    }
+    SAMPLE = 10000
+
+    def __init__(self, path: str):
+        self.path = path
+        self.keys = {}
+        self.refresh(list(self.QUERIES))
+
+    def refresh(self, names: List[str]):
+        """Sample the keys again, e.g. to find rows created by earlier scenarios"""
+        conn = sqlite3.connect(self.path)
+        for name in names:
+            self.keys[name] = [row[0] for row in conn.execute(f"{self.QUERIES[name]} ORDER BY RANDOM() LIMIT {self.SAMPLE}")]
+        conn.close()
+
+    def pick(self, rng: random.Random) -> dict:
+        return {name: rng.choice(keys) for name, keys in self.keys.items() if keys}
+
+    def take(self, rng: random.Random, names: List[str]) -> dict:
+        """Keys removed from the sample, so later requests never pick a deleted row"""
+        taken = {name: self.keys[name].pop(rng.randrange(len(self.keys[name]))) for name in names}
+        if "unengaged_influencer_id" in taken and taken["unengaged_influencer_id"] in self.keys["influencer_id"]:
+            self.keys["influencer_id"].remove(taken["unengaged_influencer_id"])
+        return taken
+
+    def available(self, names: List[str]) -> int:
+        return min(len(self.keys[name]) for name in names)
+
+def engagement_body(ids: Ids, rng: random.Random) -> dict:
+    return {
+        "influencer_id": rng.choice(ids.keys["influencer_id"]),
+        "opportunity_id": rng.choice(ids.keys["opportunity_id"]),
+        "engagement_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00",
+        "engagement_type": rng.choice(["Meeting", "Call", "Email"]),
+        "description": "Benchmark engagement",
+        "created_by": rng.choice(ids.keys["user_id"])
+    }
+
+# Writes run against the scratch copy of the benchmark database. Deletes come
+# after every scenario reading the rows they remove; influencers.delete finds
+# the influencers influencers.create added, as generated ones all have
+# engagements. Archiving comes last since it moves closed opportunities out
+# of the hot tables
+SCENARIOS = [
+    Scenario("opportunities.list", "GET", "/api/opportunities",
+             lambda ids, rng: {"page": rng.randint(1, 5)}),
+    Scenario("opportunities.list_filtered", "GET", "/api/opportunities",
+             lambda ids, rng: {"ownerId": rng.choice(ids.keys["user_id"]), "closeDateStart": "2024-01-01"}),
+    Scenario("opportunities.detail", "GET", "/api/opportunities/{opportunity_id}"),
+    Scenario("opportunities.history", "GET", "/api/opportunities/{opportunity_id}/history"),
+    Scenario("opportunities.patch", "PATCH", "/api/opportunities/{opportunity_id}",
+             body=lambda ids, rng: {"next_step": f"Benchmark follow-up {rng.randint(1, 1000)}"}),
+    Scenario("opportunities.bulk_patch", "PATCH", "/api/opportunities",
+             body=lambda ids, rng: [
+                 {"id": opportunity_id, "changes": {"next_step": f"Benchmark follow-up {rng.randint(1, 1000)}"}}
+                 for opportunity_id in rng.sample(ids.keys["opportunity_id"], min(50, len(ids.keys["opportunity_id"])))
+             ], requests=50),
+    Scenario("accounts.list", "GET", "/api/accounts", lambda ids, rng: {"page": rng.randint(1, 5)}),
+    Scenario("accounts.detail", "GET", "/api/accounts/{account_id}"),
+    Scenario("accounts.update", "PUT", "/api/accounts/{account_id}",
+             body=lambda ids, rng: {"account_name": f"Benchmark Account {rng.getrandbits(48)}"}),
+    Scenario("accounts.create", "POST", "/api/accounts",
+             body=lambda ids, rng: {"account_name": f"Benchmark New Account {rng.getrandbits(48)}"}),
+    Scenario("support_requests.list", "GET", "/api/support-requests", lambda ids, rng: {"page": rng.randint(1, 5)}),
+    Scenario("support_requests.detail", "GET", "/api/support-requests/{request_id}"),
+    Scenario("support_requests.update", "PUT", "/api/support-requests/{request_id}",
+             body=lambda ids, rng: {"status": rng.choice(["Open", "In Progress"])}),
+    Scenario("support_requests.create", "POST", "/api/support-requests",
+             body=lambda ids, rng: {
+                 "opportunity_id": rng.choice(ids.keys["opportunity_id"]),
+                 "request_type": rng.choice(["Technical", "Pricing", "Legal"]),
+                 "description": "Benchmark request",
+                 "priority": rng.choice(["Low", "Medium", "High"]),
+                 "status": "Open",
+                 "requested_by": rng.choice(ids.keys["user_id"])
+             }),
+    Scenario("sales_review", "GET", "/api/sales-review",
+             lambda ids, rng: {"user_id": rng.choice(ids.keys["user_id"])}, requests=20),
+    Scenario("calibration", "GET", "/api/calibration",
+             lambda ids, rng: {"user_id": rng.choice(ids.keys["user_id"])}, requests=20),
+    Scenario("users.list", "GET", "/api/users"),
+    Scenario("users.opportunities", "GET", "/api/users/{user_id}/opportunities"),
+    Scenario("influencers.list", "GET", "/api/influencers", lambda ids, rng: {"page": rng.randint(1, 5)}),
+    Scenario("influencers.detail", "GET", "/api/influencers/{influencer_id}"),
+    Scenario("influencers.patch", "PATCH", "/api/influencers/{influencer_id}",
+             body=lambda ids, rng: {"notes": f"Benchmark note {rng.randint(1, 1000)}"}),
+    Scenario("influencers.create", "POST", "/api/influencers",
+             body=lambda ids, rng: {
+                 "first_name": "Bench",
+                 "last_name": f"Mark {rng.randint(1, 100000)}",
+                 "account_id": rng.choice(ids.keys["account_id"]),
+                 "role": rng.choice(["Champion", "Decision Maker", "Influencer"]),
+                 "influence_level": rng.choice(["High", "Medium", "Low"])
+             }),
+    Scenario("influencers.by_opportunity", "GET", "/api/influencers/opportunities/{opportunity_id}"),
+    Scenario("influencers.by_opportunity_simple", "GET", "/api/influencers/opportunities/{opportunity_id}/influencers"),
+    Scenario("influencers.create_engagement", "POST", "/api/influencers/engagements", body=engagement_body),
+    Scenario("influencer_engagements.list", "GET", "/api/influencer-engagements",
+             lambda ids, rng: {"page": rng.randint(1, 5)}),
+    Scenario("influencer_engagements.detail", "GET", "/api/influencer-engagements/{engagement_id}"),
+    Scenario("influencer_engagements.create", "POST", "/api/influencer-engagements", body=engagement_body),
+    Scenario("influencer_engagements.update", "PUT", "/api/influencer-engagements/{engagement_id}",
+             body=lambda ids, rng: {"outcome": rng.choice(["Positive", "Neutral", "Negative"])}),
+    Scenario("details.accounts", "GET", "/api/details/accounts",
+             lambda ids, rng: {"ids": rng.sample(ids.keys["account_id"], min(10, len(ids.keys["account_id"])))}),
+    Scenario("details.opportunities", "GET", "/api/details/opportunities",
+             lambda ids, rng: {"ids": rng.sample(ids.keys["opportunity_id"], min(10, len(ids.keys["opportunity_id"])))}),
+    Scenario("export.opportunities", "GET", "/api/export/opportunities", lambda ids, rng: {"format": "ndjson"}, requests=3),
+    Scenario("export.accounts", "GET", "/api/export/accounts", requests=3),
+    Scenario("export.users", "GET", "/api/export/users", requests=3),
+    Scenario("export.support_requests", "GET", "/api/export/support-requests", requests=3),
+    Scenario("export.influencers", "GET", "/api/export/influencers", requests=3),
+    Scenario("export.influencer_engagements", "GET", "/api/export/influencer-engagements", requests=3),
+    Scenario("metrics", "GET", "/metrics", requests=20),
+    Scenario("support_requests.delete", "DELETE", "/api/support-requests/{request_id}", requests=50, unique=True),
+    Scenario("influencer_engagements.delete", "DELETE", "/api/influencer-engagements/{engagement_id}",
+             requests=50, unique=True),
+    Scenario("influencers.delete", "DELETE", "/api/influencers/{unengaged_influencer_id}", requests=50, unique=True),
+    Scenario("admin.snapshots", "GET", "/api/admin/snapshots", requests=20),
+    Scenario("admin.snapshots.create", "POST", "/api/admin/snapshots", requests=3),
+    Scenario("admin.opportunity_snapshots", "GET", "/api/admin/opportunity-snapshots", requests=20),
+    Scenario("admin.opportunity_snapshots.create", "POST", "/api/admin/opportunity-snapshots", requests=3),
+    Scenario("admin.cache", "GET", "/api/admin/cache", requests=20),
+    Scenario("admin.cache.clear", "DELETE", "/api/admin/cache", requests=20),
+    Scenario("admin.coalescing", "GET", "/api/admin/coalescing", requests=20),
+    Scenario("admin.slow_queries", "GET", "/api/admin/slow-queries", requests=20),
+    Scenario("admin.slow_queries.reset", "DELETE", "/api/admin/slow-queries", requests=20),
+    Scenario("admin.filter_usage", "GET", "/api/admin/filter-usage", requests=20),
+    Scenario("admin.archive", "GET", "/api/admin/archive", requests=20),
+    Scenario("admin.archive.run", "POST", "/api/admin/archive", requests=3)
+]
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+async def run_scenario(client, scenario: Scenario, ids: Ids, requests: int, concurrency: int,
+                       warmup: int, seed: int) -> dict:
+    rng = random.Random(f"{seed}:{scenario.name}")
+    planned = [scenario.build(ids, rng) for _ in range(warmup + requests)]
+    for spec in planned[:warmup]:
+        await client.request(**spec)
+
+    queue = list(reversed(planned[warmup:]))
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            spec = queue.pop()
+            started = time.perf_counter()
+            response = await client.request(**spec)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "method": scenario.method,
+        "path": scenario.path,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0
+    }
+
+async def run_suite(app, scenarios: List[Scenario], ids: Ids, args) -> Dict[str, dict]:
+    import httpx
+    results = {}
+    # Unhandled exceptions become 500s and are counted as errors instead of stopping the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for scenario in scenarios:
+            requests = min(args.requests, scenario.requests) if scenario.requests else args.requests
+            if scenario.unique:
+                ids.refresh(scenario.path_keys())
+                requests = min(requests, ids.available(scenario.path_keys()) - args.warmup)
+                if requests <= 0:
+                    print(f"  {scenario.name:<34} skipped, no rows left to use")
+                    continue
+            results[scenario.name] = await run_scenario(
+                client, scenario, ids, requests, args.concurrency, args.warmup, args.seed
+            )
+            result = results[scenario.name]
+            print(f"  {scenario.name:<34} p50 {result['p50_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+                  f"p99 {result['p99_ms']:>9.2f} ms  {result['throughput_rps']:>9.1f} req/s"
+                  + (f"  {result['errors']} errors" if result["errors"] else ""))
+    return results
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline: dict, current: dict, threshold_pct: float, min_delta_ms: float) -> List[str]:
+    """Scenarios whose p50 or p95 got slower than the baseline by more than the threshold.
+
+    Differences under min_delta_ms are ignored so sub-millisecond noise on
+    fast endpoints does not count as a regression.
+    """
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('revision')} at {baseline['meta'].get('timestamp')}:")
+    for setting in ("size", "concurrency", "response_cache"):
+        if baseline["meta"].get(setting) != current["meta"].get(setting):
+            print(f"  Warning: {setting} differs ({baseline['meta'].get(setting)} vs {current['meta'].get(setting)})")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:<34} new")
+            continue
+        flags = []
+        for metric in ("p50_ms", "p95_ms"):
+            delta = result[metric] - before[metric]
+            change = delta / before[metric] * 100 if before[metric] else 0.0
+            if change > threshold_pct and delta > min_delta_ms:
+                flags.append(f"{metric} {before[metric]:.2f} -> {result[metric]:.2f} ms (+{change:.0f}%)")
+        p95_change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        print(f"  {name:<34} p95 {p95_change:+7.1f}%" + (f"  REGRESSION {'; '.join(flags)}" if flags else ""))
+        if flags:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint in-process against a scaled database")
+    parser.add_argument("--db", default="sales_data.db", help="Source database to scale up")
+    parser.add_argument("--size", default="1k", help="Opportunities in the benchmark database: 1k, 100k, 1m or a number")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the cached benchmark database")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per endpoint")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="Comma-separated scenario name prefixes to run")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the response cache enabled")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/<size>_<timestamp>.json)")
+    parser.add_argument("--baseline", help="Results file to compare against; exits 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=15.0, help="Allowed slowdown in percent")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            sys.exit(1 if compare(json.load(f), json.load(g), args.threshold, args.min_delta_ms) else 0)
+
+    print(f"Preparing {args.size} database...")
+    started = time.perf_counter()
+    path = ensure_database(args.db, DATA_DIR, args.size, args.rebuild)
+    print(f"  {path} ready in {time.perf_counter() - started:.1f}s")
+
+    # The app reads its configuration at import time, so point it at a scratch
+    # copy and keep logs, snapshots and profiles out of the working tree
+    scratch = tempfile.mkdtemp(prefix="api_suite_")
+    database = os.path.join(scratch, "bench.db")
+    with sqlite3.connect(path) as src, sqlite3.connect(database) as dst:
+        src.backup(dst)
+    os.environ["SALES_DB"] = database
+    os.environ["SNAPSHOT_DIR"] = os.path.join(scratch, "snapshots")
+    os.environ["SLOW_QUERY_LOG"] = os.path.join(scratch, "slow_queries.log")
+    os.environ["FILTER_USAGE_LOG"] = os.path.join(scratch, "filter_usage.log")
+    if not args.with_cache:
+        os.environ["RESPONSE_CACHE_MAX_BYTES"] = "0"
+    import main as api
+
+    ids = Ids(database)
+    scenarios = [s for s in SCENARIOS if not args.only or any(s.name.startswith(p) for p in args.only.split(","))]
+    print(f"Running {len(scenarios)} scenarios, {args.requests} requests at concurrency {args.concurrency}:")
+    results = asyncio.run(run_suite(api.app, scenarios, ids, args))
+
+    conn = sqlite3.connect(database)
+    rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("opportunities", "accounts", "users", "support_requests", "influencer_engagements")}
+    conn.close()
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "revision": git_revision(),
+            "size": args.size,
+            "rows": rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "response_cache": args.with_cache,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version
+        },
+        "results": results
+    }
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results",
+        f"{args.size.lower()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare(json.load(f), report, args.threshold, args.min_delta_ms):
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import os
+import math
+import sqlite3
+from typing import Dict
+
+# Table -> (primary key, {foreign key column: referenced table}, unique text columns).
+# Stages and pipeline sources are shared lookups and are never copied.
+SCALED_TABLES = {
+    "accounts": ("account_id", {}, ["account_name"]),
+    "users": ("user_id", {}, ["username"]),
+    "influencers": ("influencer_id", {"account_id": "accounts"}, []),
+    "opportunities": ("opportunity_id", {
+        "account_id": "accounts",
+        "owner_id": "users",
+        "influencer_id": "influencers",
+        "project_plan_id": "opportunity_project_plan"
+    }, []),
+    "opportunity_project_plan": ("project_plan_id", {"opportunity_id": "opportunities"}, []),
+    "influencer_engagements": ("engagement_id", {
+        "influencer_id": "influencers",
+        "opportunity_id": "opportunities",
+        "created_by": "users"
+    }, []),
+    "support_requests": ("request_id", {
+        "opportunity_id": "opportunities",
+        "requested_by": "users",
+        "assigned_to": "users"
+    }, []),
+    "opportunity_history": ("history_id", {"opportunity_id": "opportunities", "changed_by": "users"}, []),
+    "quarterly_targets": ("target_id", {"user_id": "users"}, []),
+    "deals_closed": ("deal_id", {"opportunity_id": "opportunities", "owner_id": "users", "account_id": "accounts"}, [])
+}
+
+SIZES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+def parse_size(size: str) -> int:
+    return SIZES.get(size.lower()) or int(size)
+
+def build_scaled_database(source: str, target: str, opportunities: int) -> Dict[str, int]:
+    """Copy the source database and tile it until it has about `opportunities` opportunities.
+
+    Every copy shifts primary and foreign keys by the table's largest key, so
+    each copy is a self-contained replica of the original graph and accounts,
+    users, engagements, history and support requests grow in proportion.
+    Returns the row count of every copied table.
+    """
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+    conn = sqlite3.connect(target)
+    base = conn.execute("SELECT COUNT(*) FROM opportunities").fetchone()[0]
+    copies = max(1, math.ceil(opportunities / base)) if base else 1
+    offsets = {
+        table: conn.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}").fetchone()[0]
+        for table, (key, _, _) in SCALED_TABLES.items()
+    }
+
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    for table, (key, foreign_keys, unique_columns) in SCALED_TABLES.items():
+        if copies == 1:
+            break
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        expressions = []
+        for column in columns:
+            if column == key:
+                expressions.append(f"{column} + n * {offsets[table]}")
+            elif column in foreign_keys:
+                expressions.append(f"{column} + n * {offsets[foreign_keys[column]]}")
+            elif column in unique_columns:
+                expressions.append(f"{column} || ' #' || n")
+            else:
+                expressions.append(column)
+        conn.execute(f"""
+            WITH RECURSIVE copies(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM copies WHERE n < ?)
+            INSERT INTO {table} ({', '.join(columns)})
+            SELECT {', '.join(expressions)} FROM {table}, copies WHERE {key} <= ?
+        """, (copies - 1, offsets[table]))
+        conn.commit()
+    conn.execute("ANALYZE")
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in SCALED_TABLES}
+    conn.close()
+    return counts
+
+def ensure_database(source: str, directory: str, size: str, rebuild: bool = False) -> str:
+    """Path of a cached scaled database, building it on first use"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"opportunities_{size.lower()}.db")
+    if rebuild or not os.path.exists(path):
+        temp_path = f"{path}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        build_scaled_database(source, temp_path, parse_size(size))
+        os.replace(temp_path, path)
+    return path
@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.datasets import ensure_database
+from table_rebuild import REBUILD_BATCH_SIZE, REBUILD_PAUSE_SECONDS, rebuild_table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "benchmarks", "data")
+TABLE = "opportunities"
+# The API's connections wait this long for the write lock before failing
+WRITER_TIMEOUT_SECONDS = 5.0
+
+def single_statement_rebuild(conn: sqlite3.Connection) -> dict:
+    """The rebuild migration 001 did: one transaction copying the whole table"""
+    definition = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (TABLE,)).fetchone()[0]
+    others = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL", (TABLE,)
+    ).fetchall()
+    columns = ", ".join(row[1] for row in conn.execute(f"PRAGMA table_info({TABLE})"))
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute(definition.replace(TABLE, f"{TABLE}_temp", 1))
+    conn.execute(f"INSERT INTO {TABLE}_temp ({columns}) SELECT {columns} FROM {TABLE}")
+    conn.execute(f"DROP TABLE {TABLE}")
+    conn.execute(f"ALTER TABLE {TABLE}_temp RENAME TO {TABLE}")
+    for (sql,) in others:
+        conn.execute(sql)
+    conn.execute("COMMIT")
+    lock_ms = (time.perf_counter() - started) * 1000
+    return {"longest_lock_ms": lock_ms, "cutover_ms": lock_ms}
+
+def run(path: str, method: str, batch_size: int, pause_seconds: float, interval: float) -> dict:
+    """Rebuild the table while a writer updates random opportunities every interval seconds"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    keys = [row[0] for row in conn.execute(f"SELECT opportunity_id FROM {TABLE}")]
+    stop = threading.Event()
+    latencies, failures = [], []
+
+    def writer():
+        writes = sqlite3.connect(path, timeout=WRITER_TIMEOUT_SECONDS)
+        rng = random.Random(42)
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                writes.execute(f"UPDATE {TABLE} SET next_step = ? WHERE opportunity_id = ?",
+                               (f"Call {rng.random():.4f}", rng.choice(keys)))
+                writes.commit()
+                latencies.append(time.perf_counter() - started)
+            except sqlite3.OperationalError as e:
+                writes.rollback()
+                failures.append(str(e))
+            time.sleep(interval)
+        writes.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    started = time.perf_counter()
+    if method == "online":
+        stats = rebuild_table(conn, TABLE, batch_size=batch_size, pause_seconds=pause_seconds)
+    else:
+        stats = single_statement_rebuild(conn)
+    seconds = time.perf_counter() - started
+    stop.set()
+    thread.join()
+    rows = conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+    conn.close()
+    latencies.sort()
+    return {
+        "seconds": seconds,
+        "rows": rows,
+        "longest_lock_ms": stats["longest_lock_ms"],
+        "cutover_ms": stats["cutover_ms"],
+        "writes": len(latencies),
+        "failed_writes": len(failures),
+        "write_p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+        "write_max_ms": latencies[-1] * 1000 if latencies else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild opportunities in one statement and online in batches while a writer updates it")
+    parser.add_argument("--db", help="Database to copy (default: sales_data.db scaled to --size)")
+    parser.add_argument("--size", default="100k", help="Opportunities when scaling sales_data.db: 1k, 100k, 1m or a number")
+    parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE, help="Rows copied per transaction by the online rebuild")
+    parser.add_argument("--pause", type=float, default=REBUILD_PAUSE_SECONDS, help="Seconds between the online rebuild's transactions")
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between the writer's updates")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/online_rebuild_<timestamp>.json)")
+    args = parser.parse_args()
+
+    source = args.db or ensure_database(os.path.join(ROOT, "sales_data.db"), DATA_DIR, args.size)
+    results = {}
+    for method in ("single_statement", "online"):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.db")
+            with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+                src.backup(dst)
+            results[method] = run(path, method, args.batch_size, args.pause, args.interval)
+
+    for method, result in results.items():
+        print(f"{method}: {result['rows']} rows in {result['seconds']:.1f}s, longest lock {result['longest_lock_ms']:.0f} ms, "
+              f"cutover {result['cutover_ms']:.0f} ms; writer {result['writes']} ok, {result['failed_writes']} failed, "
+              f"p99 {result['write_p99_ms'] or 0:.1f} ms, max {result['write_max_ms'] or 0:.1f} ms")
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"online_rebuild_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {"timestamp": datetime.now().isoformat(), "source": source, "table": TABLE,
+                     "batch_size": args.batch_size, "pause_seconds": args.pause, "writer_interval": args.interval,
+                     "writer_timeout_seconds": WRITER_TIMEOUT_SECONDS, "sqlite": sqlite3.sqlite_version},
+            "results": results
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
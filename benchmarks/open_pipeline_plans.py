@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.datasets import ensure_database
+from app.api.v1.sales_review import OPPORTUNITY_QUERY, OPEN_REQUESTS_QUERY
+from app.api.v1.users import USER_LIST_QUERY
+from app.api.v1.accounts import ACCOUNT_LIST_QUERY
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "benchmarks", "data")
+MIGRATION = os.path.join(ROOT, "migrations", "008_open_pipeline_indexes.sql")
+
+# Name -> (query before migration 008, query after, parameters before, after).
+# "owner_id" stands for the owner with the most open opportunities, so the
+# per-owner queries read the largest pipeline.
+QUERIES = {
+    "sales_review_open_opportunities": (OPPORTUNITY_QUERY, OPPORTUNITY_QUERY, [], []),
+    "sales_review_open_opportunities_owner": (
+        OPPORTUNITY_QUERY + " AND o.owner_id = ?",
+        OPPORTUNITY_QUERY + " AND o.owner_id = ?",
+        ["owner_id"],
+        ["owner_id"]
+    ),
+    "sales_review_open_support_requests": (
+        OPEN_REQUESTS_QUERY.replace("WHERE sr.is_open", "WHERE sr.status NOT IN ('Resolved', 'Completed', 'Closed')"),
+        OPEN_REQUESTS_QUERY,
+        [],
+        []
+    ),
+    "support_requests_open_page": (
+        "SELECT sr.* FROM support_requests sr WHERE sr.status NOT IN ('Resolved', 'Completed', 'Closed')"
+        " ORDER BY sr.created_date DESC LIMIT 20",
+        "SELECT sr.* FROM support_requests sr WHERE sr.is_open ORDER BY sr.created_date DESC LIMIT 20",
+        [],
+        []
+    ),
+    "user_open_opportunities_count": (
+        "SELECT COUNT(*) FROM opportunities o WHERE o.owner_id = ? AND o.is_closed = ?",
+        "SELECT COUNT(*) FROM opportunities o WHERE o.owner_id = ? AND o.is_closed = 0",
+        ["owner_id", 0],
+        ["owner_id"]
+    ),
+    "user_rollup_page": (
+        """
+        SELECT u.*,
+               COUNT(DISTINCT o.opportunity_id) as opportunity_count,
+               SUM(CASE WHEN o.is_closed = 0 THEN o.total_amount ELSE 0 END) as open_opportunity_value,
+               SUM(CASE WHEN o.is_closed = 1 AND o.is_won = 1 THEN o.total_amount ELSE 0 END) as won_opportunity_value
+        FROM users u
+        LEFT JOIN opportunities o ON u.user_id = o.owner_id
+        GROUP BY u.user_id, u.username, u.first_name, u.last_name, u.full_name, u.created_at
+        ORDER BY u.full_name
+        LIMIT 20 OFFSET 0
+        """,
+        USER_LIST_QUERY.format(opportunities="opportunities"),
+        [],
+        [20, 0]
+    ),
+    "account_rollup_page": (
+        """
+        SELECT a.account_id, a.account_name, a.created_at,
+               COUNT(DISTINCT o.opportunity_id) as opportunity_count,
+               SUM(CASE WHEN o.is_closed = 0 THEN o.total_amount ELSE 0 END) as open_opportunity_value,
+               SUM(CASE WHEN o.is_closed = 1 AND o.is_won = 1 THEN o.total_amount ELSE 0 END) as won_opportunity_value
+        FROM accounts a
+        LEFT JOIN opportunities o ON a.account_id = o.account_id
+        GROUP BY a.account_id, a.account_name, a.created_at
+        """,
+        ACCOUNT_LIST_QUERY.format(opportunities="opportunities"),
+        [],
+        [20, 0]
+    )
+}
+
+def resolve_params(conn: sqlite3.Connection, params: list) -> list:
+    owner_id = conn.execute(
+        "SELECT owner_id FROM opportunities WHERE is_closed = 0 GROUP BY owner_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()
+    return [owner_id[0] if p == "owner_id" and owner_id else p for p in params]
+
+def measure(conn: sqlite3.Connection, query: str, params: list, repeat: int) -> dict:
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(conn.execute(query, params).fetchall())
+        timings.append(time.perf_counter() - started)
+    return {"plan": plan, "rows": rows, "median_ms": statistics.median(timings) * 1000, "min_ms": min(timings) * 1000}
+
+def apply_migration(conn: sqlite3.Connection, path: str):
+    with open(path) as f:
+        for statement in f.read().split(';'):
+            if statement.strip():
+                conn.execute(statement)
+    conn.execute("ANALYZE")
+    conn.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description="Query plans and timings of open-pipeline queries before and after migration 008")
+    parser.add_argument("--db", help="Database to copy, e.g. synthetic_data.db (default: sales_data.db scaled to --size)")
+    parser.add_argument("--size", default="100k", help="Opportunities when scaling sales_data.db: 1k, 100k, 1m or a number")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/open_pipeline_<timestamp>.json)")
+    args = parser.parse_args()
+
+    source = args.db or ensure_database(os.path.join(ROOT, "sales_data.db"), DATA_DIR, args.size)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        conn = sqlite3.connect(path)
+        if "is_open" in [row[1] for row in conn.execute("PRAGMA table_xinfo(support_requests)")]:
+            print(f"{source} already has migration 008 applied, copy a database without it")
+            sys.exit(1)
+        conn.execute("ANALYZE")
+
+        results = {}
+        for name, (before, _, params, _) in QUERIES.items():
+            results[name] = {"before": measure(conn, before, resolve_params(conn, params), args.repeat)}
+        started = time.perf_counter()
+        apply_migration(conn, MIGRATION)
+        migration_seconds = time.perf_counter() - started
+        for name, (_, after, _, params) in QUERIES.items():
+            results[name]["after"] = measure(conn, after, resolve_params(conn, params), args.repeat)
+        rows = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("opportunities", "accounts", "users", "support_requests")}
+        conn.close()
+
+    print(f"Rows: {rows}, migration 008 applied in {migration_seconds:.1f}s, {args.repeat} runs per query")
+    for name, result in results.items():
+        before, after = result["before"], result["after"]
+        print(f"\n{name}: {before['median_ms']:.1f} ms -> {after['median_ms']:.1f} ms "
+              f"({before['median_ms'] / max(after['median_ms'], 1e-3):.1f}x), rows {before['rows']} -> {after['rows']}")
+        for label, plan in (("before", before["plan"]), ("after", after["plan"])):
+            for step in plan:
+                print(f"  {label:<6} {step}")
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"open_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {"timestamp": datetime.now().isoformat(), "source": source, "rows": rows,
+                     "repeat": args.repeat, "sqlite": sqlite3.sqlite_version},
+            "results": results
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
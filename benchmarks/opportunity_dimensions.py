@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.datasets import ensure_database
+from apply_migrations import split_statements
+from app.api.v1.opportunities import OPPORTUNITY_LIST_QUERY, LIVE_SOURCES, opportunity_filter_clause
+from app.api.v1.dimensions import DimensionMap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, "benchmarks", "data")
+MIGRATION = os.path.join(ROOT, "migrations", "011_opportunity_dimensions.sql")
+
+LIST_PAGE_QUERY = (
+    f"{OPPORTUNITY_LIST_QUERY.format(**LIVE_SOURCES)} AND o.opportunity_id IN ("
+    "SELECT opportunity_id FROM opportunities ORDER BY created_date DESC, opportunity_id DESC LIMIT 100)"
+    " GROUP BY o.opportunity_id ORDER BY o.created_date DESC, o.opportunity_id DESC"
+)
+TYPE_FILTER, TYPE_PARAMS = opportunity_filter_clause({"type": "type", "leadSource": "lead_source"})
+
+# Name -> (query before migration 011, query after, parameters). "type" and
+# "lead_source" stand for the most common values, and results after the
+# migration are decorated with the text the way the API does
+QUERIES = {
+    "list_page_100": (LIST_PAGE_QUERY, LIST_PAGE_QUERY, []),
+    "count_type_lead_source": (
+        "SELECT COUNT(*) FROM opportunities o WHERE 1=1 AND o.type = ? AND o.lead_source = ?",
+        f"SELECT COUNT(*) FROM opportunities o WHERE 1=1{TYPE_FILTER}",
+        TYPE_PARAMS
+    ),
+    "pipeline_by_stage": (
+        "SELECT stage_name, COUNT(*), SUM(total_amount) FROM opportunities WHERE is_closed = 0 GROUP BY stage_name",
+        "SELECT stage_name_id, COUNT(*), SUM(total_amount) FROM opportunities WHERE is_closed = 0 GROUP BY stage_name_id",
+        []
+    ),
+    "full_scan": ("SELECT * FROM opportunities", "SELECT * FROM opportunities", [])
+}
+
+def resolve_params(conn: sqlite3.Connection, params: list) -> list:
+    values = {
+        column: conn.execute(f"""
+            SELECT {column} FROM opportunities GROUP BY {column} ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()[0]
+        for column in ("type", "lead_source")
+    }
+    return [values.get(p, p) for p in params]
+
+def measure(conn: sqlite3.Connection, query: str, params: list, repeat: int, dimensions: DimensionMap = None) -> dict:
+    timings = []
+    rows = 0
+    # The first run warms the page cache and is not timed
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        cursor = conn.execute(query, params)
+        rows = 0
+        # Batches keep a full scan's records from all being held at once
+        while batch := cursor.fetchmany(1000):
+            records = [dict(row) for row in batch]
+            if dimensions:
+                dimensions.decorate(conn, records)
+            rows += len(records)
+        timings.append(time.perf_counter() - started)
+    timings = timings[1:]
+    return {"rows": rows, "median_ms": statistics.median(timings) * 1000, "min_ms": min(timings) * 1000}
+
+def table_bytes(conn: sqlite3.Connection, table: str) -> int:
+    """Bytes of the table's b-tree pages, without its indexes"""
+    return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (table,)).fetchone()[0]
+
+def vacuum(conn: sqlite3.Connection, path: str) -> dict:
+    started = time.perf_counter()
+    conn.execute("VACUUM")
+    return {
+        "vacuum_seconds": time.perf_counter() - started,
+        "file_bytes": os.path.getsize(path),
+        "opportunities_bytes": table_bytes(conn, "opportunities")
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Database size and opportunity query timings before and after migration 011")
+    parser.add_argument("--db", help="Database to copy, with migration 010 but not 011 applied (default: sales_data.db scaled to --size)")
+    parser.add_argument("--size", default="100k", help="Opportunities when scaling sales_data.db: 1k, 100k, 1m or a number")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query")
+    parser.add_argument("--output", help="Results file (default benchmarks/results/opportunity_dimensions_<timestamp>.json)")
+    args = parser.parse_args()
+
+    source = args.db or ensure_database(os.path.join(ROOT, "sales_data.db"), DATA_DIR, args.size)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        if "stage_name_id" in [row[1] for row in conn.execute("PRAGMA table_info(opportunities)")]:
+            print(f"{source} already has migration 011 applied, copy a database without it")
+            sys.exit(1)
+        conn.execute("ANALYZE")
+        sizes = {"before": vacuum(conn, path)}
+
+        params = {name: resolve_params(conn, query[2]) for name, query in QUERIES.items()}
+        results = {}
+        for name, (before, _, _) in QUERIES.items():
+            results[name] = {"before": measure(conn, before, params[name], args.repeat)}
+
+        started = time.perf_counter()
+        with open(MIGRATION) as f:
+            for statement in split_statements(f.read()):
+                if statement.strip():
+                    conn.execute(statement)
+        conn.commit()
+        migration_seconds = time.perf_counter() - started
+        conn.execute("ANALYZE")
+        sizes["after"] = vacuum(conn, path)
+
+        dimensions = DimensionMap()
+        for name, (_, after, _) in QUERIES.items():
+            results[name]["after"] = measure(conn, after, params[name], args.repeat, dimensions)
+        rows = conn.execute("SELECT COUNT(*) FROM opportunities").fetchone()[0]
+        conn.close()
+
+    print(f"{rows} opportunities, migration 011 applied in {migration_seconds:.1f}s, {args.repeat} runs per query")
+    for label in ("before", "after"):
+        size = sizes[label]
+        print(f"  {label:<6} file {size['file_bytes'] / 2**20:.1f} MiB, opportunities table "
+              f"{size['opportunities_bytes'] / 2**20:.1f} MiB (VACUUM {size['vacuum_seconds']:.1f}s)")
+    for name, result in results.items():
+        before, after = result["before"], result["after"]
+        print(f"{name}: {before['median_ms']:.1f} ms -> {after['median_ms']:.1f} ms "
+              f"({before['median_ms'] / max(after['median_ms'], 1e-3):.1f}x), rows {before['rows']} -> {after['rows']}")
+
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"opportunity_dimensions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "meta": {"timestamp": datetime.now().isoformat(), "source": source, "rows": rows,
+                     "repeat": args.repeat, "migration_seconds": migration_seconds, "sqlite": sqlite3.sqlite_version},
+            "sizes": sizes,
+            "results": results
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+if __name__ == "__main__":
+    main()
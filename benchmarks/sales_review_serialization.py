@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from fastapi.encoders import jsonable_encoder
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.api.v1.sales_review import OPPORTUNITY_QUERY, OPEN_REQUESTS_QUERY, CLOSED_DEALS_QUERY
+from app.api.v1.serialization import fetch_records, dumps, orjson
+
+QUERIES = {
+    "current_opportunities": OPPORTUNITY_QUERY,
+    "open_support_requests": OPEN_REQUESTS_QUERY,
+    "deals_closed_this_week": CLOSED_DEALS_QUERY
+}
+
+def build_database(source: str, target: str, scale: int):
+    """Copy the source database and repeat its opportunities and support requests `scale` times"""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+    conn = sqlite3.connect(target)
+    for table, key in [("opportunities", "opportunity_id"), ("support_requests", "request_id")]:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})") if row[1] != key]
+        column_list = ", ".join(columns)
+        max_id = conn.execute(f"SELECT MAX({key}) FROM {table}").fetchone()[0] or 0
+        conn.execute(f"""
+            WITH RECURSIVE copies(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM copies WHERE n < ?)
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list} FROM {table}, copies WHERE {key} <= ?
+        """, (scale - 1, max_id))
+    conn.commit()
+    conn.close()
+
+def legacy_payload(conn: sqlite3.Connection) -> bytes:
+    """sqlite3.Row -> dict -> jsonable_encoder -> json.dumps, as FastAPI does by default"""
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    content = {}
+    for name, query in QUERIES.items():
+        cursor.execute(query)
+        content[name] = [dict(row) for row in cursor.fetchall()]
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+def fast_payload(conn: sqlite3.Connection) -> bytes:
+    """Tuple rows zipped with column names, rendered by FastJSONResponse's serializer"""
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    content = {}
+    for name, query in QUERIES.items():
+        cursor.execute(query)
+        content[name] = fetch_records(cursor)
+    return dumps(content)
+
+def measure(func, conn: sqlite3.Connection, repeat: int) -> tuple:
+    timings = []
+    payload = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        payload = func(conn)
+        timings.append(time.perf_counter() - started)
+    return timings, payload
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sales review serialization paths")
+    parser.add_argument("--db", default="sales_data.db", help="Source database")
+    parser.add_argument("--scale", type=int, default=1000, help="Copies of each opportunity and support request")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        build_database(args.db, path, args.scale)
+        conn = sqlite3.connect(path)
+        rows = sum(len(conn.execute(query).fetchall()) for query in QUERIES.values())
+
+        legacy_timings, legacy = measure(legacy_payload, conn, args.repeat)
+        fast_timings, fast = measure(fast_payload, conn, args.repeat)
+        conn.close()
+
+    if json.loads(legacy) != json.loads(fast):
+        print("Payloads differ between serialization paths")
+        sys.exit(1)
+
+    print(f"Serializer: {'orjson' if orjson else 'json (orjson not installed)'}")
+    print(f"Rows: {rows}, payload: {len(fast) / 1024 / 1024:.1f} MiB, runs: {args.repeat}")
+    legacy_median = statistics.median(legacy_timings)
+    fast_median = statistics.median(fast_timings)
+    print(f"{'dict(row) + jsonable_encoder':<32} median {legacy_median * 1000:8.1f} ms  min {min(legacy_timings) * 1000:8.1f} ms")
+    print(f"{'fetch_records + FastJSONResponse':<32} median {fast_median * 1000:8.1f} ms  min {min(fast_timings) * 1000:8.1f} ms")
+    print(f"Speedup: {legacy_median / fast_median:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import os
+import io
+import re
+import gzip
+import shutil
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# --- Configuration ---
+EXPORTS_DIR = 'exports'
+# One of: none, gzip, zstd
+EXPORT_CODEC = os.environ.get('EXPORT_CODEC', 'gzip')
+EXPORT_LEVEL = int(os.environ.get('EXPORT_LEVEL', '6'))
+# Timestamped exports older than this are deleted by prune_exports()
+EXPORT_RETENTION_DAYS = int(os.environ.get('EXPORT_RETENTION_DAYS', '30'))
+# Uncompressed exports older than this are compressed in place by prune_exports()
+EXPORT_ROLLUP_DAYS = int(os.environ.get('EXPORT_ROLLUP_DAYS', '1'))
+BUFFER_SIZE = 1024 * 1024
+
+EXTENSIONS = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+
+TIMESTAMP_PATTERN = re.compile(r'_(\d{8}_\d{6})\.')
+
+def resolve_codec(codec: Optional[str]) -> str:
+    """Validate the requested codec, falling back to gzip when zstandard is missing"""
+    codec = (codec or EXPORT_CODEC).lower()
+    if codec not in EXTENSIONS:
+        raise ValueError(f"Unknown export codec: {codec}")
+    if codec == 'zstd' and zstandard is None:
+        logging.warning("zstandard is not installed, using gzip for exports")
+        return 'gzip'
+    return codec
+
+class ExportWriter:
+    """Text stream for one export file.
+
+    Data is compressed while it is written and lands in a temporary file that
+    is renamed into place only when the ``with`` block finishes without error,
+    so readers never see a partial export.
+    """
+
+    def __init__(self, prefix: str, extension: str = 'csv', codec: Optional[str] = None,
+                 level: Optional[int] = None, directory: str = EXPORTS_DIR):
+        self.codec = resolve_codec(codec)
+        self.level = EXPORT_LEVEL if level is None else level
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.filename = os.path.join(directory, f"{prefix}_{timestamp}.{extension}{EXTENSIONS[self.codec]}")
+        self.temp_filename = f"{self.filename}.tmp"
+        self._raw = None
+        self._stream = None
+
+    def __enter__(self) -> io.TextIOWrapper:
+        os.makedirs(os.path.dirname(self.filename) or '.', exist_ok=True)
+        self._raw = open(self.temp_filename, 'wb', buffering=BUFFER_SIZE)
+
+        if self.codec == 'gzip':
+            compressed = gzip.GzipFile(fileobj=self._raw, mode='wb', compresslevel=self.level)
+        elif self.codec == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=self.level)
+            compressed = compressor.stream_writer(self._raw, closefd=False)
+        else:
+            compressed = None
+
+        # Batch small csv writes into large chunks before they reach the compressor
+        binary = io.BufferedWriter(compressed, BUFFER_SIZE) if compressed else self._raw
+        self._stream = io.TextIOWrapper(binary, encoding='utf-8', newline='')
+        return self._stream
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self.codec == 'none':
+                self._stream.flush()
+                self._stream.detach()
+            else:
+                # Flushes the buffers and writes the compressed stream trailer
+                self._stream.close()
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+        finally:
+            self._raw.close()
+
+        if exc_type is None:
+            os.replace(self.temp_filename, self.filename)
+        elif os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+        return False
+
+def open_export(prefix: str, extension: str = 'csv', codec: Optional[str] = None,
+                level: Optional[int] = None) -> ExportWriter:
+    """Create a timestamped export file under exports/"""
+    return ExportWriter(prefix, extension=extension, codec=codec, level=level)
+
+def export_timestamp(path: str) -> datetime:
+    """Timestamp embedded in an export filename, or its mtime"""
+    match = TIMESTAMP_PATTERN.search(os.path.basename(path))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+    return datetime.fromtimestamp(os.path.getmtime(path))
+
+def compress_existing(path: str, codec: Optional[str] = None, level: Optional[int] = None) -> str:
+    """Compress an already written export and remove the original"""
+    codec = resolve_codec(codec)
+    if codec == 'none':
+        codec = 'gzip'
+    level = EXPORT_LEVEL if level is None else level
+    target = f"{path}{EXTENSIONS[codec]}"
+    temp_target = f"{target}.tmp"
+
+    with open(path, 'rb') as source, open(temp_target, 'wb', buffering=BUFFER_SIZE) as raw:
+        if codec == 'gzip':
+            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level) as compressed:
+                shutil.copyfileobj(source, compressed, BUFFER_SIZE)
+        else:
+            compressor = zstandard.ZstdCompressor(level=level)
+            compressor.copy_stream(source, raw, read_size=BUFFER_SIZE, write_size=BUFFER_SIZE)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    os.replace(temp_target, target)
+    os.remove(path)
+    return target
+
+def prune_exports(retention_days: int = EXPORT_RETENTION_DAYS, rollup_days: int = EXPORT_ROLLUP_DAYS,
+                  directory: str = EXPORTS_DIR) -> dict:
+    """Apply the retention policy to the exports directory.
+
+    Exports older than retention_days are deleted, uncompressed CSV exports
+    older than rollup_days are compressed, and temp files left behind by
+    interrupted exports are removed.
+    """
+    summary = {'deleted': 0, 'compressed': 0, 'bytes_freed': 0}
+    if not os.path.isdir(directory):
+        return summary
+
+    now = datetime.now()
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+
+        age = now - export_timestamp(path)
+        size = os.path.getsize(path)
+
+        if name.endswith('.tmp'):
+            if age > timedelta(hours=1):
+                os.remove(path)
+                summary['deleted'] += 1
+                summary['bytes_freed'] += size
+        elif age > timedelta(days=retention_days):
+            os.remove(path)
+            summary['deleted'] += 1
+            summary['bytes_freed'] += size
+        elif name.endswith('.csv') and age > timedelta(days=rollup_days):
+            target = compress_existing(path)
+            summary['compressed'] += 1
+            summary['bytes_freed'] += size - os.path.getsize(target)
+
+    logging.info(
+        f"Pruned exports: {summary['deleted']} deleted, {summary['compressed']} compressed, "
+        f"{summary['bytes_freed']} bytes freed"
+    )
+    return summary
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler()
+        ]
+    )
+
+    prune_exports()
@@ -1,7 +1,10 @@
 import requests
 import csv
-from datetime import datetime
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from export_scripts.export_writer import open_export
 
 def generate_accounts_csv():
     if not os.path.exists('exports'):
@@ -25,12 +28,12 @@ def generate_accounts_csv():
                 
             page += 1
         
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"exports/accounts_{timestamp}.csv"
+        # Compressed export, renamed into place once fully written
+        output = open_export("accounts")
+        filename = output.filename
         
         # Write to CSV file
-        with open(filename, 'w', newline='') as csvfile:
+        with output as csvfile:
             writer = csv.writer(csvfile)
             
             # Write headers
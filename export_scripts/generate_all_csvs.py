@@ -33,6 +33,7 @@ def run_all_exports():
         from export_scripts.generate_sales_review_csv import generate_sales_review_csv
         from export_scripts.generate_support_requests_csv import generate_support_requests_csv
         from export_scripts.generate_calibration_csv import generate_calibration_csv
+        from export_scripts.export_writer import prune_exports
         
         # Run each export
         logging.info("Starting all exports...")
@@ -54,6 +55,9 @@ def run_all_exports():
         
         logging.info("All exports completed successfully!")
         
+        logging.info("Applying export retention policy...")
+        prune_exports()
+        
     except Exception as e:
         logging.error(f"Error during exports: {str(e)}")
 
@@ -1,8 +1,11 @@
 import requests
 import csv
-from datetime import datetime
 import os
 import logging
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from export_scripts.export_writer import open_export
 
 def generate_calibration_csv():
     if not os.path.exists('exports'):
@@ -20,10 +23,11 @@ def generate_calibration_csv():
             
         calibration_data = response.json().get('data', [])
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"exports/calibration_{timestamp}.csv"
+        # Compressed export, renamed into place once fully written
+        output = open_export("calibration")
+        filename = output.filename
         
-        with open(filename, 'w', newline='') as csvfile:
+        with output as csvfile:
             writer = csv.writer(csvfile)
             headers = [
                 'Sales Rep',
@@ -2,10 +2,12 @@ import os
 import sys
 import requests
 import csv
-from datetime import datetime
 import logging
 from typing import Optional
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from export_scripts.export_writer import open_export
+
 def ensure_exports_directory():
     """Ensure the exports directory exists"""
     if not os.path.exists('exports'):
@@ -32,12 +34,12 @@ def generate_sales_review_csv() -> Optional[str]:
             logging.warning("No open opportunities found")
             return None
         
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"exports/sales_review_{timestamp}.csv"
+        # Compressed export, renamed into place once fully written
+        output = open_export("sales_review")
+        filename = output.filename
         
         # Write to CSV
-        with open(filename, 'w', newline='') as csvfile:
+        with output as csvfile:
             writer = csv.writer(csvfile)
             
             # Write headers
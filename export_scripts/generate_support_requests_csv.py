@@ -1,7 +1,10 @@
 import requests
 import csv
-from datetime import datetime
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from export_scripts.export_writer import open_export
 
 def generate_support_requests_csv():
     if not os.path.exists('exports'):
@@ -15,10 +18,11 @@ def generate_support_requests_csv():
         
         requests_data = response.json()
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"exports/support_requests_{timestamp}.csv"
+        # Compressed export, renamed into place once fully written
+        output = open_export("support_requests")
+        filename = output.filename
         
-        with open(filename, 'w', newline='') as csvfile:
+        with output as csvfile:
             writer = csv.writer(csvfile)
             headers = [
                 'Request ID',
@@ -2,101 +2,170 @@ import os
 import sys
 import csv
 import requests
-from datetime import datetime
 import logging
-from typing import Optional
+from typing import Optional, List
 
-def ensure_exports_directory():
-    """Ensure the exports directory exists"""
-    if not os.path.exists('exports'):
-        os.makedirs('exports')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from export_scripts.export_writer import open_export
 
-def get_account(account_id: int) -> Optional[str]:
-    """Get account details and its opportunities"""
-    try:
-        ensure_exports_directory()
-        
-        # Base URL for the API
-        base_url = "http://localhost:8000/api"
-        
-        # Get account details (which includes opportunities)
-        account_response = requests.get(f"{base_url}/accounts/{account_id}")
-        if account_response.status_code != 200:
-            logging.error(f"Account {account_id} not found")
-            return None
-            
-        account = account_response.json()
-        opportunities = account.get('opportunities', [])
-        
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"exports/account_{account_id}_{timestamp}.csv"
-        
-        # Write to CSV
-        with open(filename, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Write account details
-            writer.writerow(['Account Details'])
-            writer.writerow([
-                'Account ID',
-                'Account Name',
-                'Created At'
-            ])
-            
-            writer.writerow([
-                account.get('account_id', ''),
-                account.get('account_name', ''),
-                account.get('created_at', '')
-            ])
-            
-            # Write opportunities
-            writer.writerow([])  # Empty row for separation
-            writer.writerow(['Opportunities'])
+# Accounts requested per round trip to the details endpoint
+BATCH_SIZE = 100
+
+def write_account_csv(account: dict) -> str:
+    """Write one account with its opportunities, influencers and support requests"""
+    account_id = account.get('account_id')
+    opportunities = account.get('opportunities', [])
+
+    # Compressed export, renamed into place once fully written
+    output = open_export(f"account_{account_id}")
+
+    with output as csvfile:
+        writer = csv.writer(csvfile)
+
+        # Write account details
+        writer.writerow(['Account Details'])
+        writer.writerow([
+            'Account ID',
+            'Account Name',
+            'Created At'
+        ])
+
+        writer.writerow([
+            account.get('account_id', ''),
+            account.get('account_name', ''),
+            account.get('created_at', '')
+        ])
+
+        # Write opportunities
+        writer.writerow([])  # Empty row for separation
+        writer.writerow(['Opportunities'])
+        writer.writerow([
+            'Opportunity ID',
+            'Opportunity Name',
+            'Owner',
+            'Stage',
+            'Source',
+            'Total Amount',
+            'Annual Contract Value',
+            'Contract Duration',
+            'Probability %',
+            'Close Date',
+            'Fiscal Year',
+            'Fiscal Quarter',
+            'Blockers',
+            'Support Needed'
+        ])
+
+        for opp in opportunities:
             writer.writerow([
-                'Opportunity ID',
-                'Opportunity Name',
-                'Owner',
-                'Stage',
-                'Source',
-                'Total Amount',
-                'Annual Contract Value',
-                'Contract Duration',
-                'Probability %',
-                'Close Date',
-                'Fiscal Year',
-                'Fiscal Quarter',
-                'Blockers',
-                'Support Needed'
+                opp.get('opportunity_id', ''),
+                opp.get('opportunity_name', ''),
+                opp.get('opportunity_owner', ''),
+                opp.get('stage_name', ''),
+                opp.get('source_name', ''),
+                opp.get('total_amount', ''),
+                opp.get('annual_contract_value', ''),
+                opp.get('contract_duration_months', ''),
+                opp.get('probability_percentage', ''),
+                opp.get('close_date', ''),
+                opp.get('fiscal_year', ''),
+                opp.get('fiscal_quarter', ''),
+                opp.get('blockers', ''),
+                opp.get('support_needed', '')
             ])
-            
-            for opp in opportunities:
+
+        # Write influencers engaged on each opportunity
+        writer.writerow([])
+        writer.writerow(['Influencer Engagements'])
+        writer.writerow([
+            'Opportunity ID',
+            'Influencer ID',
+            'Name',
+            'Title',
+            'Role',
+            'Influence Level',
+            'Engagement Date',
+            'Engagement Type',
+            'Outcome'
+        ])
+
+        for opp in opportunities:
+            for influencer in opp.get('influencers', []):
+                writer.writerow([
+                    opp.get('opportunity_id', ''),
+                    influencer.get('influencer_id', ''),
+                    influencer.get('name', ''),
+                    influencer.get('title', ''),
+                    influencer.get('role', ''),
+                    influencer.get('influence_level', ''),
+                    influencer.get('engagement_date', ''),
+                    influencer.get('engagement_type', ''),
+                    influencer.get('outcome', '')
+                ])
+
+        # Write support requests
+        writer.writerow([])
+        writer.writerow(['Support Requests'])
+        writer.writerow([
+            'Opportunity ID',
+            'Request ID',
+            'Request Type',
+            'Status',
+            'Priority',
+            'Requested By',
+            'Assigned To',
+            'Due Date'
+        ])
+
+        for opp in opportunities:
+            for request in opp.get('support_requests', []):
                 writer.writerow([
                     opp.get('opportunity_id', ''),
-                    opp.get('opportunity_name', ''),
-                    opp.get('opportunity_owner', ''),
-                    opp.get('stage_name', ''),
-                    opp.get('source_name', ''),
-                    opp.get('total_amount', ''),
-                    opp.get('annual_contract_value', ''),
-                    opp.get('contract_duration', ''),
-                    opp.get('probability_percentage', ''),
-                    opp.get('close_date', ''),
-                    opp.get('fiscal_year', ''),
-                    opp.get('fiscal_quarter', ''),
-                    opp.get('blockers', ''),
-                    opp.get('support_needed', '')
+                    request.get('request_id', ''),
+                    request.get('request_type', ''),
+                    request.get('status', ''),
+                    request.get('priority', ''),
+                    request.get('requested_by_name', ''),
+                    request.get('assigned_to_name', ''),
+                    request.get('due_date', '')
                 ])
-        
-        logging.info(f"Account details exported to: {filename}")
-        return filename
-        
-    except requests.exceptions.RequestException as e:
-        logging.error(f"API request error: {str(e)}")
-        return None
-    except Exception as e:
-        logging.error(f"Error exporting account details: {str(e)}")
-        return None
+
+    return output.filename
+
+def get_accounts(account_ids: List[int]) -> List[str]:
+    """Export details for many accounts, fetching them in batches"""
+    base_url = "http://localhost:8000/api"
+    filenames = []
+
+    for start in range(0, len(account_ids), BATCH_SIZE):
+        batch = account_ids[start:start + BATCH_SIZE]
+        try:
+            # One request returns the accounts with all their related records
+            response = requests.get(f"{base_url}/details/accounts", params={'ids': batch})
+            if response.status_code != 200:
+                logging.error(f"Failed to get account details: {response.status_code}")
+                continue
+
+            details = response.json()
+            for account_id in details.get('missingIds', []):
+                logging.error(f"Account {account_id} not found")
+
+            for account in details.get('data', []):
+                filename = write_account_csv(account)
+                filenames.append(filename)
+                logging.info(f"Account details exported to: {filename}")
+
+        except requests.exceptions.RequestException as e:
+            logging.error(f"API request error: {str(e)}")
+        except Exception as e:
+            logging.error(f"Error exporting account details: {str(e)}")
+
+    return filenames
+
+def get_account(account_id: int) -> Optional[str]:
+    """Get account details and its opportunities"""
+    filenames = get_accounts([account_id])
+    return filenames[0] if filenames else None
 
 if __name__ == "__main__":
     # Set up logging
@@ -107,18 +176,18 @@ if __name__ == "__main__":
             logging.StreamHandler()
         ]
     )
-    
-    if len(sys.argv) != 2:
-        print("Usage: python get_account.py <account_id>")
+
+    if len(sys.argv) < 2:
+        print("Usage: python get_account.py <account_id> [<account_id> ...]")
         sys.exit(1)
-    
+
     try:
-        account_id = int(sys.argv[1])
-        result = get_account(account_id)
-        if result:
-            print(f"Successfully generated: {result}")
+        account_ids = [int(arg) for arg in sys.argv[1:]]
+        results = get_accounts(account_ids)
+        if results:
+            print(f"Successfully generated {len(results)} files")
         else:
-            print(f"Failed to generate account details for account {account_id}")
+            print(f"Failed to generate account details for accounts {account_ids}")
     except ValueError:
         print("Error: Account ID must be an integer")
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
@@ -1,14 +1,91 @@
 import requests
 import csv
-from datetime import datetime
 import os
 import logging
-from typing import Optional
+from typing import Optional, List
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from export_scripts.export_writer import open_export
 
 def ensure_exports_directory():
     if not os.path.exists('exports'):
         os.makedirs('exports')
 
+def write_sales_review_csv(prefix: str, opportunities: list) -> str:
+    """Write sales review opportunities to a compressed CSV export"""
+    # Compressed export, renamed into place once fully written
+    output = open_export(prefix)
+
+    with output as csvfile:
+        writer = csv.writer(csvfile)
+        headers = [
+            'Opportunity ID',
+            'Opportunity Name',
+            'Account Name',
+            'Owner Name',
+            'Stage Name',
+            'Next Step',
+            'Close Date',
+            'Total Amount',
+            'Currency',
+            'Probability %',
+            'Created Date',
+            'Fiscal Period',
+            'Fiscal Year',
+            'Fiscal Quarter',
+            'Lead Source',
+            'Type',
+            'Is Closed',
+            'Is Won',
+            'Annual Contract Value',
+            'Contract Duration (Months)',
+            'Source Name',
+            'Blockers',
+            'Support Needed',
+            'Project Activity',
+            'Project Deliverables',
+            'Project Priority',
+            'Project Due Date',
+            'Project Status'
+        ]
+        writer.writerow(headers)
+
+        # Write opportunities
+        for opportunity in opportunities:
+            writer.writerow([
+                opportunity.get('opportunity_id', ''),
+                opportunity.get('opportunity_name', ''),
+                opportunity.get('account_name', ''),
+                opportunity.get('owner_name', ''),
+                opportunity.get('current_stage_name', ''),
+                opportunity.get('next_step', ''),
+                opportunity.get('close_date', ''),
+                opportunity.get('total_amount', ''),
+                opportunity.get('currency', ''),
+                opportunity.get('probability_percentage', ''),
+                opportunity.get('created_date', ''),
+                opportunity.get('fiscal_period', ''),
+                opportunity.get('fiscal_year', ''),
+                opportunity.get('fiscal_quarter', ''),
+                opportunity.get('lead_source', ''),
+                opportunity.get('type', ''),
+                'Yes' if opportunity.get('is_closed') else 'No',
+                'Yes' if opportunity.get('is_won') else 'No',
+                opportunity.get('annual_contract_value', ''),
+                opportunity.get('contract_duration_months', ''),
+                opportunity.get('source_name', ''),
+                opportunity.get('blockers', ''),
+                opportunity.get('support_needed', ''),
+                opportunity.get('project_activity', ''),
+                opportunity.get('project_deliverables', ''),
+                opportunity.get('project_priority', ''),
+                opportunity.get('project_due_date', ''),
+                opportunity.get('project_status', '')
+            ])
+
+    return output.filename
+
 def get_sales_review(user_id: Optional[int] = None, fiscal_year: Optional[int] = None, fiscal_quarter: Optional[str] = None) -> Optional[str]:
     """Get sales review data and export to CSV"""
     try:
@@ -44,76 +121,7 @@ def get_sales_review(user_id: Optional[int] = None, fiscal_year: Optional[int] =
             logging.warning("No opportunities found in sales review data")
             return None
         
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"exports/sales_review_{timestamp}.csv"
-        
-        with open(filename, 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            headers = [
-                'Opportunity ID',
-                'Opportunity Name',
-                'Account Name',
-                'Owner Name',
-                'Stage Name',
-                'Next Step',
-                'Close Date',
-                'Total Amount',
-                'Currency',
-                'Probability %',
-                'Created Date',
-                'Fiscal Period',
-                'Fiscal Year',
-                'Fiscal Quarter',
-                'Lead Source',
-                'Type',
-                'Is Closed',
-                'Is Won',
-                'Annual Contract Value',
-                'Contract Duration (Months)',
-                'Source Name',
-                'Blockers',
-                'Support Needed',
-                'Project Activity',
-                'Project Deliverables',
-                'Project Priority',
-                'Project Due Date',
-                'Project Status'
-            ]
-            writer.writerow(headers)
-            
-            # Write opportunities
-            for opportunity in opportunities:
-                writer.writerow([
-                    opportunity.get('opportunity_id', ''),
-                    opportunity.get('opportunity_name', ''),
-                    opportunity.get('account_name', ''),
-                    opportunity.get('owner_name', ''),
-                    opportunity.get('current_stage_name', ''),
-                    opportunity.get('next_step', ''),
-                    opportunity.get('close_date', ''),
-                    opportunity.get('total_amount', ''),
-                    opportunity.get('currency', ''),
-                    opportunity.get('probability_percentage', ''),
-                    opportunity.get('created_date', ''),
-                    opportunity.get('fiscal_period', ''),
-                    opportunity.get('fiscal_year', ''),
-                    opportunity.get('fiscal_quarter', ''),
-                    opportunity.get('lead_source', ''),
-                    opportunity.get('type', ''),
-                    'Yes' if opportunity.get('is_closed') else 'No',
-                    'Yes' if opportunity.get('is_won') else 'No',
-                    opportunity.get('annual_contract_value', ''),
-                    opportunity.get('contract_duration_months', ''),
-                    opportunity.get('source_name', ''),
-                    opportunity.get('blockers', ''),
-                    opportunity.get('support_needed', ''),
-                    opportunity.get('project_activity', ''),
-                    opportunity.get('project_deliverables', ''),
-                    opportunity.get('project_priority', ''),
-                    opportunity.get('project_due_date', ''),
-                    opportunity.get('project_status', '')
-                ])
+        filename = write_sales_review_csv("sales_review", opportunities)
         
         logging.info(f"Sales review exported to: {filename}")
         return filename
@@ -125,6 +133,44 @@ def get_sales_review(user_id: Optional[int] = None, fiscal_year: Optional[int] =
         logging.error(f"Error exporting sales review: {str(e)}")
         return None
 
+def get_sales_reviews(user_ids: List[int], fiscal_year: Optional[int] = None, fiscal_quarter: Optional[str] = None) -> List[str]:
+    """Export one sales review CSV per user from a single sales review request"""
+    filenames = []
+    try:
+        base_url = "http://localhost:8000/api"
+        
+        params = {}
+        if fiscal_year:
+            params['fiscal_year'] = fiscal_year
+        if fiscal_quarter:
+            params['fiscal_quarter'] = fiscal_quarter
+        
+        # Fetch the unfiltered review once and split it by owner locally
+        response = requests.get(f"{base_url}/sales-review", params=params)
+        if response.status_code != 200:
+            logging.error(f"Failed to get sales review data: {response.status_code}")
+            return filenames
+        
+        by_owner = {}
+        for opportunity in response.json().get('current_opportunities', []):
+            by_owner.setdefault(opportunity.get('owner_id'), []).append(opportunity)
+        
+        for user_id in user_ids:
+            opportunities = by_owner.get(user_id, [])
+            if not opportunities:
+                logging.warning(f"No opportunities found in sales review data for user {user_id}")
+                continue
+            filename = write_sales_review_csv(f"sales_review_user_{user_id}", opportunities)
+            filenames.append(filename)
+            logging.info(f"Sales review for user {user_id} exported to: {filename}")
+        
+    except requests.exceptions.RequestException as e:
+        logging.error(f"API request error: {str(e)}")
+    except Exception as e:
+        logging.error(f"Error exporting sales review: {str(e)}")
+    
+    return filenames
+
 if __name__ == "__main__":
     # Set up logging
     logging.basicConfig(
@@ -140,14 +186,22 @@ if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Export sales review data to CSV')
-    parser.add_argument('--user-id', type=int, help='User ID to filter by')
+    parser.add_argument('--user-id', type=int, nargs='+', help='User ID(s) to filter by; several IDs write one file per user')
     parser.add_argument('--fiscal-year', type=int, help='Fiscal year to filter by')
     parser.add_argument('--fiscal-quarter', type=str, help='Fiscal quarter to filter by (e.g., Q1)')
     
     args = parser.parse_args()
     
-    result = get_sales_review(args.user_id, args.fiscal_year, args.fiscal_quarter)
-    if result:
-        print(f"Successfully generated: {result}")
+    if args.user_id and len(args.user_id) > 1:
+        results = get_sales_reviews(args.user_id, args.fiscal_year, args.fiscal_quarter)
+        if results:
+            print(f"Successfully generated {len(results)} files")
+        else:
+            print("Failed to generate sales review CSV")
     else:
-        print("Failed to generate sales review CSV") 
\ No newline at end of file
+        user_id = args.user_id[0] if args.user_id else None
+        result = get_sales_review(user_id, args.fiscal_year, args.fiscal_quarter)
+        if result:
+            print(f"Successfully generated: {result}")
+        else:
+            print("Failed to generate sales review CSV") 
\ No newline at end of file
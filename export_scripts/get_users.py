@@ -2,9 +2,11 @@ import sys
 import os
 import requests
 import csv
-from datetime import datetime
 import logging
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from export_scripts.export_writer import open_export
+
 def ensure_exports_directory():
     """Create exports directory if it doesn't exist"""
     if not os.path.exists('exports'):
@@ -31,12 +33,12 @@ def get_users() -> str:
             logging.warning("No users found")
             return None
         
-        # Generate filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"exports/users_{timestamp}.csv"
+        # Compressed export, renamed into place once fully written
+        output = open_export("users")
+        filename = output.filename
         
         # Write to CSV
-        with open(filename, 'w', newline='') as csvfile:
+        with output as csvfile:
             writer = csv.writer(csvfile)
             
             # Write headers
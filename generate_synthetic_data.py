@@ -0,0 +1,537 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import datetime
+
+from populate_empty_tables import (
+    DATABASE_FILE,
+    PIPELINE_SOURCES,
+    INFLUENCERS,
+    ENGAGEMENT_TYPES,
+    ENGAGEMENT_OUTCOMES,
+    ENGAGEMENT_NEXT_STEPS,
+    REQUEST_TYPES,
+    PRIORITIES,
+    REQUEST_STATUSES,
+    PROJECT_ACTIVITIES,
+    PROJECT_DELIVERABLES,
+    PROJECT_STATUSES
+)
+from app.api.v1.dimensions import OPPORTUNITY_DIMENSIONS, FISCAL_PERIOD_KEY, dimension_key_sql
+
+# (stage_id, stage name, sales step, win probability, share of open deals in percent).
+# The first five match the stages of sales_data.db.
+STAGES = [
+    (1, 'Commitment to Buy - Commit', 5, 90, 8),
+    (2, 'Needs Solutioning - Upside', 2, 30, 30),
+    (3, 'First Call - Pipeline', 1, 10, 37),
+    (4, 'Quote / Proposal - Commit', 3, 70, 15),
+    (5, 'SOW/Trial / Pilot - Commit', 4, 60, 10),
+    (6, 'Closed Won', 6, 100, 0),
+    (7, 'Closed Lost', 6, 0, 0)
+]
+CLOSED_WON_STAGE, CLOSED_LOST_STAGE = 6, 7
+# (value, weight in percent)
+OPPORTUNITY_TYPES = [
+    ('New Business - New Logo', 35),
+    ('New Business - New solution w/ existing account', 30),
+    ('Existing Business - Expansion', 20),
+    ('Existing Business - Renewal', 15)
+]
+LEAD_SOURCES = [('Inbound', 35), ('Outbound', 25), ('Partner', 15), ('Event', 10), ('Referral', 15)]
+CONTRACT_MONTHS = [(12, 55), (24, 25), (36, 20)]
+INFLUENCERS_PER_ACCOUNT = [(0, 20), (1, 40), (2, 30), (3, 10)]
+ENGAGEMENTS_PER_OPPORTUNITY = [(0, 25), (1, 35), (2, 20), (3, 12), (5, 8)]
+REQUESTS_PER_OPPORTUNITY = [(0, 40), (1, 40), (2, 20)]
+CHANGES_PER_OPPORTUNITY = [(0, 20), (1, 25), (2, 25), (3, 15), (4, 10), (6, 5)]
+NEXT_STEPS = [
+    'Schedule discovery call',
+    'Send pricing proposal',
+    'Finalize SOW with procurement',
+    'Technical deep dive with architects',
+    'Executive alignment meeting',
+    'Waiting on legal review'
+]
+FIRST_NAMES = ['Arnold', 'David', 'Gautam', 'Priya', 'Maria', 'James', 'Wei', 'Fatima', 'Lucas', 'Aisha', 'Tom', 'Elena']
+LAST_NAMES = ['Britto', 'Hoff', 'Kotwal', 'Nair', 'Garcia', 'Miller', 'Chen', 'Khan', 'Silva', 'Okafor', 'Novak', 'Rossi']
+ACCOUNT_WORDS = ['Global', 'United', 'Pacific', 'Northern', 'Summit', 'Pioneer', 'Apex', 'Harbor', 'Cedar', 'Atlas']
+ACCOUNT_SUFFIXES = ['Inc.', 'LLC', 'Group', 'Holdings', 'Systems', 'Partners', 'Industries', 'Labs']
+HISTORY_FIELDS = ['stage_name', 'total_amount', 'close_date', 'next_step', 'probability_percentage']
+
+OPPORTUNITIES_PER_ACCOUNT = 4
+OPPORTUNITIES_PER_USER = 250
+CREATED_WINDOW_DAYS = 3 * 365
+# Samples drawn from the continuous distributions
+DISTRIBUTION_SAMPLES = 4096
+# Tables filled by migrations rather than generated, copied from --schema-from
+REFERENCE_TABLES = ['fiscal_periods', 'fiscal_calendar']
+# Day numbers are Julian days, which SQLite's date() formats directly
+JULIAN_DAY_OFFSET = 1721425
+
+# Draws are computed in SQL so rows never pass through Python: a keyed
+# quadratic hash modulo a Mersenne prime, which stays within 64-bit integers
+HASH_PRIME = 2147483647
+HASH_MULTIPLIER = 1597334677
+HASH_MIXER = 812433259
+
+def expand(weighted: list) -> list:
+    """Values repeated by their weight, so a uniform index picks with those odds"""
+    return [value for value, weight in weighted for _ in range(weight)]
+
+class SyntheticDataGenerator:
+    """Seeded generator for every table, sized by the number of opportunities.
+
+    Python only fills small lookup tables (vocabularies, weighted choices and
+    samples of the amount and sales cycle distributions) from the seeded RNG.
+    Rows are produced by INSERT ... SELECT statements indexing into them with
+    hashes of the row id, so the output depends only on the seed, the size
+    and the as-of date, and a million opportunities load in seconds.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, opportunities: int, seed: int, as_of: datetime.date,
+                 batch_size: int):
+        self.conn = conn
+        self.opportunities = opportunities
+        self.seed = seed
+        self.as_of = as_of.toordinal() + JULIAN_DAY_OFFSET
+        # Written instead of CURRENT_TIMESTAMP defaults so reruns are byte for byte equal
+        self.stamp = f"'{as_of.isoformat()} 18:00:00'"
+        self.batch_size = batch_size
+        self.accounts = max(1, opportunities // OPPORTUNITIES_PER_ACCOUNT)
+        self.users = max(3, opportunities // OPPORTUNITIES_PER_USER)
+        self.slot_sizes = {}
+        self.dimension_keys = False
+
+    def draw(self, expr: str, name: str) -> str:
+        """SQL for a pseudo-random integer in [0, HASH_PRIME) keyed by expr and the draw's name"""
+        salt = random.Random(f"{self.seed}:{name}").randrange(1, HASH_PRIME)
+        mixed = f"((({expr}) * {HASH_MULTIPLIER} + {salt}) % {HASH_PRIME})"
+        return f"(({mixed} * {mixed} % {HASH_PRIME}) * {HASH_MIXER} % {HASH_PRIME})"
+
+    def below(self, expr: str, name: str, limit: int) -> str:
+        return f"({self.draw(expr, name)} % {limit})"
+
+    def pick(self, table: str, expr: str, name: str) -> str:
+        """SQL for a value from a slot table, chosen by a draw"""
+        return f"(SELECT value FROM temp.{table} WHERE k = {self.below(expr, name, self.slot_sizes[table])})"
+
+    def skewed(self, expr: str, name: str, count: int) -> str:
+        """SQL for an id in [1, count] where low ids are much more likely.
+
+        The product of two uniform draws puts about a third of the rows on the
+        first tenth of ids, like a few owners and accounts carrying most deals.
+        """
+        return (f"(1 + {self.below(expr, name + '.a', count)} * "
+                f"{self.below(expr, name + '.b', 1000)} / 1000)")
+
+    def create_slots(self, table: str, values: list):
+        self.conn.execute(f"CREATE TEMP TABLE {table} (k INTEGER PRIMARY KEY, value)")
+        self.conn.executemany(f"INSERT INTO temp.{table} VALUES (?, ?)", enumerate(values))
+        self.slot_sizes[table] = len(values)
+
+    def create_lookups(self):
+        rng = random.Random(self.seed)
+        self.create_slots('amounts', [round(min(rng.lognormvariate(11.0, 1.1), 25000000), 2)
+                                      for _ in range(DISTRIBUTION_SAMPLES)])
+        # Sales cycles are skewed: most close within a quarter or two, some drag on
+        self.create_slots('cycles', [14 + int(rng.gammavariate(2.0, 45.0)) for _ in range(DISTRIBUTION_SAMPLES)])
+        self.create_slots('open_stages', expand([(stage[0], stage[4]) for stage in STAGES]))
+        self.create_slots('types', expand(OPPORTUNITY_TYPES))
+        self.create_slots('lead_source_names', expand(LEAD_SOURCES))
+        self.create_slots('durations', expand(CONTRACT_MONTHS))
+        self.create_slots('influencer_counts', expand(INFLUENCERS_PER_ACCOUNT))
+        self.create_slots('engagement_counts', expand(ENGAGEMENTS_PER_OPPORTUNITY))
+        self.create_slots('request_counts', expand(REQUESTS_PER_OPPORTUNITY))
+        self.create_slots('change_counts', expand(CHANGES_PER_OPPORTUNITY))
+        self.create_slots('next_steps', NEXT_STEPS)
+        self.create_slots('first_names', FIRST_NAMES)
+        self.create_slots('last_names', LAST_NAMES)
+        self.create_slots('account_words', ACCOUNT_WORDS)
+        self.create_slots('account_suffixes', ACCOUNT_SUFFIXES)
+        self.create_slots('engagement_types', ENGAGEMENT_TYPES)
+        self.create_slots('outcomes', ENGAGEMENT_OUTCOMES)
+        self.create_slots('engagement_next_steps', ENGAGEMENT_NEXT_STEPS)
+        self.create_slots('request_types', REQUEST_TYPES)
+        self.create_slots('priorities', PRIORITIES)
+        self.create_slots('request_statuses', REQUEST_STATUSES)
+        self.create_slots('activities', PROJECT_ACTIVITIES)
+        self.create_slots('deliverables', PROJECT_DELIVERABLES)
+        self.create_slots('plan_statuses', PROJECT_STATUSES)
+
+        self.conn.execute("CREATE TEMP TABLE fanout (n INTEGER PRIMARY KEY)")
+        self.conn.executemany("INSERT INTO temp.fanout VALUES (?)", [(n,) for n in range(8)])
+        self.conn.execute("""
+            CREATE TEMP TABLE stage_info (
+                stage_id INTEGER PRIMARY KEY, stage_name TEXT, step INTEGER, probability INTEGER
+            )
+        """)
+        self.conn.executemany("INSERT INTO temp.stage_info VALUES (?, ?, ?, ?)", [stage[:4] for stage in STAGES])
+        self.conn.execute("""
+            CREATE TEMP TABLE influencer_templates (
+                k INTEGER PRIMARY KEY, first_name, last_name, title, email, phone, role, influence_level
+            )
+        """)
+        self.conn.executemany("INSERT INTO temp.influencer_templates VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              [(k, *template) for k, template in enumerate(INFLUENCERS)])
+
+    def ids(self, first: int, last: int) -> str:
+        return f"WITH RECURSIVE ids(i) AS (SELECT {first} UNION ALL SELECT i + 1 FROM ids WHERE i < {last})"
+
+    def generate(self) -> dict:
+        started = time.perf_counter()
+        self.create_lookups()
+        self.generate_dimensions()
+        self.conn.commit()
+        for first in range(1, self.opportunities + 1, self.batch_size):
+            last = min(first + self.batch_size - 1, self.opportunities)
+            self.generate_opportunities(first, last)
+            self.conn.commit()
+            print(f"  {last:>10} opportunities ({time.perf_counter() - started:.1f}s)")
+        self.generate_targets()
+        self.conn.commit()
+        return {
+            table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ['accounts', 'users', 'influencers', 'opportunities', 'opportunity_project_plan',
+                          'influencer_engagements', 'support_requests', 'opportunity_history',
+                          'deals_closed', 'quarterly_targets']
+        }
+
+    def generate_dimensions(self):
+        # Since migration 011 opportunities hold keys into dimension tables
+        # instead of these columns' text
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(opportunities)")]
+        self.dimension_keys = OPPORTUNITY_DIMENSIONS['stage_name'][2] in columns
+        if self.dimension_keys:
+            for column, values in [('stage_name', [f"{stage[2]} - {stage[1]}" for stage in STAGES]),
+                                   ('type', [value for value, _ in OPPORTUNITY_TYPES]),
+                                   ('lead_source', [value for value, _ in LEAD_SOURCES]),
+                                   ('currency', ['USD'])]:
+                self.conn.executemany(f"INSERT INTO {OPPORTUNITY_DIMENSIONS[column][0]} ({column}) VALUES (?)",
+                                      [(value,) for value in values])
+
+        self.conn.executemany(f"INSERT INTO stages (stage_id, stage_name, created_at) VALUES (?, ?, {self.stamp})",
+                              [stage[:2] for stage in STAGES])
+        self.conn.executemany(f"""
+            INSERT INTO pipeline_sources (source_id, source_name, description, created_date, last_modified_date)
+            VALUES (?, ?, ?, {self.stamp}, {self.stamp})
+        """, [(index + 1, *source) for index, source in enumerate(PIPELINE_SOURCES)])
+        self.conn.execute(f"""
+            {self.ids(1, self.users)}
+            INSERT INTO users (user_id, username, first_name, last_name, full_name, created_at)
+            SELECT i, lower(substr(first, 1, 1) || last) || i, first, last, first || ' ' || last, {self.stamp}
+            FROM (
+                SELECT i, {self.pick('first_names', 'i', 'user.first')} AS first,
+                       {self.pick('last_names', 'i', 'user.last')} AS last
+                FROM ids
+            )
+        """)
+        self.conn.execute(f"""
+            {self.ids(1, self.accounts)}
+            INSERT INTO accounts (account_id, account_name, created_at)
+            SELECT i, {self.pick('account_words', 'i', 'account.first')} || ' '
+                      || {self.pick('account_words', 'i', 'account.second')} || ' '
+                      || {self.pick('account_suffixes', 'i', 'account.suffix')} || ' ' || i, {self.stamp}
+            FROM ids
+        """)
+
+        # Up to three influencers per account with ids derived from the account,
+        # so opportunities can pick one without a lookup
+        self.conn.execute("CREATE TEMP TABLE account_influencers (account_id INTEGER PRIMARY KEY, influencers INTEGER)")
+        self.conn.execute(f"""
+            {self.ids(1, self.accounts)}
+            INSERT INTO temp.account_influencers
+            SELECT i, {self.pick('influencer_counts', 'i', 'influencer.count')} FROM ids
+        """)
+        self.conn.execute(f"""
+            INSERT INTO influencers
+                (influencer_id, first_name, last_name, title, email, phone, account_id, role, influence_level,
+                 created_date, last_modified_date)
+            SELECT (a.account_id - 1) * 3 + f.n + 1, t.first_name, t.last_name, t.title,
+                   replace(t.email, '@', '.' || ((a.account_id - 1) * 3 + f.n + 1) || '@'),
+                   t.phone, a.account_id, t.role, t.influence_level, {self.stamp}, {self.stamp}
+            FROM temp.account_influencers a
+            JOIN temp.fanout f ON f.n < a.influencers
+            JOIN temp.influencer_templates t
+              ON t.k = ({self.below('a.account_id', 'influencer.template', len(INFLUENCERS))} + f.n) % {len(INFLUENCERS)}
+            ORDER BY a.account_id, f.n
+        """)
+
+        self.conn.execute("""
+            CREATE TEMP TABLE draws (
+                opportunity_id INTEGER PRIMARY KEY, account_id, owner_id, stage_id, created, close,
+                last_touch, amount, duration, is_closed, is_won, influencers, type, year, quarter
+            )
+        """)
+
+    def generate_opportunities(self, first: int, last: int):
+        """One batch of opportunities and everything hanging off them"""
+        conn = self.conn
+        conn.execute("DELETE FROM temp.draws")
+        conn.execute(f"""
+            {self.ids(first, last)},
+            base AS (
+                SELECT i,
+                       {self.skewed('i', 'opportunity.account', self.accounts)} AS account_id,
+                       {self.skewed('i', 'opportunity.owner', self.users)} AS owner_id,
+                       {self.as_of} - {self.below('i', 'opportunity.created', CREATED_WINDOW_DAYS)} AS created,
+                       {self.pick('cycles', 'i', 'opportunity.cycle')} AS cycle,
+                       {self.pick('amounts', 'i', 'opportunity.amount')} AS amount,
+                       {self.pick('durations', 'i', 'opportunity.duration')} AS duration,
+                       {self.below('i', 'opportunity.closed', 100)} < 95 AS closes,
+                       {self.below('i', 'opportunity.won', 100)} < 32 AS wins,
+                       {self.pick('open_stages', 'i', 'opportunity.stage')} AS open_stage,
+                       {self.pick('types', 'i', 'opportunity.type')} AS type
+                FROM ids
+            ),
+            dated AS (
+                SELECT *, created + cycle AS close, created + cycle < {self.as_of} AND closes AS is_closed,
+                       strftime('%Y-%m', created + cycle) AS month
+                FROM base
+            )
+            INSERT INTO temp.draws
+            SELECT d.i, d.account_id, d.owner_id,
+                   CASE WHEN NOT d.is_closed THEN d.open_stage
+                        WHEN d.wins THEN {CLOSED_WON_STAGE} ELSE {CLOSED_LOST_STAGE} END,
+                   d.created, d.close, min(d.close, {self.as_of}), d.amount, d.duration,
+                   d.is_closed, d.is_closed AND d.wins, a.influencers, d.type,
+                   CAST(substr(d.month, 1, 4) AS INTEGER), (CAST(substr(d.month, 6, 2) AS INTEGER) + 2) / 3
+            FROM dated d
+            JOIN temp.account_influencers a ON a.account_id = d.account_id
+        """)
+
+        dimension_values = {
+            'stage_name': "s.step || ' - ' || s.stage_name",
+            'currency': "'USD'",
+            'fiscal_period': "'Q' || d.quarter || '-' || d.year",
+            'lead_source': self.pick('lead_source_names', 'd.opportunity_id', 'opportunity.lead_source'),
+            'type': 'd.type'
+        }
+        if self.dimension_keys:
+            conn.execute(f"""
+                INSERT OR IGNORE INTO {OPPORTUNITY_DIMENSIONS['fiscal_period'][0]} (fiscal_period)
+                SELECT DISTINCT {dimension_values['fiscal_period']} FROM temp.draws d
+            """)
+            dimension_values = {
+                OPPORTUNITY_DIMENSIONS[column][2]: dimension_key_sql(column, value)
+                for column, value in dimension_values.items()
+            }
+            dimension_values[FISCAL_PERIOD_KEY] = "d.year * 10 + d.quarter"
+        conn.execute(f"""
+            INSERT INTO opportunities (
+                opportunity_id, opportunity_name, account_id, owner_id, stage_id, opportunity_owner,
+                next_step, close_date, total_amount, probability_percentage, age, created_date,
+                last_modified_date, is_closed, is_won, fiscal_year,
+                fiscal_quarter, annual_contract_value, source_id, contract_duration_months, project_plan_id,
+                influencer_id, {', '.join(dimension_values)}
+            )
+            SELECT d.opportunity_id, substr(d.type, instr(d.type, ' - ') + 3) || ' ' || d.opportunity_id,
+                   d.account_id, d.owner_id, d.stage_id, u.full_name,
+                   {self.pick('next_steps', 'd.opportunity_id', 'opportunity.next_step')}, date(d.close), d.amount,
+                   s.probability, d.last_touch - d.created, date(d.created),
+                   date(max(d.created, d.last_touch - {self.below('d.opportunity_id', 'opportunity.modified', 30)}))
+                       || ' 12:00:00',
+                   d.is_closed, d.is_won, d.year, 'Q' || d.quarter, round(d.amount * 12 / d.duration, 2),
+                   1 + {self.below('d.opportunity_id', 'opportunity.source', len(PIPELINE_SOURCES))},
+                   d.duration, d.opportunity_id,
+                   CASE WHEN d.influencers > 0 THEN (d.account_id - 1) * 3 + 1 END, {', '.join(dimension_values.values())}
+            FROM temp.draws d
+            JOIN users u ON u.user_id = d.owner_id
+            JOIN temp.stage_info s ON s.stage_id = d.stage_id
+        """)
+
+        conn.execute(f"""
+            INSERT INTO opportunity_project_plan
+                (project_plan_id, opportunity_id, opportunity_owner, activity, deliverables, priority, due_date, status,
+                 created_date, last_modified_date)
+            SELECT d.opportunity_id, d.opportunity_id, u.full_name,
+                   {self.pick('activities', 'd.opportunity_id', 'plan.activity')},
+                   {self.pick('deliverables', 'd.opportunity_id', 'plan.deliverable')},
+                   {self.pick('priorities', 'd.opportunity_id', 'plan.priority')},
+                   date(d.close + {self.below('d.opportunity_id', 'plan.due', 90)}),
+                   {self.pick('plan_statuses', 'd.opportunity_id', 'plan.status')}, {self.stamp}, {self.stamp}
+            FROM temp.draws d JOIN users u ON u.user_id = d.owner_id
+        """)
+
+        # Children are numbered by AUTOINCREMENT in (opportunity, n) order
+        key = "d.opportunity_id * 8 + f.n"
+        conn.execute(f"""
+            INSERT INTO influencer_engagements
+                (influencer_id, opportunity_id, engagement_date, engagement_type, description, outcome,
+                 next_steps, created_by, created_date)
+            SELECT influencer_id, opportunity_id, engagement_date, engagement_type,
+                   'Engagement with ' || lower(engagement_type), outcome, next_steps, owner_id, {self.stamp}
+            FROM (
+                SELECT d.opportunity_id, d.owner_id, f.n,
+                       (d.account_id - 1) * 3 + 1 + {self.below(key, 'engagement.influencer', 'd.influencers')} AS influencer_id,
+                       date(d.created + {self.below(key, 'engagement.day', 'max(1, d.last_touch - d.created)')}) AS engagement_date,
+                       {self.pick('engagement_types', key, 'engagement.type')} AS engagement_type,
+                       {self.pick('outcomes', key, 'engagement.outcome')} AS outcome,
+                       {self.pick('engagement_next_steps', key, 'engagement.next_step')} AS next_steps
+                FROM temp.draws d
+                JOIN temp.fanout f
+                  ON d.influencers > 0 AND f.n < {self.pick('engagement_counts', 'd.opportunity_id', 'engagement.count')}
+            )
+            ORDER BY opportunity_id, n
+        """)
+
+        conn.execute(f"""
+            INSERT INTO support_requests
+                (opportunity_id, request_type, description, status, priority, requested_by, assigned_to,
+                 due_date, created_date, last_modified_date)
+            SELECT opportunity_id, request_type,
+                   'Support request for opportunity ' || opportunity_id || ': ' || request_type,
+                   status, priority, owner_id, assigned_to, date(opened + 14), date(opened) || ' 09:00:00', {self.stamp}
+            FROM (
+                SELECT d.opportunity_id, d.owner_id, f.n,
+                       {self.pick('request_types', key, 'request.type')} AS request_type,
+                       CASE WHEN d.is_closed AND {self.below(key, 'request.resolved', 10)} < 9 THEN 'Resolved'
+                            ELSE {self.pick('request_statuses', key, 'request.status')} END AS status,
+                       {self.pick('priorities', key, 'request.priority')} AS priority,
+                       1 + {self.below(key, 'request.assignee', self.users)} AS assigned_to,
+                       d.created + {self.below(key, 'request.opened', 60)} AS opened
+                FROM temp.draws d
+                JOIN temp.fanout f ON f.n < {self.pick('request_counts', 'd.opportunity_id', 'request.count')}
+            )
+            ORDER BY opportunity_id, n
+        """)
+
+        conn.execute(f"""
+            INSERT INTO opportunity_history (opportunity_id, field_name, old_value, new_value, changed_by, changed_at)
+            SELECT opportunity_id, field_name,
+                   CASE field_name
+                       WHEN 'stage_name' THEN (SELECT stage_name FROM temp.stage_info WHERE stage_id = 1 + roll % 5)
+                       WHEN 'total_amount' THEN CAST(round(amount * (600 + roll % 800) / 1000.0, 2) AS TEXT)
+                       WHEN 'close_date' THEN date(day + 15 + roll % 75)
+                       WHEN 'probability_percentage' THEN CAST(10 + roll % 3 * 25 AS TEXT)
+                       ELSE (SELECT value FROM temp.next_steps WHERE k = roll % {len(NEXT_STEPS)})
+                   END,
+                   CASE field_name
+                       WHEN 'stage_name' THEN (SELECT stage_name FROM temp.stage_info WHERE stage_id = stage)
+                       WHEN 'total_amount' THEN CAST(amount AS TEXT)
+                       WHEN 'close_date' THEN date(day + 90 + roll % 90)
+                       WHEN 'probability_percentage' THEN
+                           (SELECT CAST(probability AS TEXT) FROM temp.stage_info WHERE stage_id = stage)
+                       ELSE (SELECT value FROM temp.next_steps WHERE k = (roll + 1) % {len(NEXT_STEPS)})
+                   END,
+                   owner_id, date(day) || ' ' || printf('%02d:%02d:00', hour, minute) AS changed_at
+            FROM (
+                SELECT d.opportunity_id, d.owner_id, d.amount, d.stage_id AS stage,
+                       d.created + {self.below(key, 'history.day', 'max(1, d.last_touch - d.created)')} AS day,
+                       8 + {self.below(key, 'history.hour', 11)} AS hour,
+                       {self.below(key, 'history.minute', 60)} AS minute,
+                       CASE {self.below(key, 'history.field', len(HISTORY_FIELDS))}
+                           {' '.join(f"WHEN {k} THEN '{field}'" for k, field in enumerate(HISTORY_FIELDS))}
+                       END AS field_name,
+                       {self.draw(key, 'history.value')} AS roll
+                FROM temp.draws d
+                JOIN temp.fanout f ON f.n < {self.pick('change_counts', 'd.opportunity_id', 'history.count')}
+            )
+            ORDER BY opportunity_id, changed_at
+        """)
+
+        conn.execute(f"""
+            INSERT INTO deals_closed
+                (opportunity_id, close_date, fiscal_year, fiscal_quarter, annual_contract_value,
+                 total_contract_value, contract_duration_months, owner_id, account_id, source_id, created_date)
+            SELECT opportunity_id, close_date, fiscal_year, fiscal_quarter, annual_contract_value,
+                   total_amount, contract_duration_months, owner_id, account_id, source_id, {self.stamp}
+            FROM opportunities
+            WHERE opportunity_id BETWEEN {first} AND {last} AND is_won = 1
+            ORDER BY opportunity_id
+        """)
+
+    def generate_targets(self):
+        first_year = datetime.date.fromordinal(self.as_of - JULIAN_DAY_OFFSET - CREATED_WINDOW_DAYS).year
+        last_year = datetime.date.fromordinal(self.as_of - JULIAN_DAY_OFFSET).year + 1
+        key = "u.user_id * 64 + (y.year - 2000) * 4 + q.quarter"
+        self.conn.execute(f"""
+            WITH RECURSIVE years(year) AS (SELECT {first_year} UNION ALL SELECT year + 1 FROM years WHERE year < {last_year}),
+            quarters(quarter) AS (SELECT 1 UNION ALL SELECT quarter + 1 FROM quarters WHERE quarter < 4)
+            INSERT INTO quarterly_targets
+                (fiscal_year, fiscal_quarter, user_id, revenue_target, pipeline_target, deals_target,
+                 created_date, last_modified_date)
+            SELECT y.year, 'Q' || q.quarter, u.user_id,
+                   1000000 + {self.below(key, 'target.revenue', 4000001)},
+                   500000 + {self.below(key, 'target.pipeline', 1500001)},
+                   5 + {self.below(key, 'target.deals', 16)}, {self.stamp}, {self.stamp}
+            FROM users u, years y, quarters q
+            ORDER BY u.user_id, y.year, q.quarter
+        """)
+
+def copy_schema(source: str, conn: sqlite3.Connection) -> list:
+    """Create the source database's tables; return its indexes, triggers and views to create after loading"""
+    with sqlite3.connect(source) as src:
+        objects = src.execute("""
+            SELECT type, sql FROM sqlite_master
+            WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, rowid
+        """).fetchall()
+    deferred = []
+    for object_type, sql in objects:
+        if object_type == 'table':
+            conn.execute(sql)
+        else:
+            deferred.append(sql)
+    return deferred
+
+def copy_reference_rows(source: str, conn: sqlite3.Connection):
+    """Copy the rows of tables migrations fill in, such as the fiscal calendar"""
+    conn.execute("ATTACH DATABASE ? AS source", (source,))
+    try:
+        for table in REFERENCE_TABLES:
+            if conn.execute("SELECT 1 FROM source.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                conn.execute(f"INSERT INTO main.{table} SELECT * FROM source.{table}")
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE source")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic sales database")
+    parser.add_argument("--output", default="synthetic_data.db")
+    parser.add_argument("--opportunities", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", default="2025-06-30", help="Date the data ends at, YYYY-MM-DD")
+    parser.add_argument("--batch-size", type=int, default=100000, help="Opportunities per transaction")
+    parser.add_argument("--schema-from", default=DATABASE_FILE, help="Database whose schema is copied")
+    parser.add_argument("--force", action="store_true", help="Overwrite the output file")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        if not args.force:
+            print(f"{args.output} already exists, pass --force to overwrite it")
+            sys.exit(1)
+        os.remove(args.output)
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.output)
+    # A generated fixture can always be regenerated, so trade durability for speed
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    deferred = copy_schema(args.schema_from, conn)
+    copy_reference_rows(args.schema_from, conn)
+
+    print(f"Generating {args.opportunities} opportunities with seed {args.seed}...")
+    generator = SyntheticDataGenerator(conn, args.opportunities, args.seed,
+                                       datetime.date.fromisoformat(args.as_of), args.batch_size)
+    counts = generator.generate()
+
+    print(f"Creating indexes and triggers ({time.perf_counter() - started:.1f}s)...")
+    for sql in deferred:
+        conn.execute(sql)
+    # Sampled statistics are plenty for the planner and take a fraction of the time
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+    for table, count in counts.items():
+        print(f"  {table:<26} {count:>10}")
+    print(f"✅ {args.output} generated in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
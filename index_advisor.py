@@ -0,0 +1,255 @@
+import os
+import re
+import glob
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import statistics
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Tuple
+
+from app.api.v1.opportunities import OPPORTUNITY_FILTERS, build_opportunity_list_queries
+from app.api.v1.filter_usage import FILTER_USAGE_LOG
+from benchmarks.sales_review_serialization import build_database
+
+# The compared value is a parameter or, for dimension columns, the key it names
+CONDITION = re.compile(r"^o\.(\w+) (=|>=|<=) (\?$|\(SELECT )")
+# Filter parameter -> (column, operator)
+FILTER_COLUMNS = {name: CONDITION.match(condition).groups()[:2] for name, condition in OPPORTUNITY_FILTERS}
+ORDER_COLUMN = "created_date"
+PAGE_SIZE = 25
+SAMPLES_PER_COMBINATION = 20
+# Logged as ISO strings; the list endpoint receives them parsed into dates
+DATE_FILTERS = ("closeDateStart", "closeDateEnd")
+
+def load_usage(path: str, endpoint: str = "opportunities") -> Dict[Tuple[str, ...], dict]:
+    """Filter combinations from the usage log and its rotated files, with sample values"""
+    combinations = defaultdict(lambda: {"count": 0, "samples": []})
+    for log_file in sorted(glob.glob(f"{path}*")):
+        with open(log_file) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("endpoint") != endpoint:
+                    continue
+                filters = {
+                    name: date.fromisoformat(value) if name in DATE_FILTERS else value
+                    for name, value in entry["filters"].items() if name in FILTER_COLUMNS
+                }
+                combination = combinations[tuple(sorted(filters))]
+                combination["count"] += 1
+                if len(combination["samples"]) < SAMPLES_PER_COMBINATION:
+                    combination["samples"].append(filters)
+    return dict(combinations)
+
+def candidate_indexes(combinations) -> List[Tuple[str, ...]]:
+    """Composite indexes that could serve each observed combination.
+
+    Equality columns come first and at most one range column last, since
+    columns after a range are not used for the search. A second candidate
+    ends in the ORDER BY column instead.
+    """
+    candidates = []
+    for names in combinations:
+        columns = [FILTER_COLUMNS[name] for name in names]
+        equality = sorted({column for column, operator in columns if operator == "="})
+        ranges = sorted({column for column, operator in columns if operator != "="})
+        for last in ranges[:1] + [ORDER_COLUMN]:
+            candidate = tuple(equality + [last])
+            if candidate not in candidates:
+                candidates.append(candidate)
+    return candidates
+
+def existing_indexes(conn: sqlite3.Connection) -> List[Tuple[str, ...]]:
+    indexes = []
+    for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'opportunities'"):
+        indexes.append(tuple(row[2] for row in conn.execute(f"PRAGMA index_info({name})")))
+    return indexes
+
+def is_covered(candidate: Tuple[str, ...], indexes: List[Tuple[str, ...]]) -> bool:
+    """Whether an index already starts with the candidate's columns"""
+    return any(index[:len(candidate)] == candidate for index in indexes)
+
+def index_name(columns: Tuple[str, ...]) -> str:
+    return "idx_opportunities_" + "_".join(columns)
+
+def build_workload(combinations) -> List[Tuple[float, str, list]]:
+    """(weight, query, params) for the count and first page of every sample.
+
+    Weights make each combination count as often as it was observed.
+    """
+    workload = []
+    for combination in combinations.values():
+        weight = combination["count"] / len(combination["samples"])
+        for filters in combination["samples"]:
+            for query, params in build_opportunity_list_queries(filters, PAGE_SIZE, 0):
+                workload.append((weight, query, params))
+    return workload
+
+def time_workload(conn: sqlite3.Connection, workload, repeat: int) -> float:
+    """Frequency-weighted sum of the median time of each query"""
+    total = 0.0
+    for weight, query, params in workload:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(query, params).fetchall()
+            timings.append(time.perf_counter() - started)
+        total += weight * statistics.median(timings)
+    return total
+
+def time_writes(conn: sqlite3.Connection, columns: Tuple[str, ...], rows: int, repeat: int) -> float:
+    """Median time to insert `rows` opportunities and update the indexed columns, rolled back"""
+    insert_columns = ", ".join(
+        row[1] for row in conn.execute("PRAGMA table_info(opportunities)") if row[1] != "opportunity_id"
+    )
+    assignments = ", ".join(f"{column} = {column}" for column in columns)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute("BEGIN")
+        conn.execute(f"""
+            INSERT INTO opportunities ({insert_columns})
+            SELECT {insert_columns} FROM opportunities LIMIT ?
+        """, (rows,))
+        conn.execute(f"UPDATE opportunities SET {assignments} WHERE opportunity_id IN "
+                     f"(SELECT opportunity_id FROM opportunities LIMIT ?)", (rows,))
+        conn.execute("ROLLBACK")
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def database_bytes(conn: sqlite3.Connection) -> int:
+    """Bytes in use, not counting free pages left behind by rolled back writes"""
+    used_pages = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return used_pages * conn.execute("PRAGMA page_size").fetchone()[0]
+
+def evaluate(conn, candidate, accepted, workload, args) -> dict:
+    """Build the candidate on top of the accepted indexes and measure it"""
+    all_columns = tuple(sorted({column for index in accepted + [candidate] for column in index}))
+    baseline_reads = time_workload(conn, workload, args.repeat)
+    baseline_writes = time_writes(conn, all_columns, args.write_rows, args.repeat)
+    size_before = database_bytes(conn)
+
+    started = time.perf_counter()
+    conn.execute(f"CREATE INDEX {index_name(candidate)} ON opportunities({', '.join(candidate)})")
+    build_seconds = time.perf_counter() - started
+    conn.execute("ANALYZE")
+
+    reads = time_workload(conn, workload, args.repeat)
+    writes = time_writes(conn, all_columns, args.write_rows, args.repeat)
+    size = database_bytes(conn) - size_before
+    conn.execute(f"DROP INDEX {index_name(candidate)}")
+    conn.execute("ANALYZE")
+
+    return {
+        "index": index_name(candidate),
+        "columns": list(candidate),
+        "read_ms_before": round(baseline_reads * 1000, 3),
+        "read_ms_after": round(reads * 1000, 3),
+        "speedup": round(baseline_reads / reads, 2) if reads else None,
+        "read_gain_pct": round((baseline_reads - reads) / baseline_reads * 100, 1) if baseline_reads else 0.0,
+        "write_cost_pct": round((writes - baseline_writes) / baseline_writes * 100, 1) if baseline_writes else 0.0,
+        "build_ms": round(build_seconds * 1000, 3),
+        "size_bytes": size
+    }
+
+def advise(conn: sqlite3.Connection, combinations, args) -> Tuple[List[dict], List[dict]]:
+    """Greedily accept the candidate with the best read gain until none is worth its cost.
+
+    Every round re-measures the remaining candidates with the accepted
+    indexes in place, so an index made redundant by a winner drops out.
+    """
+    workload = build_workload(combinations)
+    existing = existing_indexes(conn)
+    candidates = [candidate for candidate in candidate_indexes(combinations) if not is_covered(candidate, existing)]
+
+    first_round = None
+    accepted = []
+    winners = []
+    while candidates:
+        results = [evaluate(conn, candidate, accepted, workload, args) for candidate in candidates]
+        if first_round is None:
+            first_round = results
+        best = max(results, key=lambda result: result["read_gain_pct"])
+        if best["read_gain_pct"] < args.min_gain or best["write_cost_pct"] > args.max_write_cost:
+            break
+        candidate = tuple(best["columns"])
+        conn.execute(f"CREATE INDEX {index_name(candidate)} ON opportunities({', '.join(candidate)})")
+        accepted.append(candidate)
+        winners.append(best)
+        candidates = [c for c in candidates if c != candidate and not is_covered(c, [candidate])]
+    return first_round or [], winners
+
+def next_migration_path(directory: str = "migrations", name: str = "advised_indexes") -> str:
+    numbers = [int(match.group(1)) for file in os.listdir(directory) if (match := re.match(r"^(\d{3})_", file))]
+    return os.path.join(directory, f"{max(numbers, default=0) + 1:03d}_{name}.sql")
+
+def write_migration(path: str, winners: List[dict], combinations) -> None:
+    observed = sum(combination["count"] for combination in combinations.values())
+    lines = [
+        f"-- Composite indexes for the opportunity list filters, chosen by index_advisor.py",
+        f"-- from {observed} recorded requests over {len(combinations)} filter combinations"
+    ]
+    for winner in winners:
+        lines.append("")
+        lines.append(f"-- {winner['speedup']}x on the replayed workload ({winner['read_gain_pct']}% less read time), "
+                     f"{winner['write_cost_pct']:+}% write time, {winner['size_bytes']} bytes")
+        lines.append(f"CREATE INDEX IF NOT EXISTS {winner['index']} ON opportunities({', '.join(winner['columns'])});")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend opportunity indexes from recorded filter usage")
+    parser.add_argument("--db", default="sales_data.db")
+    parser.add_argument("--usage", default=FILTER_USAGE_LOG, help="Filter usage log written by the API")
+    parser.add_argument("--scale", type=int, default=1, help="Replay against a copy with opportunities repeated N times")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query; the median is used")
+    parser.add_argument("--write-rows", type=int, default=1000, help="Rows inserted and updated to measure write cost")
+    parser.add_argument("--min-gain", type=float, default=10.0, help="Minimum read time saved, in percent")
+    parser.add_argument("--max-write-cost", type=float, default=50.0, help="Maximum added write time, in percent")
+    parser.add_argument("--write-migration", action="store_true", help="Write the winners to the next migration file")
+    parser.add_argument("--output", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    combinations = load_usage(args.usage)
+    if not combinations:
+        print(f"No filter usage recorded in {args.usage}*")
+        return
+
+    print("Observed filter combinations:")
+    for names, combination in sorted(combinations.items(), key=lambda item: -item[1]["count"]):
+        print(f"  {combination['count']:>8}  {', '.join(names) or '(none)'}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "advisor.db")
+        build_database(args.db, path, args.scale)
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute("ANALYZE")
+        candidates, winners = advise(conn, combinations, args)
+        conn.close()
+
+    print("\nCandidates measured alone:")
+    print(f"  {'index':<60} {'speedup':>8} {'read gain':>10} {'write cost':>11} {'size':>10}")
+    for result in sorted(candidates, key=lambda result: -result["read_gain_pct"]):
+        print(f"  {result['index']:<60} {str(result['speedup']) + 'x':>8} {result['read_gain_pct']:>9}% "
+              f"{result['write_cost_pct']:>10}% {result['size_bytes']:>10}")
+
+    print("\nRecommended:" if winners else "\nNo index is worth its write cost for this workload")
+    for winner in winners:
+        print(f"  {winner['index']} ({', '.join(winner['columns'])})")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"candidates": candidates, "winners": winners}, f, indent=2)
+    if args.write_migration and winners:
+        migration = next_migration_path()
+        write_migration(migration, winners, combinations)
+        print(f"\nWrote {migration}; add it to MIGRATION_FILES in apply_migrations.py to apply it")
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,31 @@ from app.api.v1 import (
     calibration,
     users,
     influencers,
-    influencer_engagements
+    influencer_engagements,
+    export,
+    details,
+    admin,
+    metrics
 )
+from app.api.v1.snapshots import snapshot_manager
+from app.api.v1.opportunity_snapshots import opportunity_snapshot_job
+from app.api.v1.archive import opportunity_archive_job
+from app.api.v1.filter_usage import filter_usage
+from app.api.v1.serialization import FastJSONResponse
+from app.api.v1.cache import cache_middleware
+from app.api.v1.profiling import ProfilingMiddleware, PROFILING_ENABLED
+from app.api.v1.database import DATABASE_FILE
+from apply_migrations import check_on_startup
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# Serve repeated dashboard reads from memory until a write touches their tables
+app.middleware("http")(cache_middleware)
+# Opt-in per-request cProfile, not installed at all unless PROFILING_ENABLED is set
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+# Added last so it is outermost and also times cache hits
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Include routers
 app.include_router(accounts.router)
@@ -21,6 +42,29 @@ app.include_router(calibration.router)
 app.include_router(users.router)
 app.include_router(influencers.router)
 app.include_router(influencer_engagements.router)
+app.include_router(export.router)
+app.include_router(details.router)
+app.include_router(admin.router)
+app.include_router(metrics.router)
+
+@app.on_event("startup")
+def start_snapshots():
+    # Log pending migrations, or apply them first with MIGRATE_ON_STARTUP
+    check_on_startup(DATABASE_FILE)
+    # Periodic read snapshots, enabled with SNAPSHOT_INTERVAL_SECONDS
+    snapshot_manager.start()
+    # Opportunity state snapshots for as_of, enabled with OPPORTUNITY_SNAPSHOT_INTERVAL_SECONDS
+    opportunity_snapshot_job.start()
+    # Archival of old closed opportunities, enabled with ARCHIVE_INTERVAL_SECONDS
+    opportunity_archive_job.start()
+
+@app.on_event("shutdown")
+def stop_snapshots():
+    snapshot_manager.stop()
+    opportunity_snapshot_job.stop()
+    opportunity_archive_job.stop()
+    # Write out filter usage lines still queued
+    filter_usage.close()
 
 if __name__ == "__main__":
     import uvicorn
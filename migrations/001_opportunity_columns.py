@@ -0,0 +1,22 @@
+"""Columns added to opportunities after the initial schema.
+
+Databases created by setup_database_schema.py already have them; older ones
+get the missing columns added in place instead of copying the table.
+"""
+
+COLUMNS = [
+    ("blockers", "TEXT"),
+    ("support_needed", "TEXT"),
+    ("annual_contract_value", "DECIMAL(15,2)"),
+    ("contract_duration_months", "INTEGER"),
+    ("fiscal_year", "INTEGER"),
+    ("fiscal_quarter", "VARCHAR(2)"),
+    ("source_id", "INTEGER REFERENCES pipeline_sources(source_id)"),
+    ("project_plan_id", "INTEGER")
+]
+
+def migrate(conn):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(opportunities)")}
+    for column, definition in COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE opportunities ADD COLUMN {column} {definition}")
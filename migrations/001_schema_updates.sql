@@ -1,58 +1,5 @@
--- Modify opportunities table structure
-DROP TABLE IF EXISTS opportunities_temp;
-CREATE TABLE opportunities_temp(
-  opportunity_id INTEGER PRIMARY KEY,
-  opportunity_name TEXT,
-  account_id INT,
-  owner_id INT,
-  stage_id INT,
-  opportunity_owner TEXT,
-  stage_name TEXT,
-  next_step TEXT,
-  close_date NUM,
-  total_amount NUM,
-  currency TEXT,
-  probability_percentage INT,
-  age INT,
-  created_date NUM,
-  last_modified_date NUM,
-  fiscal_period TEXT,
-  lead_source TEXT,
-  type TEXT,
-  is_closed NUM,
-  is_won NUM,
-  blockers TEXT,
-  support_needed TEXT,
-  annual_contract_value NUM,
-  contract_duration_months INT,
-  fiscal_year INT,
-  fiscal_quarter TEXT,
-  source_id INT,
-  project_plan_id INTEGER
-);
-
-INSERT INTO opportunities_temp SELECT * FROM opportunities;
-DROP TABLE opportunities;
-ALTER TABLE opportunities_temp RENAME TO opportunities;
-
--- Recreate indexes
-CREATE INDEX IF NOT EXISTS idx_opportunities_account ON opportunities(account_id);
-CREATE INDEX IF NOT EXISTS idx_opportunities_owner ON opportunities(owner_id);
-CREATE INDEX IF NOT EXISTS idx_opportunities_stage ON opportunities(stage_id);
-CREATE INDEX IF NOT EXISTS idx_opportunities_fiscal_year ON opportunities(fiscal_year);
-CREATE INDEX IF NOT EXISTS idx_opportunities_fiscal_quarter ON opportunities(fiscal_quarter);
-CREATE INDEX IF NOT EXISTS idx_opportunities_acv ON opportunities(annual_contract_value);
-CREATE INDEX IF NOT EXISTS idx_opportunities_close_date ON opportunities(close_date);
-CREATE INDEX IF NOT EXISTS idx_opportunities_source ON opportunities(source_id);
-
--- Add other columns
-ALTER TABLE opportunities ADD COLUMN blockers TEXT;
-ALTER TABLE opportunities ADD COLUMN support_needed TEXT;
-ALTER TABLE opportunities ADD COLUMN annual_contract_value DECIMAL(15,2);
-ALTER TABLE opportunities ADD COLUMN contract_duration_months INTEGER;
-ALTER TABLE opportunities ADD COLUMN fiscal_year INTEGER;
-ALTER TABLE opportunities ADD COLUMN fiscal_quarter VARCHAR(2);
-ALTER TABLE opportunities ADD COLUMN source_id INTEGER;
+-- Columns added to opportunities live in 001_opportunity_columns.py, which
+-- adds the missing ones in place instead of copying the table
 
 -- Create pipeline_sources table first (since it's referenced by opportunities)
 CREATE TABLE IF NOT EXISTS pipeline_sources (
@@ -166,6 +113,7 @@ CREATE TABLE IF NOT EXISTS opportunity_history (
 );
 
 -- Add indexes
+CREATE INDEX IF NOT EXISTS idx_opportunities_stage ON opportunities(stage_id);
 CREATE INDEX IF NOT EXISTS idx_opportunities_fiscal_year ON opportunities(fiscal_year);
 CREATE INDEX IF NOT EXISTS idx_opportunities_fiscal_quarter ON opportunities(fiscal_quarter);
 CREATE INDEX IF NOT EXISTS idx_opportunities_acv ON opportunities(annual_contract_value);
@@ -182,7 +130,3 @@ CREATE INDEX IF NOT EXISTS idx_support_status ON support_requests(status);
 CREATE INDEX IF NOT EXISTS idx_targets_fiscal ON quarterly_targets(fiscal_year, fiscal_quarter);
 CREATE INDEX IF NOT EXISTS idx_opportunity_history_opportunity ON opportunity_history(opportunity_id);
 CREATE INDEX IF NOT EXISTS idx_opportunity_history_changed_at ON opportunity_history(changed_at);
-
--- Add foreign key constraint for source_id
-ALTER TABLE opportunities ADD CONSTRAINT fk_opportunity_source 
-    FOREIGN KEY (source_id) REFERENCES pipeline_sources(source_id); 
\ No newline at end of file
@@ -1,11 +1,6 @@
--- First drop the existing project_plan_id column if it exists
-ALTER TABLE opportunities DROP COLUMN project_plan_id;
-
--- Add project_plan_id to opportunities table as auto-increment
-ALTER TABLE opportunities ADD COLUMN project_plan_id INTEGER;
-
--- Drop the existing project plan table if it exists
-DROP TABLE IF EXISTS opportunity_project_plan;
+-- project_plan_id is added by 001_opportunity_columns.py when missing, and
+-- every statement here leaves existing plans and links alone, so rerunning
+-- it on a database that already has them changes nothing
 
 -- Create opportunity_project_plan table
 CREATE TABLE IF NOT EXISTS opportunity_project_plan (
@@ -27,8 +22,7 @@ CREATE INDEX IF NOT EXISTS idx_project_plan_opportunity ON opportunity_project_p
 CREATE INDEX IF NOT EXISTS idx_project_plan_due_date ON opportunity_project_plan(due_date);
 
 -- Add trigger to update last_modified_date
-DROP TRIGGER IF EXISTS update_project_plan_timestamp;
-CREATE TRIGGER update_project_plan_timestamp 
+CREATE TRIGGER IF NOT EXISTS update_project_plan_timestamp 
 AFTER UPDATE ON opportunity_project_plan
 BEGIN
     UPDATE opportunity_project_plan 
@@ -36,15 +30,29 @@ BEGIN
     WHERE project_plan_id = NEW.project_plan_id;
 END;
 
--- Insert project plans for existing opportunities
+-- Insert project plans for opportunities that do not have one yet
 INSERT INTO opportunity_project_plan (opportunity_id, opportunity_owner)
-SELECT opportunity_id, opportunity_owner
-FROM opportunities;
+SELECT o.opportunity_id, o.opportunity_owner
+FROM opportunities o
+WHERE NOT EXISTS (
+    SELECT 1 FROM opportunity_project_plan pp WHERE pp.opportunity_id = o.opportunity_id
+);
+
+-- Linking the plans must leave last_modified_date alone, so the timestamp
+-- trigger is dropped around it
+DROP TRIGGER IF EXISTS update_opportunity_timestamp;
 
--- Update opportunities table with project plan IDs
 UPDATE opportunities
 SET project_plan_id = (
-    SELECT project_plan_id 
-    FROM opportunity_project_plan 
-    WHERE opportunity_project_plan.opportunity_id = opportunities.opportunity_id
-); 
\ No newline at end of file
+    SELECT MIN(pp.project_plan_id)
+    FROM opportunity_project_plan pp
+    WHERE pp.opportunity_id = opportunities.opportunity_id
+)
+WHERE project_plan_id IS NULL;
+
+CREATE TRIGGER IF NOT EXISTS update_opportunity_timestamp
+    AFTER UPDATE ON opportunities
+BEGIN
+    UPDATE opportunities SET last_modified_date = CURRENT_TIMESTAMP
+    WHERE opportunity_id = NEW.opportunity_id;
+END;
@@ -0,0 +1,3 @@
+-- Indexes for the composite detail endpoints and per-owner exports
+CREATE INDEX IF NOT EXISTS idx_opportunities_account ON opportunities(account_id);
+CREATE INDEX IF NOT EXISTS idx_opportunities_owner ON opportunities(owner_id);
@@ -0,0 +1,4 @@
+-- Keep the MAX(last_modified_date) aggregates behind the ETags index-only
+CREATE INDEX IF NOT EXISTS idx_opportunities_last_modified ON opportunities(last_modified_date);
+CREATE INDEX IF NOT EXISTS idx_influencers_last_modified ON influencers(last_modified_date);
+CREATE INDEX IF NOT EXISTS idx_project_plan_last_modified ON opportunity_project_plan(last_modified_date);
@@ -0,0 +1,22 @@
+-- One row per opportunity update with a JSON diff, {"field": [old, new], ...},
+-- written instead of one opportunity_history row per field when HISTORY_STORAGE=changesets
+CREATE TABLE IF NOT EXISTS opportunity_changesets (
+    changeset_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    opportunity_id INTEGER NOT NULL,
+    changes TEXT NOT NULL,
+    changed_by INTEGER NOT NULL,
+    changed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (opportunity_id) REFERENCES opportunities(opportunity_id),
+    FOREIGN KEY (changed_by) REFERENCES users(user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_opportunity_changesets_opportunity ON opportunity_changesets(opportunity_id, changed_at);
+
+-- Per-field history from both stores, in the shape of opportunity_history
+CREATE VIEW IF NOT EXISTS opportunity_history_fields AS
+SELECT history_id, NULL AS changeset_id, opportunity_id, field_name, old_value, new_value, changed_by, changed_at
+FROM opportunity_history
+UNION ALL
+SELECT NULL, c.changeset_id, c.opportunity_id, f.key, json_extract(f.value, '$[0]'), json_extract(f.value, '$[1]'),
+       c.changed_by, c.changed_at
+FROM opportunity_changesets c, json_each(c.changes) f;
@@ -0,0 +1,54 @@
+-- Periodic copies of every opportunity for as_of reconstruction: the state at a
+-- date is the first snapshot taken after it with later history changes undone
+CREATE TABLE IF NOT EXISTS opportunity_snapshots (
+    snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    taken_at DATETIME NOT NULL,
+    opportunity_count INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_opportunity_snapshots_taken_at ON opportunity_snapshots(taken_at);
+
+-- Opportunity columns plus the project plan fields history records
+CREATE TABLE IF NOT EXISTS opportunity_snapshot_rows (
+    snapshot_id INTEGER NOT NULL,
+    opportunity_id INTEGER NOT NULL,
+    opportunity_name TEXT,
+    account_id INTEGER,
+    owner_id INTEGER,
+    stage_id INTEGER,
+    opportunity_owner TEXT,
+    stage_name TEXT,
+    next_step TEXT,
+    close_date DATE,
+    total_amount DECIMAL(15,2),
+    currency TEXT,
+    probability_percentage INTEGER,
+    age INTEGER,
+    created_date DATE,
+    last_modified_date DATETIME,
+    fiscal_period TEXT,
+    lead_source TEXT,
+    type TEXT,
+    is_closed BOOLEAN,
+    is_won BOOLEAN,
+    fiscal_year INTEGER,
+    fiscal_quarter VARCHAR(2),
+    annual_contract_value DECIMAL(15,2),
+    source_id INTEGER,
+    blockers TEXT,
+    support_needed TEXT,
+    contract_duration_months INTEGER,
+    project_plan_id INTEGER,
+    influencer_id INTEGER,
+    project_activity TEXT,
+    project_deliverables TEXT,
+    project_priority TEXT,
+    project_due_date DATE,
+    project_status TEXT,
+    PRIMARY KEY (snapshot_id, opportunity_id),
+    FOREIGN KEY (snapshot_id) REFERENCES opportunity_snapshots(snapshot_id)
+) WITHOUT ROWID;
+
+-- Changes to one opportunity after a point in time, superseding the single-column index
+CREATE INDEX IF NOT EXISTS idx_opportunity_history_opportunity_changed_at ON opportunity_history(opportunity_id, changed_at);
+DROP INDEX IF EXISTS idx_opportunity_history_opportunity;
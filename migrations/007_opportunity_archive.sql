@@ -0,0 +1,38 @@
+-- Cold copies of closed opportunities and everything hanging off them, moved
+-- out of the hot tables by app/api/v1/archive.py once they are old enough.
+-- Columns follow the hot tables, which may grow new ones the archiver adds
+CREATE TABLE IF NOT EXISTS archived_opportunities AS SELECT * FROM opportunities WHERE 0;
+
+ALTER TABLE archived_opportunities ADD COLUMN archived_at DATETIME;
+
+CREATE TABLE IF NOT EXISTS archived_opportunity_project_plan AS SELECT * FROM opportunity_project_plan WHERE 0;
+
+CREATE TABLE IF NOT EXISTS archived_influencer_engagements AS SELECT * FROM influencer_engagements WHERE 0;
+
+CREATE TABLE IF NOT EXISTS archived_opportunity_history AS SELECT * FROM opportunity_history WHERE 0;
+
+CREATE TABLE IF NOT EXISTS archived_opportunity_changesets AS SELECT * FROM opportunity_changesets WHERE 0;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_archived_opportunities_id ON archived_opportunities(opportunity_id);
+
+CREATE INDEX IF NOT EXISTS idx_archived_opportunities_account ON archived_opportunities(account_id);
+
+CREATE INDEX IF NOT EXISTS idx_archived_opportunities_owner ON archived_opportunities(owner_id);
+
+CREATE INDEX IF NOT EXISTS idx_archived_opportunities_created_date ON archived_opportunities(created_date);
+
+CREATE INDEX IF NOT EXISTS idx_archived_project_plan_opportunity ON archived_opportunity_project_plan(opportunity_id);
+
+CREATE INDEX IF NOT EXISTS idx_archived_engagements_opportunity ON archived_influencer_engagements(opportunity_id);
+
+CREATE INDEX IF NOT EXISTS idx_archived_engagements_influencer ON archived_influencer_engagements(influencer_id);
+
+CREATE INDEX IF NOT EXISTS idx_archived_opportunity_history_opportunity ON archived_opportunity_history(opportunity_id, changed_at);
+
+CREATE INDEX IF NOT EXISTS idx_archived_opportunity_changesets_opportunity ON archived_opportunity_changesets(opportunity_id, changed_at);
+
+-- Open pipeline reads (sales review per owner) and the archiver's pick of
+-- closed opportunities each only touch their side of is_closed
+CREATE INDEX IF NOT EXISTS idx_opportunities_open_owner ON opportunities(owner_id) WHERE is_closed = 0;
+
+CREATE INDEX IF NOT EXISTS idx_opportunities_closed_close_date ON opportunities(close_date) WHERE is_closed = 1;
@@ -0,0 +1,18 @@
+-- Open support requests by status category. Generated from status, so every
+-- writer keeps it right without having to know about it
+ALTER TABLE support_requests ADD COLUMN is_open INTEGER GENERATED ALWAYS AS (status NOT IN ('Resolved', 'Completed', 'Closed')) VIRTUAL;
+
+-- Newest open requests first (sales review, support request list) without a sort
+CREATE INDEX IF NOT EXISTS idx_support_requests_open_created ON support_requests(created_date) WHERE is_open;
+
+-- Open pipeline per owner, in close date order. Supersedes the owner-only
+-- partial index of migration 007
+DROP INDEX IF EXISTS idx_opportunities_open_owner;
+
+CREATE INDEX IF NOT EXISTS idx_opportunities_open_owner_close ON opportunities(owner_id, close_date) WHERE is_closed = 0;
+
+-- Covering indexes for the user and account rollups (counts, open and won
+-- totals), which then never read the opportunity rows
+CREATE INDEX IF NOT EXISTS idx_opportunities_owner_rollup ON opportunities(owner_id, is_closed, is_won, total_amount);
+
+CREATE INDEX IF NOT EXISTS idx_opportunities_account_rollup ON opportunities(account_id, is_closed, is_won, total_amount);
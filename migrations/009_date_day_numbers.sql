@@ -0,0 +1,69 @@
+-- Dates are stored as 'YYYY-MM-DD' text so they compare correctly as strings,
+-- and each gets a generated integer day number (julianday + 0.5, truncated,
+-- the same for any time of the day) that range filters use through an index.
+-- See app/api/v1/dates.py.
+
+-- setup_database.py wrote unparseable dates as empty strings or MM/DD/YYYY
+-- text. engagement_date keeps the text clients wrote ('YYYY-MM-DD' or an ISO
+-- datetime); julianday() and datetime() read both, so only its day number is added
+-- Normalizing the format must leave last_modified_date alone, so the
+-- timestamp triggers are dropped until the dates are rewritten
+DROP TRIGGER IF EXISTS update_opportunity_timestamp;
+DROP TRIGGER IF EXISTS update_project_plan_timestamp;
+
+UPDATE opportunities SET close_date = NULL WHERE trim(close_date) = '';
+UPDATE opportunities SET close_date = substr(close_date, 7, 4) || '-' || substr(close_date, 1, 2) || '-' || substr(close_date, 4, 2) WHERE close_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+UPDATE opportunities SET close_date = date(close_date) WHERE typeof(close_date) = 'text' AND date(close_date) IS NOT NULL AND close_date <> date(close_date);
+UPDATE opportunities SET created_date = substr(created_date, 7, 4) || '-' || substr(created_date, 1, 2) || '-' || substr(created_date, 4, 2) WHERE created_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+UPDATE opportunities SET created_date = date(created_date) WHERE typeof(created_date) = 'text' AND date(created_date) IS NOT NULL AND created_date <> date(created_date);
+UPDATE opportunity_project_plan SET due_date = NULL WHERE trim(due_date) = '';
+UPDATE opportunity_project_plan SET due_date = substr(due_date, 7, 4) || '-' || substr(due_date, 1, 2) || '-' || substr(due_date, 4, 2) WHERE due_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+UPDATE opportunity_project_plan SET due_date = date(due_date) WHERE typeof(due_date) = 'text' AND date(due_date) IS NOT NULL AND due_date <> date(due_date);
+UPDATE support_requests SET due_date = NULL WHERE trim(due_date) = '';
+UPDATE support_requests SET due_date = substr(due_date, 7, 4) || '-' || substr(due_date, 1, 2) || '-' || substr(due_date, 4, 2) WHERE due_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+UPDATE support_requests SET due_date = date(due_date) WHERE typeof(due_date) = 'text' AND date(due_date) IS NOT NULL AND due_date <> date(due_date);
+UPDATE deals_closed SET close_date = substr(close_date, 7, 4) || '-' || substr(close_date, 1, 2) || '-' || substr(close_date, 4, 2) WHERE close_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+UPDATE deals_closed SET close_date = date(close_date) WHERE typeof(close_date) = 'text' AND date(close_date) IS NOT NULL AND close_date <> date(close_date);
+UPDATE archived_opportunities SET close_date = NULL WHERE trim(close_date) = '';
+UPDATE archived_opportunities SET close_date = substr(close_date, 7, 4) || '-' || substr(close_date, 1, 2) || '-' || substr(close_date, 4, 2) WHERE close_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+UPDATE archived_opportunities SET close_date = date(close_date) WHERE typeof(close_date) = 'text' AND date(close_date) IS NOT NULL AND close_date <> date(close_date);
+UPDATE archived_opportunities SET created_date = NULL WHERE trim(created_date) = '';
+UPDATE archived_opportunities SET created_date = substr(created_date, 7, 4) || '-' || substr(created_date, 1, 2) || '-' || substr(created_date, 4, 2) WHERE created_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+UPDATE archived_opportunities SET created_date = date(created_date) WHERE typeof(created_date) = 'text' AND date(created_date) IS NOT NULL AND created_date <> date(created_date);
+UPDATE archived_opportunity_project_plan SET due_date = NULL WHERE trim(due_date) = '';
+UPDATE archived_opportunity_project_plan SET due_date = substr(due_date, 7, 4) || '-' || substr(due_date, 1, 2) || '-' || substr(due_date, 4, 2) WHERE due_date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+UPDATE archived_opportunity_project_plan SET due_date = date(due_date) WHERE typeof(due_date) = 'text' AND date(due_date) IS NOT NULL AND due_date <> date(due_date);
+
+CREATE TRIGGER IF NOT EXISTS update_opportunity_timestamp
+    AFTER UPDATE ON opportunities
+BEGIN
+    UPDATE opportunities SET last_modified_date = CURRENT_TIMESTAMP
+    WHERE opportunity_id = NEW.opportunity_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS update_project_plan_timestamp
+    AFTER UPDATE ON opportunity_project_plan
+BEGIN
+    UPDATE opportunity_project_plan SET last_modified_date = CURRENT_TIMESTAMP
+    WHERE project_plan_id = NEW.project_plan_id;
+END;
+
+-- Day numbers, also on the archive tables of migration 007 so includeArchived
+-- unions can filter on them
+ALTER TABLE opportunities ADD COLUMN close_day INTEGER GENERATED ALWAYS AS (CAST(julianday(close_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE opportunities ADD COLUMN created_day INTEGER GENERATED ALWAYS AS (CAST(julianday(created_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE opportunity_project_plan ADD COLUMN due_day INTEGER GENERATED ALWAYS AS (CAST(julianday(due_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE support_requests ADD COLUMN due_day INTEGER GENERATED ALWAYS AS (CAST(julianday(due_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE influencer_engagements ADD COLUMN engagement_day INTEGER GENERATED ALWAYS AS (CAST(julianday(engagement_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE deals_closed ADD COLUMN close_day INTEGER GENERATED ALWAYS AS (CAST(julianday(close_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE archived_opportunities ADD COLUMN close_day INTEGER GENERATED ALWAYS AS (CAST(julianday(close_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE archived_opportunities ADD COLUMN created_day INTEGER GENERATED ALWAYS AS (CAST(julianday(created_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE archived_opportunity_project_plan ADD COLUMN due_day INTEGER GENERATED ALWAYS AS (CAST(julianday(due_date) + 0.5 AS INTEGER)) VIRTUAL;
+ALTER TABLE archived_influencer_engagements ADD COLUMN engagement_day INTEGER GENERATED ALWAYS AS (CAST(julianday(engagement_date) + 0.5 AS INTEGER)) VIRTUAL;
+
+-- Only the day numbers the routers filter on are indexed
+CREATE INDEX IF NOT EXISTS idx_opportunities_close_day ON opportunities(close_day);
+CREATE INDEX IF NOT EXISTS idx_engagements_engagement_day ON influencer_engagements(engagement_day);
+CREATE INDEX IF NOT EXISTS idx_deals_closed_close_day ON deals_closed(close_day);
+CREATE INDEX IF NOT EXISTS idx_archived_opportunities_close_day ON archived_opportunities(close_day);
+CREATE INDEX IF NOT EXISTS idx_archived_engagements_engagement_day ON archived_influencer_engagements(engagement_day);
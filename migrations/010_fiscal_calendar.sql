@@ -0,0 +1,67 @@
+-- Fiscal calendar: the one mapping of dates to fiscal years, quarters and weeks.
+-- The fiscal year is the calendar year, its quarters start in January, April,
+-- July and October and week 1 starts on its first day. Period keys are
+-- fiscal_year * 10 + quarter number, e.g. 20242 for Q2-2024
+CREATE TABLE IF NOT EXISTS fiscal_periods (
+    period_key INTEGER PRIMARY KEY,
+    fiscal_year INTEGER NOT NULL,
+    fiscal_quarter VARCHAR(2) NOT NULL,
+    fiscal_period TEXT NOT NULL UNIQUE,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    start_day INTEGER NOT NULL,
+    end_day INTEGER NOT NULL,
+    UNIQUE(fiscal_year, fiscal_quarter)
+);
+
+-- One row per day, keyed by the day number of migration 009 so *_day columns
+-- join to it directly. period_key refers to fiscal_periods, which is filled
+-- from this table
+CREATE TABLE IF NOT EXISTS fiscal_calendar (
+    day_id INTEGER PRIMARY KEY,
+    calendar_date DATE NOT NULL UNIQUE,
+    fiscal_year INTEGER NOT NULL,
+    fiscal_quarter VARCHAR(2) NOT NULL,
+    fiscal_week INTEGER NOT NULL,
+    period_key INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_fiscal_calendar_period ON fiscal_calendar(period_key);
+
+-- Populated once for 2000 to 2099, later runs insert nothing
+WITH RECURSIVE days(day_id) AS (
+    SELECT CAST(julianday('2000-01-01') + 0.5 AS INTEGER)
+    UNION ALL
+    SELECT day_id + 1 FROM days WHERE day_id < CAST(julianday('2099-12-31') + 0.5 AS INTEGER)
+),
+dated AS (
+    SELECT day_id, date(day_id - 0.5) AS calendar_date FROM days
+),
+quarters AS (
+    SELECT day_id, calendar_date,
+           CAST(strftime('%Y', calendar_date) AS INTEGER) AS fiscal_year,
+           (CAST(strftime('%m', calendar_date) AS INTEGER) + 2) / 3 AS quarter_number,
+           (CAST(strftime('%j', calendar_date) AS INTEGER) - 1) / 7 + 1 AS fiscal_week
+    FROM dated
+)
+INSERT OR IGNORE INTO fiscal_calendar (day_id, calendar_date, fiscal_year, fiscal_quarter, fiscal_week, period_key)
+SELECT day_id, calendar_date, fiscal_year, 'Q' || quarter_number, fiscal_week, fiscal_year * 10 + quarter_number
+FROM quarters;
+
+INSERT OR IGNORE INTO fiscal_periods (
+    period_key, fiscal_year, fiscal_quarter, fiscal_period, start_date, end_date, start_day, end_day
+)
+SELECT period_key, fiscal_year, fiscal_quarter, fiscal_quarter || '-' || fiscal_year,
+       MIN(calendar_date), MAX(calendar_date), MIN(day_id), MAX(day_id)
+FROM fiscal_calendar
+GROUP BY period_key, fiscal_year, fiscal_quarter;
+
+-- Period keys of the target and closed deal tables. Generated, so writers of
+-- fiscal_year and fiscal_quarter keep them right. Opportunities get a
+-- fiscal_period_id column in migration 011
+ALTER TABLE deals_closed ADD COLUMN fiscal_period_key INTEGER GENERATED ALWAYS AS (CASE WHEN fiscal_quarter GLOB 'Q[1-4]' THEN fiscal_year * 10 + CAST(substr(fiscal_quarter, 2, 1) AS INTEGER) END) VIRTUAL;
+ALTER TABLE quarterly_targets ADD COLUMN fiscal_period_key INTEGER GENERATED ALWAYS AS (CASE WHEN fiscal_quarter GLOB 'Q[1-4]' THEN fiscal_year * 10 + CAST(substr(fiscal_quarter, 2, 1) AS INTEGER) END) VIRTUAL;
+
+-- The calibration rollups, per owner or for everyone
+CREATE INDEX IF NOT EXISTS idx_deals_closed_fiscal_period ON deals_closed(fiscal_period_key);
+CREATE INDEX IF NOT EXISTS idx_quarterly_targets_period_user ON quarterly_targets(fiscal_period_key, user_id);
@@ -0,0 +1,111 @@
+-- Low-cardinality opportunity text columns move to dimension tables and
+-- opportunities keep integer keys. The API adds the text back to responses
+-- from an in-memory copy of these tables, see app/api/v1/dimensions.py.
+-- Dimension rows are only ever added, never changed or deleted
+CREATE TABLE IF NOT EXISTS opportunity_stage_names (
+    stage_name_id INTEGER PRIMARY KEY,
+    stage_name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS opportunity_types (
+    type_id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS lead_sources (
+    lead_source_id INTEGER PRIMARY KEY,
+    lead_source TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS currencies (
+    currency_id INTEGER PRIMARY KEY,
+    currency TEXT NOT NULL UNIQUE
+);
+
+-- fiscal_period labels as written, such as 'Q2-2025 (21)'
+CREATE TABLE IF NOT EXISTS fiscal_period_labels (
+    fiscal_period_label_id INTEGER PRIMARY KEY,
+    fiscal_period TEXT NOT NULL UNIQUE
+);
+
+INSERT OR IGNORE INTO opportunity_stage_names (stage_name)
+SELECT stage_name FROM opportunities WHERE stage_name IS NOT NULL
+UNION SELECT stage_name FROM archived_opportunities WHERE stage_name IS NOT NULL;
+
+INSERT OR IGNORE INTO opportunity_types (type)
+SELECT type FROM opportunities WHERE type IS NOT NULL
+UNION SELECT type FROM archived_opportunities WHERE type IS NOT NULL;
+
+INSERT OR IGNORE INTO lead_sources (lead_source)
+SELECT lead_source FROM opportunities WHERE lead_source IS NOT NULL
+UNION SELECT lead_source FROM archived_opportunities WHERE lead_source IS NOT NULL;
+
+INSERT OR IGNORE INTO currencies (currency)
+SELECT currency FROM opportunities WHERE currency IS NOT NULL
+UNION SELECT currency FROM archived_opportunities WHERE currency IS NOT NULL;
+
+INSERT OR IGNORE INTO fiscal_period_labels (fiscal_period)
+SELECT fiscal_period FROM opportunities WHERE fiscal_period IS NOT NULL
+UNION SELECT fiscal_period FROM archived_opportunities WHERE fiscal_period IS NOT NULL;
+
+-- Filling in the keys must leave last_modified_date alone, so the timestamp
+-- trigger is dropped until the text columns are gone
+DROP TRIGGER IF EXISTS update_opportunity_timestamp;
+
+-- fiscal_period keeps its label in fiscal_period_labels and also gets the
+-- key of its fiscal_periods row (migration 010) for filters and rollups.
+-- 'Q2-2025 (21)' is in period 20252; labels that name no fiscal period
+-- keep their label but have no period key
+ALTER TABLE opportunities ADD COLUMN stage_name_id INTEGER REFERENCES opportunity_stage_names(stage_name_id);
+ALTER TABLE opportunities ADD COLUMN type_id INTEGER REFERENCES opportunity_types(type_id);
+ALTER TABLE opportunities ADD COLUMN lead_source_id INTEGER REFERENCES lead_sources(lead_source_id);
+ALTER TABLE opportunities ADD COLUMN currency_id INTEGER REFERENCES currencies(currency_id);
+ALTER TABLE opportunities ADD COLUMN fiscal_period_label_id INTEGER REFERENCES fiscal_period_labels(fiscal_period_label_id);
+ALTER TABLE opportunities ADD COLUMN fiscal_period_id INTEGER REFERENCES fiscal_periods(period_key);
+ALTER TABLE archived_opportunities ADD COLUMN stage_name_id INTEGER;
+ALTER TABLE archived_opportunities ADD COLUMN type_id INTEGER;
+ALTER TABLE archived_opportunities ADD COLUMN lead_source_id INTEGER;
+ALTER TABLE archived_opportunities ADD COLUMN currency_id INTEGER;
+ALTER TABLE archived_opportunities ADD COLUMN fiscal_period_label_id INTEGER;
+ALTER TABLE archived_opportunities ADD COLUMN fiscal_period_id INTEGER;
+
+UPDATE opportunities
+SET
+    stage_name_id = (SELECT d.stage_name_id FROM opportunity_stage_names d WHERE d.stage_name = opportunities.stage_name),
+    type_id = (SELECT d.type_id FROM opportunity_types d WHERE d.type = opportunities.type),
+    lead_source_id = (SELECT d.lead_source_id FROM lead_sources d WHERE d.lead_source = opportunities.lead_source),
+    currency_id = (SELECT d.currency_id FROM currencies d WHERE d.currency = opportunities.currency),
+    fiscal_period_label_id = (SELECT d.fiscal_period_label_id FROM fiscal_period_labels d WHERE d.fiscal_period = opportunities.fiscal_period),
+    fiscal_period_id = (SELECT p.period_key FROM fiscal_periods p WHERE p.period_key = CASE WHEN opportunities.fiscal_period GLOB 'Q[1-4]-[0-9][0-9][0-9][0-9]*' THEN CAST(substr(opportunities.fiscal_period, 4, 4) AS INTEGER) * 10 + CAST(substr(opportunities.fiscal_period, 2, 1) AS INTEGER) END);
+
+UPDATE archived_opportunities
+SET
+    stage_name_id = (SELECT d.stage_name_id FROM opportunity_stage_names d WHERE d.stage_name = archived_opportunities.stage_name),
+    type_id = (SELECT d.type_id FROM opportunity_types d WHERE d.type = archived_opportunities.type),
+    lead_source_id = (SELECT d.lead_source_id FROM lead_sources d WHERE d.lead_source = archived_opportunities.lead_source),
+    currency_id = (SELECT d.currency_id FROM currencies d WHERE d.currency = archived_opportunities.currency),
+    fiscal_period_label_id = (SELECT d.fiscal_period_label_id FROM fiscal_period_labels d WHERE d.fiscal_period = archived_opportunities.fiscal_period),
+    fiscal_period_id = (SELECT p.period_key FROM fiscal_periods p WHERE p.period_key = CASE WHEN archived_opportunities.fiscal_period GLOB 'Q[1-4]-[0-9][0-9][0-9][0-9]*' THEN CAST(substr(archived_opportunities.fiscal_period, 4, 4) AS INTEGER) * 10 + CAST(substr(archived_opportunities.fiscal_period, 2, 1) AS INTEGER) END);
+
+-- Run VACUUM afterwards to return the freed pages
+ALTER TABLE opportunities DROP COLUMN stage_name;
+ALTER TABLE opportunities DROP COLUMN type;
+ALTER TABLE opportunities DROP COLUMN lead_source;
+ALTER TABLE opportunities DROP COLUMN currency;
+ALTER TABLE opportunities DROP COLUMN fiscal_period;
+ALTER TABLE archived_opportunities DROP COLUMN stage_name;
+ALTER TABLE archived_opportunities DROP COLUMN type;
+ALTER TABLE archived_opportunities DROP COLUMN lead_source;
+ALTER TABLE archived_opportunities DROP COLUMN currency;
+ALTER TABLE archived_opportunities DROP COLUMN fiscal_period;
+
+CREATE TRIGGER IF NOT EXISTS update_opportunity_timestamp
+    AFTER UPDATE ON opportunities
+BEGIN
+    UPDATE opportunities SET last_modified_date = CURRENT_TIMESTAMP
+    WHERE opportunity_id = NEW.opportunity_id;
+END;
+
+-- Quarter filters and the calibration rollups, per owner or for everyone
+CREATE INDEX IF NOT EXISTS idx_opportunities_fiscal_period_id_owner ON opportunities(fiscal_period_id, owner_id);
+CREATE INDEX IF NOT EXISTS idx_archived_opportunities_fiscal_period_id ON archived_opportunities(fiscal_period_id);
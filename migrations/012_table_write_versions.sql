@@ -0,0 +1,137 @@
+-- Write version of each table the ETags cover, bumped by triggers on every
+-- insert, update and delete, including writes made outside the API. ETags
+-- read it with the count/last-modified aggregates, so they survive restarts,
+-- agree between workers and change on edits that leave both alone, such as
+-- a renamed account. A table without a row has version 0
+CREATE TABLE IF NOT EXISTS table_write_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS opportunities_write_version_insert AFTER INSERT ON opportunities
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('opportunities', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS opportunities_write_version_update AFTER UPDATE ON opportunities
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('opportunities', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS opportunities_write_version_delete AFTER DELETE ON opportunities
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('opportunities', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS accounts_write_version_insert AFTER INSERT ON accounts
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('accounts', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS accounts_write_version_update AFTER UPDATE ON accounts
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('accounts', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS accounts_write_version_delete AFTER DELETE ON accounts
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('accounts', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS users_write_version_insert AFTER INSERT ON users
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('users', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS users_write_version_update AFTER UPDATE ON users
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('users', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS users_write_version_delete AFTER DELETE ON users
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('users', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stages_write_version_insert AFTER INSERT ON stages
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('stages', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS stages_write_version_update AFTER UPDATE ON stages
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('stages', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS stages_write_version_delete AFTER DELETE ON stages
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('stages', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS pipeline_sources_write_version_insert AFTER INSERT ON pipeline_sources
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('pipeline_sources', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS pipeline_sources_write_version_update AFTER UPDATE ON pipeline_sources
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('pipeline_sources', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS pipeline_sources_write_version_delete AFTER DELETE ON pipeline_sources
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('pipeline_sources', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS opportunity_project_plan_write_version_insert AFTER INSERT ON opportunity_project_plan
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('opportunity_project_plan', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS opportunity_project_plan_write_version_update AFTER UPDATE ON opportunity_project_plan
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('opportunity_project_plan', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS opportunity_project_plan_write_version_delete AFTER DELETE ON opportunity_project_plan
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('opportunity_project_plan', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS influencer_engagements_write_version_insert AFTER INSERT ON influencer_engagements
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('influencer_engagements', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS influencer_engagements_write_version_update AFTER UPDATE ON influencer_engagements
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('influencer_engagements', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS influencer_engagements_write_version_delete AFTER DELETE ON influencer_engagements
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('influencer_engagements', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS influencers_write_version_insert AFTER INSERT ON influencers
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('influencers', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS influencers_write_version_update AFTER UPDATE ON influencers
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('influencers', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS influencers_write_version_delete AFTER DELETE ON influencers
+BEGIN
+    INSERT INTO table_write_versions (table_name, version) VALUES ('influencers', 1)
+    ON CONFLICT (table_name) DO UPDATE SET version = version + 1;
+END;
@@ -5,6 +5,57 @@ import random
 # Database configuration
 DATABASE_FILE = 'sales_data.db'
 
+# Sample values, shared with generate_synthetic_data.py
+PIPELINE_SOURCES = [
+    ('Website Lead', 'Lead from company website'),
+    ('Referral', 'Referral from existing customer'),
+    ('Partner', 'Partner referral'),
+    ('Trade Show', 'Lead from trade show'),
+    ('Social Media', 'Lead from social media'),
+    ('Direct Contact', 'Direct contact from prospect'),
+    ('Email Campaign', 'Lead from email campaign'),
+    ('Content Marketing', 'Lead from content marketing')
+]
+INFLUENCERS = [
+    ('John', 'Smith', 'CTO', 'john.smith@example.com', '555-0101', 'Technical Decision Maker', 'High'),
+    ('Sarah', 'Johnson', 'VP Sales', 'sarah.j@example.com', '555-0102', 'Business Decision Maker', 'High'),
+    ('Michael', 'Brown', 'IT Director', 'm.brown@example.com', '555-0103', 'Technical Influencer', 'Medium'),
+    ('Emily', 'Davis', 'Procurement Manager', 'e.davis@example.com', '555-0104', 'Procurement', 'Medium'),
+    ('David', 'Wilson', 'CIO', 'd.wilson@example.com', '555-0105', 'Executive Sponsor', 'High'),
+    ('Lisa', 'Anderson', 'Project Manager', 'l.anderson@example.com', '555-0106', 'Project Lead', 'Medium'),
+    ('Robert', 'Taylor', 'Security Officer', 'r.taylor@example.com', '555-0107', 'Security', 'High'),
+    ('Jennifer', 'Martinez', 'Operations Director', 'j.martinez@example.com', '555-0108', 'Operations', 'Medium')
+]
+ENGAGEMENT_TYPES = ['Meeting', 'Call', 'Email', 'Presentation', 'Workshop', 'Demo']
+ENGAGEMENT_OUTCOMES = ['Positive', 'Neutral', 'Needs Follow-up', 'Scheduled Next Meeting', 'Requested More Info']
+ENGAGEMENT_NEXT_STEPS = [
+    'Schedule follow-up meeting',
+    'Send additional information',
+    'Prepare proposal',
+    'Arrange technical demo',
+    'Connect with technical team'
+]
+REQUEST_TYPES = ['Technical Support', 'Implementation', 'Training', 'Customization', 'Integration']
+PRIORITIES = ['High', 'Medium', 'Low']
+REQUEST_STATUSES = ['Open', 'In Progress', 'Resolved', 'Pending']
+PROJECT_ACTIVITIES = [
+    'Initial Setup',
+    'Configuration',
+    'Data Migration',
+    'User Training',
+    'Integration Testing',
+    'Go-Live Support'
+]
+PROJECT_DELIVERABLES = [
+    'System Configuration Document',
+    'Data Migration Plan',
+    'Training Materials',
+    'Integration Test Results',
+    'Go-Live Checklist',
+    'User Acceptance Sign-off'
+]
+PROJECT_STATUSES = ['Not Started', 'In Progress', 'Completed', 'On Hold']
+
 def get_random_date(start_date, end_date):
     """Generate a random date between start_date and end_date."""
     time_between_dates = end_date - start_date
@@ -14,16 +65,7 @@ def get_random_date(start_date, end_date):
 
 def populate_pipeline_sources(cursor):
     """Populate pipeline sources with common sources."""
-    sources = [
-        ('Website Lead', 'Lead from company website'),
-        ('Referral', 'Referral from existing customer'),
-        ('Partner', 'Partner referral'),
-        ('Trade Show', 'Lead from trade show'),
-        ('Social Media', 'Lead from social media'),
-        ('Direct Contact', 'Direct contact from prospect'),
-        ('Email Campaign', 'Lead from email campaign'),
-        ('Content Marketing', 'Lead from content marketing')
-    ]
+    sources = PIPELINE_SOURCES
     
     for source_name, description in sources:
         cursor.execute(
@@ -38,16 +80,7 @@ def populate_influencers(cursor):
     cursor.execute("SELECT account_id FROM accounts")
     account_ids = [row[0] for row in cursor.fetchall()]
     
-    influencers = [
-        ('John', 'Smith', 'CTO', 'john.smith@example.com', '555-0101', 'Technical Decision Maker', 'High'),
-        ('Sarah', 'Johnson', 'VP Sales', 'sarah.j@example.com', '555-0102', 'Business Decision Maker', 'High'),
-        ('Michael', 'Brown', 'IT Director', 'm.brown@example.com', '555-0103', 'Technical Influencer', 'Medium'),
-        ('Emily', 'Davis', 'Procurement Manager', 'e.davis@example.com', '555-0104', 'Procurement', 'Medium'),
-        ('David', 'Wilson', 'CIO', 'd.wilson@example.com', '555-0105', 'Executive Sponsor', 'High'),
-        ('Lisa', 'Anderson', 'Project Manager', 'l.anderson@example.com', '555-0106', 'Project Lead', 'Medium'),
-        ('Robert', 'Taylor', 'Security Officer', 'r.taylor@example.com', '555-0107', 'Security', 'High'),
-        ('Jennifer', 'Martinez', 'Operations Director', 'j.martinez@example.com', '555-0108', 'Operations', 'Medium')
-    ]
+    influencers = INFLUENCERS
     
     for first_name, last_name, title, email, phone, role, influence_level in influencers:
         account_id = random.choice(account_ids)
@@ -67,25 +100,20 @@ def populate_influencer_engagements(cursor):
     cursor.execute("SELECT opportunity_id FROM opportunities")
     opportunity_ids = [row[0] for row in cursor.fetchall()]
     
-    engagement_types = ['Meeting', 'Call', 'Email', 'Presentation', 'Workshop', 'Demo']
-    outcomes = ['Positive', 'Neutral', 'Needs Follow-up', 'Scheduled Next Meeting', 'Requested More Info']
-    next_steps = [
-        'Schedule follow-up meeting',
-        'Send additional information',
-        'Prepare proposal',
-        'Arrange technical demo',
-        'Connect with technical team'
-    ]
+    engagement_types = ENGAGEMENT_TYPES
+    outcomes = ENGAGEMENT_OUTCOMES
+    next_steps = ENGAGEMENT_NEXT_STEPS
     
     # Create 3-5 engagements per influencer
     for influencer_id in influencer_ids:
         num_engagements = random.randint(3, 5)
         for _ in range(num_engagements):
             opportunity_id = random.choice(opportunity_ids)
+            # Stored as DATETIME text, 'YYYY-MM-DD HH:MM:SS'
             engagement_date = get_random_date(
                 datetime.date(2024, 1, 1),
                 datetime.date(2024, 3, 15)
-            )
+            ).strftime('%Y-%m-%d 00:00:00')
             engagement_type = random.choice(engagement_types)
             description = f"Engagement with {engagement_type.lower()}"
             outcome = random.choice(outcomes)
@@ -186,9 +214,9 @@ def populate_support_requests(cursor):
         print("No users found in the database. Skipping support requests population.")
         return
     
-    request_types = ['Technical Support', 'Implementation', 'Training', 'Customization', 'Integration']
-    priorities = ['High', 'Medium', 'Low']
-    statuses = ['Open', 'In Progress', 'Resolved', 'Pending']
+    request_types = REQUEST_TYPES
+    priorities = PRIORITIES
+    statuses = REQUEST_STATUSES
     
     for opp_id, opp_name in opportunities:
         # Create 0-2 support requests per opportunity
@@ -217,24 +245,10 @@ def populate_opportunity_project_plan(cursor):
     cursor.execute("SELECT opportunity_id, opportunity_owner FROM opportunities")
     opportunities = cursor.fetchall()
     
-    activities = [
-        'Initial Setup',
-        'Configuration',
-        'Data Migration',
-        'User Training',
-        'Integration Testing',
-        'Go-Live Support'
-    ]
-    deliverables = [
-        'System Configuration Document',
-        'Data Migration Plan',
-        'Training Materials',
-        'Integration Test Results',
-        'Go-Live Checklist',
-        'User Acceptance Sign-off'
-    ]
-    priorities = ['High', 'Medium', 'Low']
-    statuses = ['Not Started', 'In Progress', 'Completed', 'On Hold']
+    activities = PROJECT_ACTIVITIES
+    deliverables = PROJECT_DELIVERABLES
+    priorities = PRIORITIES
+    statuses = PROJECT_STATUSES
     
     for opp_id, owner in opportunities:
         activity = random.choice(activities)
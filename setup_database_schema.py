@@ -1,5 +1,6 @@
 import sqlite3
 import os
+from table_rebuild import rebuild_table
 
 def setup_database():
     # Database file name
@@ -52,7 +53,7 @@ def setup_database():
         """)
         
         # Opportunities table
-        cursor.execute("""
+        opportunities_table = """
         CREATE TABLE IF NOT EXISTS opportunities (
             opportunity_id INTEGER PRIMARY KEY AUTOINCREMENT,
             opportunity_name TEXT NOT NULL,
@@ -86,7 +87,8 @@ def setup_database():
             FOREIGN KEY (stage_id) REFERENCES stages(stage_id),
             FOREIGN KEY (source_id) REFERENCES pipeline_sources(source_id)
         )
-        """)
+        """
+        cursor.execute(opportunities_table)
         
         # Add trigger to update last_modified_date
         cursor.execute("""
@@ -254,27 +256,10 @@ def setup_database():
         project_plan_exists = any(col[1] == 'project_plan_id' for col in columns)
         
         if project_plan_exists:
-            # Create temporary table without project_plan_id
-            cursor.execute("""
-            CREATE TABLE opportunities_temp AS 
-            SELECT opportunity_id, opportunity_name, account_id, owner_id, stage_id,
-                   opportunity_owner, stage_name, next_step, close_date, total_amount,
-                   currency, probability_percentage, age, created_date, last_modified_date,
-                   fiscal_period, lead_source, type, is_closed, is_won, fiscal_year,
-                   fiscal_quarter, annual_contract_value, source_id
-            FROM opportunities
-            """)
-            
-            # Drop original table and rename temp table
-            cursor.execute("DROP TABLE opportunities")
-            cursor.execute("ALTER TABLE opportunities_temp RENAME TO opportunities")
-            
-            # Recreate indexes
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_fiscal_year ON opportunities(fiscal_year)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_fiscal_quarter ON opportunities(fiscal_quarter)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_acv ON opportunities(annual_contract_value)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_close_date ON opportunities(close_date)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_source ON opportunities(source_id)")
+            # Rebuild without project_plan_id, copying in keyed batches and
+            # keeping the other columns, indexes and triggers
+            conn.commit()
+            rebuild_table(conn, 'opportunities', opportunities_table)
         
         # Add project_plan_id to opportunities table
         cursor.execute("ALTER TABLE opportunities ADD COLUMN project_plan_id INTEGER")
@@ -320,6 +305,15 @@ def setup_database():
         # Create index for influencer relationship
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_influencer_id ON opportunities(influencer_id)")
         
+        # Apply detail lookup indexes (003_detail_lookup_indexes.sql)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_account ON opportunities(account_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_owner ON opportunities(owner_id)")
+        
+        # Apply ETag aggregate indexes (004_etag_aggregate_indexes.sql)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_opportunities_last_modified ON opportunities(last_modified_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_influencers_last_modified ON influencers(last_modified_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_project_plan_last_modified ON opportunity_project_plan(last_modified_date)")
+        
         # Commit all changes
         conn.commit()
         print("\nDatabase schema setup completed successfully!")
@@ -0,0 +1,275 @@
+import os
+import re
+import time
+import sqlite3
+import argparse
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# --- Configuration ---
+DATABASE_FILE = os.environ.get('SALES_DB', 'sales_data.db')
+# Rows copied per transaction, so writers are only blocked briefly
+REBUILD_BATCH_SIZE = int(os.environ.get('REBUILD_BATCH_SIZE', '10000'))
+# Pause between batches; writers waiting on the lock retry every few tens of
+# milliseconds, so a shorter pause lets the copy starve them
+REBUILD_PAUSE_SECONDS = float(os.environ.get('REBUILD_PAUSE_SECONDS', '0.05'))
+
+CREATE_TABLE = re.compile(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?("?)(\w+)\1', re.I)
+# prefix, name, ON, table of a CREATE INDEX statement
+CREATE_INDEX = re.compile(r'^(\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?)"?(\w+)"?(\s+ON\s+)"?(\w+)"?', re.I)
+
+# Writers waiting on the lock back off to retrying every 100 ms, so after a
+# long transaction a pause longer than that lets each of them in
+LONG_LOCK_PAUSE_SECONDS = 0.15
+
+@contextmanager
+def write_transaction(conn: sqlite3.Connection, stats: dict):
+    """BEGIN IMMEDIATE ... COMMIT, recording how long the write lock was held"""
+    conn.execute("BEGIN IMMEDIATE")
+    started = time.perf_counter()
+    try:
+        yield
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        stats["last_lock_ms"] = (time.perf_counter() - started) * 1000
+        stats["longest_lock_ms"] = max(stats["longest_lock_ms"], stats["last_lock_ms"])
+
+def yield_lock(stats: dict, pause_seconds: float):
+    """Sleep between transactions so writers waiting on the lock get it"""
+    time.sleep(pause_seconds if stats["last_lock_ms"] < 100 else max(pause_seconds, LONG_LOCK_PAUSE_SECONDS))
+
+def schema_exists(conn: sqlite3.Connection, name: str, type: str = "table") -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (type, name)).fetchone() is not None
+
+def integer_key(conn: sqlite3.Connection, table: str) -> str:
+    keys = [row for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+    if len(keys) != 1 or keys[0][2].upper() != "INTEGER":
+        raise ValueError(f"{table} needs an INTEGER PRIMARY KEY to be copied in keyed batches")
+    return keys[0][1]
+
+def index_sql(sql: str, name: str, table: str) -> str:
+    """A CREATE INDEX statement with its index and table names replaced"""
+    return CREATE_INDEX.sub(lambda m: f"{m.group(1)}{name}{m.group(3)}{table}", sql, count=1)
+
+def discard_rebuild(conn: sqlite3.Connection, table: str):
+    """Drop the new table and capture triggers of a rebuild interrupted before its cutover"""
+    for action in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {table}__rebuild_{action}")
+    conn.execute(f"DROP TABLE IF EXISTS {table}__rebuild")
+
+def finish_rebuild(conn: sqlite3.Connection, table: str, stats: dict,
+                   batch_size: int = REBUILD_BATCH_SIZE, pause_seconds: float = REBUILD_PAUSE_SECONDS):
+    """Give the rebuilt table its final index names and drop the old table.
+
+    Each index is built under its final name once the old table's index of
+    that name is dropped, one index per transaction. Queries use the
+    temporary copy built before the cutover in the meantime.
+    """
+    retired = f"{table}__retired"
+    has_stats = schema_exists(conn, "sqlite_stat1")
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (retired,)
+    ).fetchall()
+    for name, sql in indexes:
+        with write_transaction(conn, stats):
+            # Dropping the index also deletes its statistics
+            stat = has_stats and conn.execute(
+                "SELECT stat FROM sqlite_stat1 WHERE tbl = ? AND idx = ?", (table, name)
+            ).fetchone()
+            conn.execute(f"DROP INDEX {name}")
+        yield_lock(stats, pause_seconds)
+        # Indexes on columns the new definition no longer has were not rebuilt
+        if schema_exists(conn, f"{name}__rebuild", "index"):
+            with write_transaction(conn, stats):
+                conn.execute(index_sql(sql, name, table))
+                conn.execute(f"DROP INDEX {name}__rebuild")
+                if stat:
+                    conn.execute("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)", (table, name, stat[0]))
+            yield_lock(stats, pause_seconds)
+
+    # Emptied in keyed batches, so dropping it does not free every page at once
+    key = integer_key(conn, retired)
+    while True:
+        with write_transaction(conn, stats):
+            upper = conn.execute(
+                f"SELECT MAX({key}) FROM (SELECT {key} FROM {retired} ORDER BY {key} LIMIT ?)", (batch_size,)
+            ).fetchone()[0]
+            if upper is None:
+                break
+            conn.execute(f"DELETE FROM {retired} WHERE {key} <= ?", (upper,))
+        yield_lock(stats, pause_seconds)
+    with write_transaction(conn, stats):
+        conn.execute(f"DROP TABLE {retired}")
+
+def rebuild_table(conn: sqlite3.Connection, table: str, definition: Optional[str] = None,
+                  columns: Optional[Dict[str, str]] = None, batch_size: int = REBUILD_BATCH_SIZE,
+                  pause_seconds: float = REBUILD_PAUSE_SECONDS) -> dict:
+    """Rebuild a table under a new definition while it stays readable and writable.
+
+    definition is the CREATE TABLE statement of the rebuilt table, under its
+    own name, and defaults to the current one. columns maps new columns to
+    SQL expressions over the old row; other columns are copied by name, and
+    new columns the old table lacks get their default.
+
+    Rows are copied in key order in batches of batch_size, each in its own
+    short transaction. Triggers on the old table apply concurrent inserts,
+    updates and deletes to the new table as they happen, so nothing written
+    during the copy is lost. Indexes are built under temporary names before
+    the cutover, which only swaps the tables and recreates the triggers in
+    one short transaction; the indexes get their final names afterwards.
+
+    The connection must not be in a transaction. A rerun completes a rebuild
+    interrupted after its cutover, or discards one interrupted before it.
+    Needs free space for a second copy of the table while it runs.
+    """
+    if conn.in_transaction:
+        raise ValueError("rebuild_table runs its own transactions; commit first")
+    new_table, retired = f"{table}__rebuild", f"{table}__retired"
+    stats = {"table": table, "rows": 0, "batches": 0, "last_lock_ms": 0.0, "longest_lock_ms": 0.0, "cutover_ms": 0.0, "dropped_indexes": []}
+    started = time.perf_counter()
+
+    if schema_exists(conn, retired):
+        finish_rebuild(conn, table, stats, batch_size, pause_seconds)
+    with write_transaction(conn, stats):
+        discard_rebuild(conn, table)
+
+    key = integer_key(conn, table)
+    definition = definition or conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()[0]
+    match = CREATE_TABLE.match(definition)
+    if not match or match.group(2).lower() != table.lower():
+        raise ValueError(f"definition must be a CREATE TABLE statement for {table}")
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).fetchall()
+    triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,)).fetchall()
+
+    old_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    columns = columns or {}
+    with write_transaction(conn, stats):
+        conn.execute(CREATE_TABLE.sub(f"CREATE TABLE {new_table}", definition, count=1))
+        # table_info leaves out generated columns, which are computed, not copied
+        copied = [
+            (column, columns.get(column, column))
+            for column in (row[1] for row in conn.execute(f"PRAGMA table_info({new_table})"))
+            if column in columns or column in old_columns
+        ]
+        if key not in [column for column, _ in copied]:
+            raise ValueError(f"The rebuilt {table} must keep its key {key}")
+        names = ", ".join(column for column, _ in copied)
+        select = f"SELECT {', '.join(expression for _, expression in copied)} FROM {table}"
+        # Captured changes re-read the row, so they always carry its latest values
+        conn.execute(f"""
+            CREATE TRIGGER {new_table}_insert AFTER INSERT ON {table} BEGIN
+                INSERT OR REPLACE INTO {new_table} ({names}) {select} WHERE {key} = NEW.{key};
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER {new_table}_update AFTER UPDATE ON {table} BEGIN
+                DELETE FROM {new_table} WHERE {key} = OLD.{key} AND OLD.{key} IS NOT NEW.{key};
+                INSERT OR REPLACE INTO {new_table} ({names}) {select} WHERE {key} = NEW.{key};
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER {new_table}_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM {new_table} WHERE {key} = OLD.{key};
+            END
+        """)
+
+    # Rows the triggers already copied hold newer values than the old table had
+    # when the copy started, so batches skip them
+    last = conn.execute(f"SELECT MIN({key}) - 1 FROM {table}").fetchone()[0]
+    while True:
+        with write_transaction(conn, stats):
+            upper = conn.execute(
+                f"SELECT MAX({key}) FROM (SELECT {key} FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?)",
+                (last, batch_size)
+            ).fetchone()[0]
+            if upper is None:
+                break
+            cursor = conn.execute(
+                f"INSERT INTO {new_table} ({names}) {select} WHERE {key} > ? AND {key} <= ?"
+                f" AND {key} NOT IN (SELECT {key} FROM {new_table} WHERE {key} > ? AND {key} <= ?)",
+                (last, upper, last, upper)
+            )
+            stats["rows"] += cursor.rowcount
+            stats["batches"] += 1
+        last = upper
+        yield_lock(stats, pause_seconds)
+
+    built = []
+    for name, sql in indexes:
+        try:
+            with write_transaction(conn, stats):
+                conn.execute(index_sql(sql, f"{name}__rebuild", new_table))
+            built.append(name)
+        except sqlite3.OperationalError as e:
+            if "no such column" not in str(e):
+                raise
+            stats["dropped_indexes"].append(name)
+        yield_lock(stats, pause_seconds)
+
+    # Foreign keys would otherwise be checked against the table while it is
+    # swapped, and must be switched off outside a transaction. Legacy renames
+    # leave views and other tables' references to the name alone
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        cutover_started = time.perf_counter()
+        with write_transaction(conn, stats):
+            for action in ("insert", "update", "delete"):
+                conn.execute(f"DROP TRIGGER {new_table}_{action}")
+            for name, _ in triggers:
+                conn.execute(f"DROP TRIGGER {name}")
+            sequence = schema_exists(conn, "sqlite_sequence") and conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)
+            ).fetchone()
+            conn.execute(f"ALTER TABLE {table} RENAME TO {retired}")
+            conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+            for _, sql in triggers:
+                conn.execute(sql)
+            # AUTOINCREMENT keys must not reuse keys of rows deleted before the rebuild
+            if sequence:
+                conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+            if built and schema_exists(conn, "sqlite_stat1"):
+                conn.execute(
+                    f"INSERT INTO sqlite_stat1 (tbl, idx, stat) SELECT tbl, idx || '__rebuild', stat FROM sqlite_stat1"
+                    f" WHERE tbl = ? AND idx IN ({', '.join('?' for _ in built)})",
+                    [table] + built
+                )
+        stats["cutover_ms"] = (time.perf_counter() - cutover_started) * 1000
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+        conn.execute(f"PRAGMA foreign_keys = {foreign_keys}")
+
+    finish_rebuild(conn, table, stats, batch_size, pause_seconds)
+    stats["seconds"] = time.perf_counter() - started
+    del stats["last_lock_ms"]
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a table in keyed batches while the API keeps reading and writing it")
+    parser.add_argument("--db", default=DATABASE_FILE, help="Database to rebuild the table in")
+    parser.add_argument("--table", required=True, help="Table to rebuild under its current definition, e.g. to reclaim space after archival")
+    parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE, help="Rows copied per transaction")
+    parser.add_argument("--pause", type=float, default=REBUILD_PAUSE_SECONDS, help="Seconds between batches")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        stats = rebuild_table(conn, args.table, batch_size=args.batch_size, pause_seconds=args.pause)
+    finally:
+        conn.close()
+    print(f"Rebuilt {stats['table']}: {stats['rows']} rows in {stats['batches']} batches, {stats['seconds']:.1f}s; "
+          f"longest lock {stats['longest_lock_ms']:.0f} ms, cutover {stats['cutover_ms']:.0f} ms")
+    if stats["dropped_indexes"]:
+        print(f"Dropped indexes on removed columns: {', '.join(stats['dropped_indexes'])}")
+
+if __name__ == "__main__":
+    main()